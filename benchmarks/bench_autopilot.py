@@ -0,0 +1,56 @@
+# Autopilot planning time per tick as the snake grows. Games start from a
+# snake already laid out along the board so long snakes are covered too.
+# Run with: python benchmarks/bench_autopilot.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_engine import Game
+from snake_autopilot import Autopilot
+from bench_snake_update import board_cycle
+
+TICKS = 2000  # per game at most
+SEEDS = 5
+TICK_BUDGET_MS = 1000 / 60  # keeping up with 60 ticks per second
+
+
+def play(seed, length, cells):
+    # (snake length, seconds spent steering) for every tick of one game
+    game = Game(seed=seed)
+    if length > 1:
+        game.snake.positions = cells[:length][::-1]
+        game.snake.length = length
+    autopilot = Autopilot(game)
+    samples = []
+    for _ in range(TICKS):
+        start = time.perf_counter()
+        autopilot.steer()
+        samples.append((len(game.snake.positions), time.perf_counter() - start))
+        if not game.step():
+            break
+    return samples
+
+
+def main():
+    cells = board_cycle()
+    buckets = {}
+    for length in (1, 100, 300, 600, 900):
+        for seed in range(SEEDS):
+            for size, elapsed in play(seed, length, cells):
+                buckets.setdefault(size // 100 * 100, []).append(elapsed)
+    print(f'{"length":>10} {"ticks":>7} {"mean us":>9} {"p99 us":>9} {"max ms":>8}')
+    worst = 0
+    for bucket in sorted(buckets):
+        times = sorted(buckets[bucket])
+        mean = sum(times) / len(times)
+        p99 = times[min(len(times) - 1, len(times) * 99 // 100)]
+        worst = max(worst, times[-1])
+        print(f'{bucket:>4}-{bucket + 99:<5} {len(times):>7} {mean * 1e6:>9.0f} {p99 * 1e6:>9.0f} {times[-1] * 1e3:>8.2f}')
+    verdict = 'within' if worst * 1000 < TICK_BUDGET_MS else 'OVER'
+    print(f'slowest tick {worst * 1000:.2f} ms, {verdict} the {TICK_BUDGET_MS:.1f} ms budget for 60 ticks/s')
+
+
+if __name__ == '__main__':
+    main()
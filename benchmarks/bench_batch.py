@@ -0,0 +1,143 @@
+# Batched NumPy environment: checks the rules against snake_engine, then
+# reports throughput at several batch sizes.
+# Run with: python benchmarks/bench_batch.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import snake_engine
+from snake_engine import Game, Snake, FoodManager, DIRECTIONS, FOOD_TYPES
+from snake_batch import BatchEnv, NO_TURN
+
+
+class ScriptedFoodManager(FoodManager):
+    # Spawns the foods a BatchEnv game spawned, in its order, in place of
+    # its own random picks; when the script runs out nothing spawns
+    def __init__(self, snake, min_foods):
+        self.script = []  # (cell, direction index, food type index)
+        super().__init__(snake, max_foods=0, min_foods=min_foods)
+
+    def _random_free_cell(self):
+        return self.script[0][0] if self.script else None
+
+    def add_new_food(self):
+        food = super().add_new_food()
+        if food is not None:
+            _, direction, kind = self.script.pop(0)
+            food.direction = DIRECTIONS[direction]
+            food.current_food = FOOD_TYPES[kind]
+        return food
+
+
+def engine_game(env, i):
+    # Scalar copy of batch game i
+    snake = Snake()
+    snake.positions = env.snake_cells(i)
+    snake.direction = DIRECTIONS[env.direction[i]]
+    snake.length = int(env.length[i])
+    food_manager = ScriptedFoodManager(snake, env.min_foods)
+    food_manager.script = [spawned(env, i, slot) for slot in np.flatnonzero(env.food_pos[i] >= 0)]
+    while food_manager.script:
+        food_manager.add_new_food()
+    food_manager.max_foods = env.max_foods
+    return Game(snake, food_manager)
+
+
+def spawned(env, i, slot):
+    p = int(env.food_pos[i, slot])
+    return (p % env.width, p // env.width), int(env.food_dir[i, slot]), int(env.food_type[i, slot])
+
+
+def record_spawns(env):
+    # {game: [food spawned, in slot order]} for each step, filled in by
+    # BatchEnv._spawn_foods
+    spawns = {}
+    spawn_foods = env._spawn_foods
+
+    def recording(rows):
+        before = env.food_pos[rows].copy()
+        spawn_foods(rows)
+        for r, i in enumerate(rows.tolist()):
+            slots = np.flatnonzero(env.food_pos[i] != before[r])
+            if len(slots):
+                spawns[i] = [spawned(env, i, slot) for slot in slots]
+
+    env._spawn_foods = recording
+    return spawns
+
+
+def food_state(game):
+    interval = game.food_manager.move_interval
+    return sorted((food.position, food.born % interval) for food in game.food_manager.foods)
+
+
+def batch_food_state(env, i):
+    return sorted(((int(p) % env.width, int(p) // env.width), int(phase))
+                  for p, phase in zip(env.food_pos[i], env.food_phase[i]) if p >= 0)
+
+
+def check_parity(games=200, steps=600):
+    # Food turns draw from different RNGs, so they are switched off, and the
+    # engine spawns the foods the batch spawned. Everything else (movement,
+    # drift, refills and their timing, eating, growth, death) must match,
+    # food for food, every tick.
+    turn_chance = snake_engine.FOOD_TURN_CHANCE
+    snake_engine.FOOD_TURN_CHANCE = 0
+    try:
+        env = BatchEnv(games, max_foods=10, min_foods=5, turn_chance=0, autoreset=False, seed=3)
+        scalar = [engine_game(env, i) for i in range(games)]
+        spawns = record_spawns(env)
+        rng = random.Random(5)
+        refills = 0
+        for step in range(steps):
+            actions = [rng.choice([NO_TURN] * 4 + [0, 1, 2, 3]) for _ in range(games)]
+            spawns.clear()
+            env.step(actions)
+            refills += len(spawns)
+            for i, game in enumerate(scalar):
+                if actions[i] != NO_TURN:
+                    game.turn(DIRECTIONS[actions[i]])
+                game.food_manager.script = spawns.get(i, [])
+                game.step()
+                if (game.over == env.alive[i] or game.snake.score != env.score[i]
+                        or list(game.snake.positions) != env.snake_cells(i) or game.food_manager.script
+                        or len(game.food_manager.foods) != env.food_count[i]
+                        or food_state(game) != batch_food_state(env, i)):
+                    raise AssertionError(f'game {i} diverged from snake_engine at step {step}')
+        if not refills:
+            raise AssertionError('no game refilled its food')
+    finally:
+        snake_engine.FOOD_TURN_CHANCE = turn_chance
+
+
+def throughput(n, steps):
+    env = BatchEnv(n, seed=1)
+    rng = np.random.default_rng(2)
+    actions = rng.integers(-1, 4, size=(steps, n), dtype=np.int8)
+    start = time.perf_counter()
+    for t in range(steps):
+        env.step(actions[t])
+    step_time = (time.perf_counter() - start) / steps
+    obs = np.empty((n, 3, env.height, env.width), dtype=np.uint8)
+    start = time.perf_counter()
+    for _ in range(min(steps, 20)):
+        env.observations(obs)
+    obs_time = (time.perf_counter() - start) / min(steps, 20)
+    return 1 / step_time, n / step_time, obs_time * 1000
+
+
+def main():
+    check_parity()
+    print('batch rules match snake_engine')
+    print(f'{"games":>7} {"steps/s":>9} {"game ticks/s":>13} {"obs ms":>7}')
+    for n, steps in ((1, 2000), (1000, 500), (100000, 10)):
+        steps_per_s, ticks_per_s, obs_ms = throughput(n, steps)
+        print(f'{n:>7} {steps_per_s:>9.0f} {ticks_per_s:>13.0f} {obs_ms:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
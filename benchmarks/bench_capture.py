@@ -0,0 +1,90 @@
+# Cost of capturing frames while playing: the game loop of snake_game.main,
+# steered by the autopilot at 60 fps, run for a few seconds without capture,
+# with a capture stream and with PNG files. Reports the frame rate held, the
+# main thread's work per frame and what capture adds to it as a share of the
+# 60 fps frame budget, and the frames dropped because the encoder fell
+# behind. Then checks that a stream holds exactly the frames captured.
+# Run with: python benchmarks/bench_capture.py [seconds]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from snake_game import Game, FrameRenderer, Hud, PauseButton, clock, get_font, screen
+from snake_autopilot import Autopilot
+from snake_capture import FrameCapture, STREAM_SUFFIX, read_stream
+
+SECONDS = 10.0
+FPS = 60
+TICK_RATE = 8
+BUDGET_MS = 1000 / FPS
+
+
+def play(seconds, path=None):
+    # (frames per second, mean main-thread ms per frame, capture stats)
+    game = Game(tick_rate=TICK_RATE, seed=1)
+    pilot = Autopilot(game)
+    renderer = FrameRenderer(screen)
+    hud = Hud(get_font(None, 36))
+    pause_button = PauseButton()
+    frames = FrameCapture(path, screen.get_size(), FPS) if path else None
+    tick_ms = 1000 / TICK_RATE
+    accumulator = frame_ms = 0
+    busy = 0.0
+    count = 0
+    clock.tick()
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        pygame.event.pump()
+        accumulator += frame_ms
+        while accumulator >= tick_ms:
+            accumulator -= tick_ms
+            pilot.steer()
+            if not game.step():
+                game = Game(tick_rate=TICK_RATE, seed=game.seed + 1)
+                pilot = Autopilot(game)
+                renderer.invalidate()
+        hud.update(game.snake.score, 0, len(game.food_manager.foods))
+        renderer.present(renderer.render(game.snake, game.food_manager, hud, pause_button, accumulator / tick_ms))
+        if frames is not None:
+            frames.capture(screen)
+        busy += time.perf_counter() - start
+        count += 1
+        frame_ms = clock.tick(FPS)
+    stats = None
+    if frames is not None:
+        frames.close()
+        stats = frames.stats()
+    return count / seconds, busy / count * 1000, stats
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else SECONDS
+    work = tempfile.mkdtemp()
+    try:
+        fps, base, _ = play(seconds)
+        print(f'{seconds:.0f} s at {FPS} fps, {BUDGET_MS:.1f} ms budget per frame')
+        print(f'  {"no capture":<12} {fps:5.1f} fps  {base:5.2f} ms/frame')
+        for name, path in (('stream', os.path.join(work, 'bench' + STREAM_SUFFIX)),
+                           ('png files', os.path.join(work, 'png'))):
+            fps, busy, stats = play(seconds, path)
+            print(f'  {name:<12} {fps:5.1f} fps  {busy:5.2f} ms/frame  +{(busy - base) / BUDGET_MS:5.1%} of budget  '
+                  f'dropped {stats["dropped"]}/{stats["frames"]}  encode {stats["encode_ms"]:.1f} ms  '
+                  f'{stats["bytes"] / max(stats["written"], 1) / 1024:.1f} KB/frame')
+            if name == 'stream':
+                _, frames = read_stream(path)
+                if sum(1 for _ in frames) != stats['written']:
+                    raise RuntimeError('stream does not hold every written frame')
+    finally:
+        shutil.rmtree(work)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Dirty-rect rendering: checks that it produces the same frames as a full
+# redraw and reports pixels pushed and render time per frame for both modes.
+# Run with: python benchmarks/bench_dirty_render.py
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from snake_engine import Game, DIRECTIONS
+from snake_game import (Snake, FoodManager, Hud, FrameRenderer, PauseButton, get_font, screen,
+                        WINDOW_WIDTH, WINDOW_HEIGHT)
+
+FRAMES = 400
+
+
+def play(dirty, seed, on_frame=None):
+    # Drive one game the way main() does, with random turns and hovering
+    random.seed(seed)
+    snake = Snake()
+    food_manager = FoodManager(snake)
+    game = Game(snake, food_manager)
+    hud = Hud(get_font(None, 36))
+    pause_button = PauseButton()
+    renderer = FrameRenderer(screen, dirty_rects=dirty)
+    pushed = []
+    update = pygame.display.update
+
+    def counting_update(rects=None):
+        pushed.append(WINDOW_WIDTH * WINDOW_HEIGHT if rects is None else sum(r.w * r.h for r in rects))
+        update(rects)
+
+    pygame.display.update = counting_update
+    elapsed = 0
+    try:
+        for frame in range(FRAMES):
+            if random.random() < 0.2:
+                game.turn(random.choice(DIRECTIONS))
+            pause_button.is_hovered = random.random() < 0.05
+            if not game.step():
+                snake.reset()
+                game.over = False
+            hud.update(snake.score, 0, len(food_manager.foods))
+            start = time.perf_counter()
+            renderer.present(renderer.render(snake, food_manager, hud, pause_button))
+            elapsed += time.perf_counter() - start
+            if on_frame:
+                on_frame(frame)
+    finally:
+        pygame.display.update = update
+    return elapsed / FRAMES * 1e6, sum(pushed) / len(pushed)
+
+
+def main():
+    frames = []
+    play(False, 7, lambda frame: frames.append(pygame.image.tobytes(screen, 'RGB')))
+
+    def compare(frame):
+        if pygame.image.tobytes(screen, 'RGB') != frames[frame]:
+            raise AssertionError(f'dirty-rect frame {frame} differs from full redraw')
+
+    play(True, 7, compare)
+    print('dirty-rect frames match full redraws')
+    for dirty in (False, True):
+        render_us, pixels = play(dirty, 11)
+        mode = 'dirty rects' if dirty else 'full redraw'
+        print(f'{mode:>12}: {render_us:7.0f} us/frame, {pixels:9.0f} pixels pushed/frame')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Headless engine: import time and ticks per second without pygame.
+# Run with: python benchmarks/bench_engine.py
+import os
+import random
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import snake_engine
+
+TICKS = 200000
+
+
+def import_time():
+    # Fresh interpreter so nothing is cached; also proves pygame stays out
+    code = ('import sys, time; t = time.perf_counter(); import snake_engine; '
+            'print((time.perf_counter() - t) * 1000, "pygame" in sys.modules)')
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    ms, pygame_loaded = out.stdout.split()
+    return float(ms), pygame_loaded == 'True'
+
+
+def run(make_game, turn_every=7):
+    # Random turns; a new game starts whenever the snake dies, and the time
+    # spent setting games up is left out of the rate
+    random.seed(1)
+    setup = time.perf_counter()
+    game = make_game()
+    games = 1
+    setup = time.perf_counter() - setup
+    start = time.perf_counter()
+    for tick in range(TICKS):
+        if tick % turn_every == 0:
+            game.turn(random.choice(snake_engine.DIRECTIONS))
+        if not game.step():
+            t = time.perf_counter()
+            game = make_game()
+            setup += time.perf_counter() - t
+            games += 1
+    return TICKS / (time.perf_counter() - start - setup), games
+
+
+def main():
+    ms, pygame_loaded = import_time()
+    print(f'import snake_engine: {ms:.2f} ms (pygame imported: {pygame_loaded})')
+    cases = [
+        ('snake only', lambda: snake_engine.Game(food_manager=snake_engine.FoodManager(max_foods=0, min_foods=-1))),
+        ('50 foods', snake_engine.Game),
+        ('1000 foods', lambda: snake_engine.Game(food_manager=snake_engine.FoodManager(max_foods=1000, min_foods=900))),
+    ]
+    for name, make_game in cases:
+        rate, games = run(make_game)
+        print(f'{name:>12}: {rate:10.0f} ticks/s ({games} games)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# Environment steps per second for each kind of observation, with a random
+# agent, against copying the frame out with surfarray.array3d as training
+# loops did before. Also checks that pixel observations are views of the
+# drawn frame, not copies, and that grid observations show the game's
+# snake and food.
+# Run with: python benchmarks/bench_env.py [steps]
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+from snake_engine import GRID_WIDTH
+from snake_batch import OBS_BODY, OBS_HEAD, OBS_FOOD
+from snake_env import SnakeEnv, GRID, PIXELS
+
+STEPS = 3000
+TURN_CHANCE = 0.2
+
+
+def check():
+    env = SnakeEnv(PIXELS, seed=1)
+    obs, _ = env.reset()
+    for _ in range(50):
+        obs, *_ = env.step(random.randrange(4))
+        if env.game.over:
+            obs, _ = env.reset()
+    if not np.shares_memory(obs, np.frombuffer(env.frame_buffer, dtype=np.uint8)):
+        raise RuntimeError('pixel observation is a copy')
+    if not (obs == pygame.surfarray.array3d(env.frame).transpose(1, 0, 2)).all():
+        raise RuntimeError('pixel observation differs from the drawn frame')
+    small = SnakeEnv(PIXELS, downscale=4, seed=1)
+    obs, _ = small.reset(7)
+    frame = pygame.surfarray.array3d(small.frame).transpose(1, 0, 2)
+    shared = np.shares_memory(obs, np.frombuffer(small.frame_buffer, dtype=np.uint8))
+    if not shared or not (obs == frame[::4, ::4]).all():
+        raise RuntimeError('downscaled observation is not every 4th pixel of the frame')
+
+    env = SnakeEnv(GRID, seed=1)
+    obs, _ = env.reset()
+    for _ in range(200):
+        obs, *_ = env.step(random.randrange(4))
+        if env.game.over:
+            obs, _ = env.reset()
+        game = env.game
+        cells = lambda plane: set(np.flatnonzero(obs[plane]).tolist())
+        x, y = game.snake.get_head_position()
+        if (cells(OBS_BODY) != {y * GRID_WIDTH + x for x, y in game.snake.positions}
+                or cells(OBS_HEAD) != {y * GRID_WIDTH + x}
+                or cells(OBS_FOOD) != {y * GRID_WIDTH + x for x, y in game.food_manager.by_position}):
+            raise RuntimeError('grid observation differs from the game')
+
+
+def steps_per_second(env, steps, copy_frame=False):
+    agent = random.Random(0)
+    env.reset(0)
+    action = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        if agent.random() < TURN_CHANCE:
+            action = agent.randrange(4)
+        obs, reward, terminated, truncated, info = env.step(action)
+        if copy_frame:
+            pygame.surfarray.array3d(env.frame)
+        if terminated or truncated:
+            env.reset()
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    steps = int(sys.argv[1]) if len(sys.argv) > 1 else STEPS
+    check()
+    print('pixel observations are views of the frame; grid observations match the game')
+    rows = [
+        ('grid', SnakeEnv(GRID), False),
+        ('grid, frame skip 4', SnakeEnv(GRID, frame_skip=4), False),
+        ('pixels, array3d copy', SnakeEnv(PIXELS), True),
+        ('pixels, view', SnakeEnv(PIXELS), False),
+        ('pixels, view, 1/2 size', SnakeEnv(PIXELS, downscale=2), False),
+        ('pixels, view, 1/4 size', SnakeEnv(PIXELS, downscale=4), False),
+        ('pixels 1/4, frame skip 4', SnakeEnv(PIXELS, downscale=4, frame_skip=4), False),
+    ]
+    for name, env, copy_frame in rows:
+        print(f'{name:<26} {steps_per_second(env, steps, copy_frame):>9.0f} steps/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Food rendering: per-frame cost of drawing primitives for every creature
+# versus blitting cached sprites. Run with: python benchmarks/bench_food_render.py
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+from snake_engine import FOOD_TYPES, GRID_WIDTH, GRID_HEIGHT, BLACK
+from snake_game import Food, FoodManager, GRID_SIZE, draw_food_shape, screen
+
+FRAMES = 300
+
+
+def draw_primitives(surface, foods):
+    for food in foods:
+        draw_food_shape(surface, food.current_food['shape'], food.current_food['color'],
+                        food.position[0] * GRID_SIZE, food.position[1] * GRID_SIZE,
+                        food.animation_frame)
+
+
+def check_pixels():
+    # Every type and frame at every cell, including the clipped board edges
+    expected = pygame.Surface(screen.get_size())
+    actual = pygame.Surface(screen.get_size())
+    for food_type in {(t['shape'], t['color']): t for t in FOOD_TYPES}.values():
+        for frame in range(10):
+            for y in range(GRID_HEIGHT):
+                for x in range(GRID_WIDTH):
+                    food = Food()
+                    food.current_food = food_type
+                    food.tick = frame
+                    food.position = (x, y)
+                    area = pygame.Rect((x - 1) * GRID_SIZE, (y - 1) * GRID_SIZE,
+                                       3 * GRID_SIZE, 3 * GRID_SIZE).clip(expected.get_rect())
+                    expected.fill(BLACK, area)
+                    actual.fill(BLACK, area)
+                    draw_primitives(expected, [food])
+                    food.render(actual)
+                    if (pygame.image.tobytes(expected.subsurface(area), 'RGB')
+                            != pygame.image.tobytes(actual.subsurface(area), 'RGB')):
+                        raise AssertionError(f'{food_type} frame {frame} differs at {(x, y)}')
+
+
+def run(count):
+    manager = FoodManager(max_foods=count, min_foods=0)
+    primitives = sprites = 0
+    for _ in range(FRAMES):
+        manager.update()
+        start = time.perf_counter()
+        draw_primitives(screen, manager.foods)
+        primitives += time.perf_counter() - start
+        start = time.perf_counter()
+        manager.render(screen)
+        sprites += time.perf_counter() - start
+    return primitives / FRAMES * 1e6, sprites / FRAMES * 1e6
+
+
+def check_frame():
+    # A whole board of overlapping creatures rendered through FoodManager
+    expected = pygame.Surface(screen.get_size())
+    actual = pygame.Surface(screen.get_size())
+    manager = FoodManager(max_foods=600, min_foods=0)
+    for _ in range(40):
+        manager.update()
+        expected.fill(BLACK)
+        actual.fill(BLACK)
+        draw_primitives(expected, manager.foods)
+        manager.render(actual)
+        if pygame.image.tobytes(expected, 'RGB') != pygame.image.tobytes(actual, 'RGB'):
+            raise AssertionError('FoodManager.render differs from primitive drawing')
+
+
+def main():
+    check_pixels()
+    check_frame()
+    print('sprites match primitive drawing pixel for pixel')
+    print(f'{"foods":>6} {"primitives us/frame":>20} {"sprites us/frame":>17}')
+    for count in (50, 200, 1000):
+        primitives, sprites = run(count)
+        print(f'{count:>6} {primitives:>20.0f} {sprites:>17.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# FoodStore against FoodManager: the same moves with turns switched off,
+# memory per food, and update time as the number of foods grows.
+# Run with: python benchmarks/bench_food_store.py
+import contextlib
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import snake_engine
+from snake_engine import FoodManager, FOOD_TYPES, DIRECTIONS
+from snake_foodstore import FoodStore
+
+TICKS = 300
+MEMORY_RUNS = 3  # footprints are the median of this many
+
+
+@contextlib.contextmanager
+def world(foods):
+    # A board where foods cover about a quarter of the cells
+    saved = snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT
+    width = max(saved[0], int((foods * 4 * 4 / 3) ** 0.5))
+    snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT = width, max(saved[1], width * 3 // 4)
+    try:
+        yield
+    finally:
+        snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT = saved
+
+
+def check_parity():
+    # Copy a FoodManager's foods into a store and move both without turns
+    saved = snake_engine.FOOD_TURN_CHANCE
+    snake_engine.FOOD_TURN_CHANCE = 0
+    try:
+        random.seed(3)
+        manager = FoodManager(max_foods=200, min_foods=-1)
+        store = FoodStore(max_foods=0, min_foods=-1, turn_chance=0)
+        for food in manager.foods:
+            view = store.add_new_food()
+            slot = view.slot
+            store.cell_count[store.y[slot] * store.width + store.x[slot]] -= 1
+            store.x[slot], store.y[slot] = food.position
+            store.cell_count[food.position[1] * store.width + food.position[0]] += 1
+            store.direction[slot] = DIRECTIONS.index(food.direction)
+            store.type[slot] = FOOD_TYPES.index(food.current_food)
+        for tick in range(TICKS):
+            manager.update()
+            store.update()
+            if tick % 7 == 0:
+                position = manager.foods[tick % len(manager.foods)].position
+                manager.remove_food(position)
+                store.remove_food(position)
+            expected = sorted((food.position, food.direction) for food in manager.foods)
+            if sorted((food.position, food.direction) for food in store.foods) != expected:
+                raise RuntimeError(f'food store diverged at tick {tick}')
+            if store.cell_count.sum() != len(expected):
+                raise RuntimeError(f'cell counts wrong at tick {tick}')
+    finally:
+        snake_engine.FOOD_TURN_CHANCE = saved
+
+
+def check_chunks():
+    # The chunk index must list exactly the rows in each chunk after moves,
+    # removals and refills
+    random.seed(4)
+    store = FoodStore(max_foods=300, min_foods=250, chunk_size=8)
+    for tick in range(TICKS):
+        store.update()
+        if tick % 3 == 0:
+            store.remove_food(store.foods[tick % len(store.foods)].position)
+        expected = {}
+        for slot in range(store.count):
+            expected.setdefault(store._chunk(slot), set()).add(slot)
+        actual = {chunk: slots for chunk, slots in store.chunks.items() if slots}
+        if actual != expected:
+            raise RuntimeError(f'chunk index wrong at tick {tick}')
+        counts = [len(expected.get(chunk, ())) for chunk in range(len(store.chunk_count))]
+        if store.chunk_count.tolist() != counts:
+            raise RuntimeError(f'chunk counts wrong at tick {tick}')
+
+
+def footprint(make, count):
+    # Bytes allocated per food, not counting what an empty board costs. A
+    # full collection first empties the interpreter's free lists: tuples and
+    # the like freed by the previous run would otherwise be reused without
+    # tracemalloc seeing them, and at 50 foods the empty board came out bigger.
+    def allocated(foods):
+        gc.collect()
+        tracemalloc.start()
+        manager = make(foods)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del manager
+        return size
+    sizes = sorted(allocated(count) - allocated(0) for _ in range(MEMORY_RUNS))
+    return sizes[len(sizes) // 2] / count
+
+
+def update_time(make, count):
+    manager = make(count)
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        manager.update()
+    return (time.perf_counter() - start) / TICKS * 1e6
+
+
+def main():
+    check_parity()
+    print('food store moves match FoodManager')
+    check_chunks()
+    print('chunk index matches the food rows')
+    makers = {
+        'FoodManager': lambda n: FoodManager(max_foods=n, min_foods=-1),
+        'FoodStore': lambda n: FoodStore(max_foods=n, min_foods=-1),
+    }
+    print(f'{"foods":>7} {"manager B/food":>15} {"store B/food":>13} {"manager us/tick":>16} {"store us/tick":>14}')
+    for count in (50, 1000, 10000, 100000):
+        with world(count):
+            random.seed(count)
+            memory = [footprint(make, count) for make in makers.values()]
+            times = [update_time(make, count) for make in makers.values()]
+        print(f'{count:>7} {memory[0]:>15.0f} {memory[1]:>13.0f} {times[0]:>16.1f} {times[1]:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
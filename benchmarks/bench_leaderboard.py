@@ -0,0 +1,61 @@
+# Leaderboard: cost of record() on the game thread, background write rate,
+# and top-N / percentile query times on a large table.
+# Run with: python benchmarks/bench_leaderboard.py [rows]
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_leaderboard import Leaderboard
+
+ROWS = 1000000
+QUERIES = 1000
+
+
+def timed(query):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        query()
+    return (time.perf_counter() - start) / QUERIES * 1e6
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'leaderboard.db')
+        legacy = os.path.join(directory, 'high_score.json')
+        with open(legacy, 'w') as f:
+            f.write('{"high_score": 12340}')
+        board = Leaderboard(path, legacy)
+        if board.high_score() != 12340 or os.path.exists(legacy):
+            raise RuntimeError('high_score.json was not migrated')
+
+        start = time.perf_counter()
+        worst = 0
+        for i in range(rows):
+            t = time.perf_counter()
+            board.record(rng.randrange(0, 5000) * 10, rng.randrange(1, 500), rng.random() * 600,
+                         rng.randrange(2 ** 32), f'player{i % 1000}')
+            worst = max(worst, time.perf_counter() - t)
+        queued = time.perf_counter() - start
+        board.flush()
+        written = time.perf_counter() - start
+        print(f'record(): {queued / rows * 1e6:.2f} us per game on the caller, slowest {worst * 1e3:.2f} ms')
+        print(f'{rows} games written in {written:.1f} s ({rows / written:.0f} rows/s)')
+
+        top = board.top(10)
+        if [row[1] for row in top] != sorted((row[1] for row in top), reverse=True) or top[0][1] != 49990:
+            raise RuntimeError('top 10 out of order')
+        print(f'top(10):                  {timed(lambda: board.top(10)):8.1f} us')
+        print(f'percentile(score):        {timed(lambda: board.percentile(25000)):8.1f} us')
+        print(f'player_percentile(name):  {timed(lambda: board.player_percentile("player7")):8.1f} us')
+        print(f'high_score():             {timed(board.high_score):8.3f} us')
+        board.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# CPU used by a menu screen nobody touches: the old loop that redrew the
+# game-over screen at 60 fps against the event-driven one, which draws once
+# and then waits for input. Also checks that redrawing only the button whose
+# hover state changed leaves the same pixels as a full redraw.
+# Run with: python benchmarks/bench_menu_idle.py [seconds]
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import snake_game
+from snake_game import (Button, BLACK, WHITE, GREEN, RED, LIGHT_GRAY, WINDOW_WIDTH, WINDOW_HEIGHT,
+                        clock, get_font, render_text, screen, show_game_over)
+
+IDLE_SECONDS = 5.0
+SCORE, HIGH_SCORE = 42, 99
+
+
+def busy_game_over(screen, score, high_score):
+    # show_game_over as it was: everything redrawn at 60 fps
+    restart_button = Button(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50, 120, 50, "Restart", GREEN, LIGHT_GRAY)
+    quit_button = Button(WINDOW_WIDTH//2 + 30, WINDOW_HEIGHT//2 + 50, 120, 50, "Quit", RED, LIGHT_GRAY)
+    font = get_font(None, 74)
+    game_over_text = render_text(font, "Game Over!", WHITE)
+    game_over_rect = game_over_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 100))
+    score_font = get_font(None, 48)
+    score_text = render_text(score_font, f"Final Score: {score}", WHITE)
+    score_rect = score_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 30))
+    high_score_text = render_text(score_font, f"High Score: {high_score}", WHITE)
+    high_score_rect = high_score_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 20))
+    while True:
+        for event in pygame.event.get():
+            if restart_button.handle_event(event):
+                return True
+            if quit_button.handle_event(event):
+                return False
+        screen.fill(BLACK)
+        screen.blit(game_over_text, game_over_rect)
+        screen.blit(score_text, score_rect)
+        screen.blit(high_score_text, high_score_rect)
+        restart_button.draw(screen)
+        quit_button.draw(screen)
+        pygame.display.flip()
+        clock.tick(60)
+
+
+def post_later(ms, kind, **attributes):
+    pygame.time.set_timer(pygame.event.Event(kind, **attributes), ms, loops=1)
+
+
+def click_restart_after(seconds):
+    # Hover over Restart just before the deadline, then click it
+    pos = (WINDOW_WIDTH//2 - 90, WINDOW_HEIGHT//2 + 75)
+    ms = int(seconds * 1000)
+    post_later(ms - 50, pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+    post_later(ms, pygame.MOUSEBUTTONDOWN, pos=pos, button=1)
+
+
+def idle_cpu(show, seconds):
+    # Share of one core used while the screen sits idle for `seconds`, and
+    # how many full frames it presented meanwhile
+    flips = []
+    flip = pygame.display.flip
+    pygame.display.flip = lambda: flips.append(flip())
+    pygame.event.clear()
+    click_restart_after(seconds)
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        if not show(screen, SCORE, HIGH_SCORE):
+            raise RuntimeError('menu did not return Restart')
+    finally:
+        pygame.display.flip = flip
+    return (time.process_time() - cpu) / (time.perf_counter() - wall) * 100, len(flips)
+
+
+def check_hover():
+    # Move over Quit, then Restart, then away; after each the dirty-rect
+    # redraw must match the screen drawn from scratch
+    restart = (WINDOW_WIDTH//2 - 90, WINDOW_HEIGHT//2 + 75)
+    quit_ = (WINDOW_WIDTH//2 + 90, WINDOW_HEIGHT//2 + 75)
+    script = [pygame.event.Event(pygame.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0))
+              for pos in (quit_, restart, (10, 10), restart)]
+    script.append(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=restart, button=1))
+    frames = []
+    updated = []
+    wait, flip, update = pygame.event.wait, pygame.display.flip, pygame.display.update
+
+    def snap():
+        frames.append(pygame.image.tobytes(screen, 'RGB'))
+
+    def flip_counted():
+        updated.append(None)
+        flip()
+        snap()
+
+    def update_counted(rects):
+        updated.append(rects)
+        update(rects)
+        snap()
+
+    pygame.event.wait = lambda timeout=0: script.pop(0)
+    pygame.display.flip, pygame.display.update = flip_counted, update_counted
+    try:
+        pygame.event.clear()
+        show_game_over(screen, SCORE, HIGH_SCORE)
+    finally:
+        pygame.event.wait, pygame.display.flip, pygame.display.update = wait, flip, update
+    if updated[0] is not None or any(u is None for u in updated[1:]):
+        raise RuntimeError('menu repainted the whole screen after the first frame')
+    if [len(rects) for rects in updated[1:]] != [1, 2, 1, 1]:
+        raise RuntimeError(f'unexpected dirty rects {updated[1:]}')
+    hovers = [(False, True), (True, False), (False, False), (True, False)]
+    for frame, (restart_hovered, quit_hovered) in zip(frames[1:], hovers):
+        restart_button = Button(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50, 120, 50, "Restart", GREEN, LIGHT_GRAY)
+        quit_button = Button(WINDOW_WIDTH//2 + 30, WINDOW_HEIGHT//2 + 50, 120, 50, "Quit", RED, LIGHT_GRAY)
+        restart_button.is_hovered, quit_button.is_hovered = restart_hovered, quit_hovered
+        screen.blit(snake_game.menu_background([
+            (74, "Game Over!", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 100)),
+            (48, f"Final Score: {SCORE}", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 30)),
+            (48, f"High Score: {HIGH_SCORE}", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 20)),
+        ]), (0, 0))
+        restart_button.draw(screen)
+        quit_button.draw(screen)
+        if pygame.image.tobytes(screen, 'RGB') != frame:
+            raise RuntimeError('hover redraw differs from a full redraw')
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else IDLE_SECONDS
+    check_hover()
+    print('hover changes redraw one button each and match a full redraw')
+    print(f'game-over screen idle for {seconds:.0f} s:')
+    for name, show in (('60 fps redraw', busy_game_over), ('event-driven', show_game_over)):
+        cpu, frames = idle_cpu(show, seconds)
+        print(f'  {name:<14} {cpu:5.2f}% CPU, {frames} full frames')
+    if os.environ['SDL_VIDEODRIVER'] == 'dummy':
+        print('  (the dummy video driver presents for free and polls inside event.wait; '
+              'set SDL_VIDEODRIVER to measure a real display)')
+
+
+if __name__ == '__main__':
+    main()
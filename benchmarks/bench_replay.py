@@ -0,0 +1,56 @@
+# Record games played by random turns, check that every recording replays to
+# the same final state, and time headless playback.
+# Run with: python benchmarks/bench_replay.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_engine import DIRECTIONS, Game
+from snake_replay import Recorder, Replay, HEADER, FOOTER
+
+GAMES = 50
+
+
+def record(seed):
+    rng = random.Random(seed)
+    game = Game(seed=seed)
+    recorder = Recorder(game)
+    while True:
+        if rng.random() < 0.2:
+            recorder.turn(rng.choice(DIRECTIONS))
+        if not game.step():
+            return recorder.finish(), len(recorder.inputs), game.ticks
+
+
+def main():
+    recordings = []
+    turns = inputs = ticks = 0
+    for seed in range(GAMES):
+        data, size, length = record(seed)
+        replay = Replay(data)
+        if not replay.verify():
+            raise RuntimeError(f'replay of seed {seed} diverged')
+        recordings.append(replay)
+        turns += len(replay.inputs)
+        inputs += size
+        ticks += length
+    print(f'{GAMES} recordings replay exactly; {turns} turns over {ticks} ticks')
+    print(f'{inputs / turns:.2f} bytes per turn, {HEADER.size + FOOTER.size} bytes of header and footer')
+
+    start = time.perf_counter()
+    for replay in recordings:
+        replay.play()
+    elapsed = time.perf_counter() - start
+    print(f'playback: {ticks / elapsed:.0f} ticks/s')
+
+    replay = max(recordings, key=lambda r: r.end_tick)
+    start = time.perf_counter()
+    replay.play(replay.end_tick // 2)
+    print(f'seek to tick {replay.end_tick // 2}: {(time.perf_counter() - start) * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# Load test for the multiplayer server: hundreds of bots on localhost
+# turning at random. Reports the server's tick timing, tick jitter and
+# bandwidth seen by the clients, checks that a client's board built from
+# deltas matches a fresh full state, and includes a client that stops
+# reading for a while to exercise backpressure.
+# Run with: python benchmarks/bench_server.py [bots] [seconds]
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from snake_server import FRAME, ClientBoard
+
+BOTS = 200
+DURATION = 10.0  # seconds of play
+TICK_RATE = 20
+TURN_CHANCE = 0.1  # per bot per tick
+STALL_SECONDS = 4.0  # the slow client reads nothing for this long
+HISTORY = 200  # ticks of board summaries the observer keeps
+
+
+async def read_message(reader):
+    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+    return await reader.readexactly(size)
+
+
+class Bot:
+    def __init__(self, seed, board=None):
+        self.rng = random.Random(seed)
+        self.board = board  # keep a ClientBoard up to date
+        self.history = {}  # tick -> board.key(), when keeping a board
+        self.received = 0
+        self.arrivals = []
+        self.states = 0
+
+    async def play(self, port, stall=0.0, rcvbuf=None):
+        sock = socket.socket()
+        if rcvbuf:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, ('127.0.0.1', port))
+        # A small stream limit too, or asyncio keeps reading on our behalf
+        reader, writer = await asyncio.open_connection(sock=sock, limit=1024 if rcvbuf else 2 ** 16)
+        if stall:
+            await asyncio.sleep(stall)
+        try:
+            while True:
+                message = await read_message(reader)
+                self.received += FRAME.size + len(message)
+                kind = message[:1]
+                if kind == b'S':
+                    self.states += 1
+                elif kind == b'T':
+                    self.arrivals.append(time.perf_counter())
+                    if self.rng.random() < TURN_CHANCE:
+                        writer.write(bytes([self.rng.randrange(4)]))
+                if self.board is not None:
+                    self.board.apply(message)
+                    if kind != b'W':
+                        self.history[self.board.tick] = self.board.key()
+                        self.history.pop(self.board.tick - HISTORY, None)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def fresh_state(port):
+    # The board as a newly joined client first sees it
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    board = ClientBoard()
+    board.apply(await read_message(reader))
+    board.apply(await read_message(reader))
+    writer.close()
+    return board.key()
+
+
+async def load_test(port, bots, duration):
+    observer = Bot(0, ClientBoard())
+    slow = Bot(1)
+    crowd = [Bot(seed) for seed in range(2, bots)]
+    tasks = [asyncio.create_task(bot.play(port)) for bot in [observer] + crowd]
+    tasks.append(asyncio.create_task(slow.play(port, STALL_SECONDS, rcvbuf=4096)))
+    await asyncio.sleep(duration - 1)
+    expected = await fresh_state(port)
+    for _ in range(100):
+        if expected[0] in observer.history:
+            break
+        await asyncio.sleep(0.01)
+    if observer.history.get(expected[0]) != expected:
+        raise RuntimeError(f'board built from deltas differs from the full state at tick {expected[0]}')
+    await asyncio.sleep(1)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return observer, slow, crowd
+
+
+def jitter(bots, interval):
+    # How far apart ticks arrived from the nominal interval, over all bots
+    gaps = sorted(abs(b - a - interval) for bot in bots for a, b in zip(bot.arrivals, bot.arrivals[1:]))
+    return [gaps[min(len(gaps) - 1, len(gaps) * p // 100)] * 1000 for p in (50, 99)] + [gaps[-1] * 1000]
+
+
+def main():
+    bots = int(sys.argv[1]) if len(sys.argv) > 1 else BOTS
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else DURATION
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'snake_server.py'), '--port', '0',
+                               '--tick-rate', str(TICK_RATE), '--duration', str(duration + 1), '--seed', '1'],
+                              stdout=subprocess.PIPE, text=True)
+    try:
+        port = int(server.stdout.readline().rsplit(':', 1)[1])
+        observer, slow, crowd = asyncio.run(load_test(port, bots, duration))
+        stats = json.loads(server.stdout.readline())
+    finally:
+        server.kill()
+        server.wait()
+    print(f'{bots} bots for {duration:.0f} s at {TICK_RATE} ticks/s; board built from deltas matches a full state')
+    lateness, step = stats['lateness'], stats['step']
+    print(f'server: {stats["ticks"]} ticks, start late p50 {lateness["p50_ms"]:.2f} / p99 {lateness["p99_ms"]:.2f} / '
+          f'max {lateness["max_ms"]:.2f} ms, tick work p50 {step["p50_ms"]:.2f} / max {step["max_ms"]:.2f} ms')
+    p50, p99, worst = jitter([observer] + crowd, 1 / TICK_RATE)
+    print(f'clients: tick jitter p50 {p50:.2f} / p99 {p99:.2f} / max {worst:.2f} ms')
+    per_client = sum(bot.received for bot in crowd) / len(crowd) / duration
+    print(f'bandwidth: {per_client / 1024:.1f} KB/s per client, {stats["bytes_sent"] / duration / 1024:.0f} KB/s total')
+    print(f'slow client: {slow.states - 1} resync(s); server resyncs {stats["resyncs"]}, dropped {stats["dropped"]}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# Snake drawing: one draw call per segment against merged runs and cached
+# head sprites, checked pixel for pixel, plus an occupancy-grid path through
+# surfarray for comparison. The timed snake covers half the board.
+# Run with: python benchmarks/bench_snake_render.py
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pygame
+import snake_engine
+from snake_engine import GRID_WIDTH, GRID_HEIGHT, BLACK
+from snake_game import (Game, Snake, Camera, GRID_SIZE, draw_snake_head, lerp_cell, merge_squares, screen)
+from snake_autopilot import Autopilot
+from bench_snake_update import board_cycle
+
+FRAMES = 300
+ALPHAS = (0.0, 0.25, 0.5, 0.99)
+
+
+def draw_segments(surface, snake, alpha=None):
+    # Snake.render and render_interpolated as they were: primitives for the
+    # head and one rect per segment
+    positions = list(snake.positions)
+    last = len(positions) - 1
+    for i, p in enumerate(positions):
+        if alpha is not None and snake.moved:
+            if i < last:
+                prev = positions[i + 1]
+            else:
+                prev = p if snake.trail is None else snake.trail
+            p = lerp_cell(prev, p, alpha)
+        if i == 0:
+            draw_snake_head(surface, snake.color, snake.direction, p[0] * GRID_SIZE, p[1] * GRID_SIZE)
+        elif alpha is None:
+            pygame.draw.rect(surface, snake.color, (p[0] * GRID_SIZE, p[1] * GRID_SIZE, GRID_SIZE, GRID_SIZE))
+        else:
+            pygame.draw.rect(surface, snake.color,
+                             (round(p[0] * GRID_SIZE), round(p[1] * GRID_SIZE), GRID_SIZE, GRID_SIZE))
+
+
+def draw_view_cells(surface, snake, camera):
+    # Snake.render_view as it was: one rect per occupied cell
+    head_cell = camera.to_screen(snake.positions[0])
+    for j in range(camera.rows):
+        row = (camera.y + j) % camera.world_height * camera.world_width
+        for start, stop, col in camera.spans:
+            for i, count in enumerate(snake.occupancy[row + start:row + stop]):
+                if not count:
+                    continue
+                p = (col + i, j)
+                if p == head_cell and count == 1:
+                    draw_snake_head(surface, snake.color, snake.direction, p[0] * GRID_SIZE, p[1] * GRID_SIZE)
+                else:
+                    pygame.draw.rect(surface, snake.color, (p[0] * GRID_SIZE, j * GRID_SIZE, GRID_SIZE, GRID_SIZE))
+
+
+class GridPainter:
+    # The alternative: paint the occupancy grid into a one-pixel-per-cell
+    # surface with surfarray, scale it up and blit it with a colorkey
+    def __init__(self):
+        self.small = pygame.Surface((GRID_WIDTH, GRID_HEIGHT))
+        self.small.set_colorkey(BLACK)
+
+    def draw(self, surface, snake):
+        grid = np.frombuffer(snake.occupancy, dtype=np.uint8).reshape(GRID_HEIGHT, GRID_WIDTH).T
+        pygame.surfarray.blit_array(self.small, np.where(grid > 0, self.small.map_rgb(snake.color), 0))
+        big = pygame.transform.scale(self.small, surface.get_size())
+        big.set_colorkey(BLACK)
+        surface.blit(big, (0, 0))
+        snake._draw_head(surface, snake.positions[0])
+
+
+def same(draw_a, draw_b):
+    expected = pygame.Surface(screen.get_size())
+    actual = pygame.Surface(screen.get_size())
+    draw_a(expected)
+    draw_b(actual)
+    return pygame.image.tobytes(expected, 'RGB') == pygame.image.tobytes(actual, 'RGB')
+
+
+def straddles_edge(snake, alpha):
+    # A head sliding in across the top or left edge sits at a negative
+    # pixel offset. The old code truncated its square and its eyes toward
+    # zero separately, so there the eyes may be a pixel off from the sprite.
+    positions = snake.positions
+    prev = positions[1] if len(positions) > 1 else snake.trail or positions[0]
+    x, y = lerp_cell(prev, positions[0], alpha)
+    return x < 0 or y < 0
+
+
+def check_pixels():
+    # Autopilot games at many points, drawn still and between ticks, plus
+    # the camera view with the board scrolled so runs cross the seam
+    for seed in range(4):
+        game = Game(seed=seed)
+        pilot = Autopilot(game)
+        camera = Camera()
+        for tick in range(600):
+            pilot.steer()
+            if not game.step():
+                break
+            if tick % 7:
+                continue
+            snake = game.snake
+            if not same(lambda s: draw_segments(s, snake), snake.render):
+                raise RuntimeError(f'render differs, seed {seed} tick {tick}')
+            for alpha in ALPHAS:
+                if straddles_edge(snake, alpha):
+                    continue
+                if not same(lambda s: draw_segments(s, snake, alpha), lambda s: snake.render_interpolated(s, alpha)):
+                    raise RuntimeError(f'render_interpolated({alpha}) differs, seed {seed} tick {tick}')
+            camera.follow((tick, tick // 2))
+            if not same(lambda s: draw_view_cells(s, snake, camera), lambda s: snake.render_view(s, camera)):
+                raise RuntimeError(f'render_view differs, seed {seed} tick {tick}')
+
+
+def half_board_snake():
+    cells = board_cycle()
+    snake = Snake()
+    snake.positions = cells[:len(cells) // 2][::-1]
+    snake.length = len(snake.positions)
+    snake.direction = snake_engine.RIGHT
+    return snake
+
+
+def timed(draw):
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        screen.fill(BLACK)
+        draw(screen)
+    return (time.perf_counter() - start) / FRAMES * 1e6
+
+
+def main():
+    check_pixels()
+    print('merged runs and head sprites draw the same pixels')
+    snake = half_board_snake()
+    corners = [(x * GRID_SIZE, y * GRID_SIZE) for x, y in snake.positions]
+    print(f'{len(snake.positions)} segments in {len(merge_squares(corners))} runs')
+    fill = timed(lambda s: None)
+    painter = GridPainter()
+    rows = [
+        ('render, per segment', lambda s: draw_segments(s, snake)),
+        ('render, merged runs', snake.render),
+        ('render, surfarray grid', lambda s: painter.draw(s, snake)),
+    ]
+    snake.update()
+    rows += [
+        ('interpolated, per segment', lambda s: draw_segments(s, snake, 0.5)),
+        ('interpolated, merged runs', lambda s: snake.render_interpolated(s, 0.5)),
+    ]
+    for name, draw in rows:
+        print(f'{name:<28} {timed(draw) - fill:>8.0f} us/frame')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Microbenchmark for Snake.update: per-tick cost from length 1 up to a snake
+# that fills the whole board. Run with: python benchmarks/bench_snake_update.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_engine import Snake, GRID_WIDTH, GRID_HEIGHT
+
+TICKS = 20000
+
+
+def board_cycle():
+    # Hamiltonian cycle over the board: row 0 left to right, then a
+    # serpentine through columns 1.. on the remaining rows, then back up column 0
+    cells = [(x, 0) for x in range(GRID_WIDTH)]
+    for y in range(1, GRID_HEIGHT):
+        xs = range(GRID_WIDTH - 1, 0, -1) if y % 2 else range(1, GRID_WIDTH)
+        cells.extend((x, y) for x in xs)
+    cells.extend((0, y) for y in range(GRID_HEIGHT - 1, 0, -1))
+    return cells
+
+
+def cycle_directions(cells):
+    # Direction to take from each cell to reach the next one on the cycle
+    steps = {}
+    for i, cell in enumerate(cells):
+        nxt = cells[(i + 1) % len(cells)]
+        steps[cell] = (nxt[0] - cell[0], nxt[1] - cell[1])
+    return steps
+
+
+def legacy_update(snake):
+    # The list-based update that Snake used before the occupancy grid
+    cur = snake.positions[0]
+    x, y = snake.direction
+    new = ((cur[0] + x) % GRID_WIDTH, (cur[1] + y) % GRID_HEIGHT)
+    if new in snake.positions[3:]:
+        return False
+    snake.positions.insert(0, new)
+    if len(snake.positions) > snake.length:
+        snake.positions.pop()
+    return True
+
+
+class LegacySnake:
+    def __init__(self, positions):
+        self.positions = list(positions)
+        self.length = len(positions)
+
+
+def run(length, cells, steps, legacy=False):
+    # Head sits on cells[length - 1] and walks forward along the cycle
+    body = cells[:length][::-1]
+    if legacy:
+        snake = LegacySnake(body)
+        update = lambda: legacy_update(snake)
+        head = lambda: snake.positions[0]
+    else:
+        snake = Snake()
+        snake.positions = body
+        snake.length = length
+        update = snake.update
+        head = snake.get_head_position
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        snake.direction = steps[head()]
+        if not update():
+            raise RuntimeError('snake collided during benchmark')
+    return (time.perf_counter() - start) / TICKS * 1e9
+
+
+def main():
+    cells = board_cycle()
+    steps = cycle_directions(cells)
+    board = GRID_WIDTH * GRID_HEIGHT
+    print(f'{"length":>8} {"deque ns/tick":>14} {"list ns/tick":>13}')
+    for length in (1, 10, 100, 300, 600, 900, board - 1):
+        new = run(length, cells, steps)
+        old = run(length, cells, steps, legacy=True)
+        print(f'{length:>8} {new:>14.0f} {old:>13.0f}')
+
+
+if __name__ == '__main__':
+    main()
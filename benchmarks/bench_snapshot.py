@@ -0,0 +1,132 @@
+# Snapshots and rewind: restored games must match the original byte for
+# byte, then snapshot size, capture cost per tick and the time to restore
+# any tick in the rewind buffer.
+# Run with: python benchmarks/bench_snapshot.py
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_engine import Game
+from snake_autopilot import Autopilot
+from snake_snapshot import HEADER, RNG, SNAKE, FOODS, RewindBuffer, restore, snapshot
+from bench_snake_update import board_cycle
+
+GAMES = 20
+TICKS = 2000  # per game at most
+
+
+def play(seed, length=1):
+    # A game steered by the autopilot, captured every tick. Returns the game,
+    # its buffer, (snapshot, direction moved in) for every tick and the
+    # capture times.
+    game = Game(seed=seed)
+    if length > 1:
+        game.snake.positions = board_cycle()[:length][::-1]
+        game.snake.length = length
+    pilot = Autopilot(game)
+    buffer = RewindBuffer()
+    states = {}
+    times = []
+    buffer.capture(game)
+    for _ in range(TICKS):
+        pilot.steer()
+        if not game.step():
+            break
+        start = time.perf_counter()
+        buffer.capture(game)
+        times.append(time.perf_counter() - start)
+        states[game.ticks] = snapshot(game), game.snake.direction
+    return game, buffer, states, times
+
+
+def check(seed):
+    # Snapshot round trips, restores to random ticks, and a rewound game
+    # carrying on the same way as the first time through
+    rng = random.Random(seed)
+    game, buffer, states, _ = play(seed)
+    copy = restore(snapshot(game))
+    if snapshot(copy) != snapshot(game):
+        raise RuntimeError(f'snapshot of seed {seed} does not round-trip')
+    newest = buffer.newest
+    for tick in sorted(rng.sample(range(buffer.oldest, newest + 1), 5), reverse=True):
+        buffer.restore(game, tick)
+        if tick in states and snapshot(game) != states[tick][0]:
+            raise RuntimeError(f'seed {seed} restored to tick {tick} differs')
+    tick = game.ticks
+    while game.ticks < newest:
+        state, direction = states[game.ticks + 1]
+        game.snake.direction = direction
+        game.step()
+        if snapshot(game) != state:
+            raise RuntimeError(f'seed {seed} diverged after rewinding to tick {tick}')
+
+
+def check_move_interval(interval=7, ticks=300):
+    # A game with its own food move interval, restored into a default game
+    # halfway through, must carry on with that interval
+    game = Game(seed=1, food_move_interval=interval)
+    pilot = Autopilot(game)
+    copy = None
+    for _ in range(ticks):
+        pilot.steer()
+        if copy is not None:
+            copy.snake.direction = game.snake.direction
+            copy.step()
+        if not game.step():
+            break
+        if game.ticks == ticks // 2:
+            copy = restore(snapshot(game))
+    if copy is None or copy.food_manager.move_interval != interval or snapshot(copy) != snapshot(game):
+        raise RuntimeError(f'a game with food move interval {interval} did not survive a restore')
+
+
+def check_bad_data():
+    # A snapshot with an out-of-range food type must be refused before the
+    # target game is touched
+    source = Game(seed=2)
+    for _ in range(100):
+        source.step()
+    data = bytearray(snapshot(source))
+    foods = len(source.food_manager.foods)
+    kinds = HEADER.size + RNG.size + SNAKE.size + 2 * len(source.snake.positions) + FOODS.size + 2 * foods
+    data[kinds] = 200
+    game = Game(seed=9)
+    before = snapshot(game)
+    try:
+        restore(bytes(data), game)
+    except ValueError:
+        pass
+    else:
+        raise RuntimeError('a snapshot with a bad food type was restored')
+    if snapshot(game) != before:
+        raise RuntimeError('a refused snapshot changed the game')
+
+
+def main():
+    for seed in range(GAMES):
+        check(seed)
+    print(f'{GAMES} games restore to the exact state at random ticks')
+    check_move_interval()
+    print('the food move interval is saved and restored with the game')
+    check_bad_data()
+    print('damaged snapshots are refused and leave the game as it was')
+    print(f'{"snake":>6} {"snapshot B":>11} {"buffer KB":>10} {"ticks":>6} {"capture us":>11} '
+          f'{"max us":>7} {"restore ms":>11} {"max ms":>7}')
+    for length in (1, 100, 1000):
+        game, buffer, _, times = play(0, length)
+        size, memory = len(buffer.segments[-1][1]), buffer.nbytes
+        restores = []
+        for tick in range(buffer.newest, buffer.oldest - 1, -7):
+            start = time.perf_counter()
+            buffer.restore(game, tick)
+            restores.append(time.perf_counter() - start)
+        print(f'{length:>6} {size:>11} {memory / 1024:>10.1f} {len(times):>6} '
+              f'{sum(times) / len(times) * 1e6:>11.2f} {max(times) * 1e6:>7.0f} '
+              f'{sum(restores) / len(restores) * 1e3:>11.2f} {max(restores) * 1e3:>7.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# Tournament throughput: games per second played in this process, then
+# through the process pool with one worker up to one per core, in chunks of
+# one game and of CHUNK_SIZE games. Scaling is reported against the
+# in-process rate times the worker count. Full games take tens of ms, so
+# games cut off after SHORT_TICKS ticks are timed too, where the cost of
+# sending work to the pool shows. Every run must produce the same summary,
+# whatever the workers and chunking.
+# Run with: python benchmarks/bench_tournament.py [games]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from snake_tournament import CHUNK_SIZE, DEFAULT_CONFIG, MAX_TICKS, Summary, play_chunk, run
+
+GAMES = 256
+SHORT_TICKS = 20
+SHORT_GAMES_FACTOR = 16  # short games are this many times more numerous
+
+
+def bench(games, max_ticks, worker_counts):
+    start = time.perf_counter()
+    expected = Summary()
+    for _, score, length, ticks, cause in play_chunk(DEFAULT_CONFIG, range(games), max_ticks):
+        expected.add(score, length, ticks, cause)
+    serial = games / (time.perf_counter() - start)
+    print(f'{games} games of up to {max_ticks} ticks')
+    print(f'  {"in process":<24} {serial:>8.1f} games/s')
+    for workers in worker_counts:
+        for chunk_size in (1, CHUNK_SIZE):
+            start = time.perf_counter()
+            summary = run([DEFAULT_CONFIG], games, workers=workers, chunk_size=chunk_size,
+                          max_ticks=max_ticks)[DEFAULT_CONFIG]
+            rate = games / (time.perf_counter() - start)
+            if summary.as_dict() != expected.as_dict():
+                raise RuntimeError(f'{workers} workers in chunks of {chunk_size} gave a different summary')
+            name = f'{workers} worker(s), chunk {chunk_size}'
+            print(f'  {name:<24} {rate:>8.1f} games/s  {rate / (serial * workers):>6.0%} of linear')
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else GAMES
+    cores = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, cores // 2, cores} - {0}) if cores > 1 else [1]
+    print(f'{cores} core(s)')
+    bench(games, MAX_TICKS, worker_counts)
+    bench(games * SHORT_GAMES_FACTOR, SHORT_TICKS, worker_counts)
+    print('every run gave the same summary')
+
+
+if __name__ == '__main__':
+    main()
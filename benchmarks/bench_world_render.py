@@ -0,0 +1,83 @@
+# Large-world rendering: frame time of the camera view as the board, the
+# number of foods and the snake's length grow. Only what is in view is drawn,
+# so the numbers should stay flat. Run with: python benchmarks/bench_world_render.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import snake_engine
+from snake_game import (Camera, Minimap, WorldRenderer, Hud, PauseButton, get_font, new_world_game, screen,
+                        GRID_WIDTH, GRID_HEIGHT)
+
+FRAMES = 200
+
+
+def coil(head, length, width, height):
+    # Body running back from the head in rows 60 cells wide, so a long snake
+    # fills much of the view
+    x0, y0 = head
+    cells = []
+    for i in range(length):
+        row, col = divmod(i, 60)
+        col = col if row % 2 == 0 else 59 - col
+        cells.append(((x0 - col) % width, (y0 + row) % height))
+    return cells
+
+
+def run(size, length):
+    snake_engine.set_grid_size(size, size)
+    try:
+        game = new_world_game(seed=1)
+        snake, store = game.snake, game.food_manager
+        snake.positions = coil(snake.get_head_position(), length, size, size)
+        snake.length = length
+        renderer = WorldRenderer(screen, Camera(), Minimap(store))
+        hud = Hud(get_font(None, 36))
+        hud.update(0, 0, len(store.foods))
+        pause_button = PauseButton()
+        renderer.render(snake, store, hud, pause_button)
+        elapsed = 0
+        for _ in range(FRAMES):
+            store.update()
+            renderer.minimap.last_refresh = None  # rebuild the minimap every frame too
+            start = time.perf_counter()
+            renderer.render(snake, store, hud, pause_button)
+            elapsed += time.perf_counter() - start
+        return elapsed / FRAMES * 1000, len(store.foods)
+    finally:
+        snake_engine.set_grid_size(GRID_WIDTH, GRID_HEIGHT)
+
+
+def check_view():
+    # slots_in must find exactly the foods a scan over every food finds,
+    # including views that wrap round the board edges
+    snake_engine.set_grid_size(200, 150)
+    try:
+        store = new_world_game(seed=2).food_manager
+        for x0, y0 in ((0, 0), (190, 140), (-1, -1), (75, 149), (199, 3)):
+            for _ in range(40):
+                store.update()
+            found = store.slots_in(x0, y0, 42, 32).tolist()
+            expected = [slot for slot in range(store.count)
+                        if (store.x[slot] - x0) % store.width < 42 and (store.y[slot] - y0) % store.height < 32]
+            if found != expected:
+                raise RuntimeError(f'slots_in missed foods in the view at {(x0, y0)}')
+    finally:
+        snake_engine.set_grid_size(GRID_WIDTH, GRID_HEIGHT)
+
+
+def main():
+    check_view()
+    print('viewport queries match a full scan')
+    print(f'{"board":>11} {"foods":>8} {"snake":>6} {"ms/frame":>9}')
+    for size in (100, 1000, 3000):
+        for length in (10, 1000, 10000):
+            ms, foods = run(size, length)
+            print(f'{size:>5}x{size:<5} {foods:>8} {length:>6} {ms:>9.2f}')
+
+
+if __name__ == '__main__':
+    main()
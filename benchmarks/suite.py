@@ -0,0 +1,256 @@
+# Benchmark suite for the hot paths, with results as JSON and a check against
+# a saved baseline. Runs headlessly:
+#   python benchmarks/suite.py --save-baseline           # record this machine
+#   python benchmarks/suite.py                           # compare, exit 1 on regression
+#   python benchmarks/suite.py --threshold 0.25 --out results.json -k food
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+import snake_engine
+import snake_game
+from snake_foodstore import FoodStore
+from bench_snake_update import board_cycle, cycle_directions
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+THRESHOLD = 0.10  # allowed slowdown before a result counts as a regression
+REPEAT = 15  # best of this many runs, to ride out scheduler noise
+BATCH = 100  # foods added or removed per timed batch
+MAIN_FRAMES = 300
+
+
+def measure(op, number, setup=None, repeat=REPEAT):
+    # Best of `repeat` runs of `number` calls, in ns per call. `setup` runs
+    # untimed before each run.
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        for _ in range(number):
+            op()
+        elapsed = (time.perf_counter_ns() - start) / number
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+@contextlib.contextmanager
+def world(width, height):
+    # The engine reads the grid size from module globals, so a bigger board
+    # for the large food counts is a temporary swap
+    saved = snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT
+    snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT = width, height
+    try:
+        yield
+    finally:
+        snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT = saved
+
+
+def world_for(foods):
+    # Default board for the game's own food count, otherwise one where foods
+    # cover about a quarter of the cells
+    if foods <= 50:
+        return snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT
+    width = int((foods * 4 * 4 / 3) ** 0.5)
+    return width, width * 3 // 4
+
+
+def bench_snake_update():
+    cells = board_cycle()
+    steps = cycle_directions(cells)
+    for length in (1, 100, 600, len(cells) - 1):
+        snake = snake_engine.Snake()
+        snake.positions = cells[:length][::-1]
+        snake.length = length
+
+        def op(snake=snake):
+            snake.direction = steps[snake.get_head_position()]
+            snake.update()
+        yield f'snake_update/len={length}', lambda: measure(op, 5000)
+
+
+def bench_food_manager():
+    for count in (50, 1000, 10000):
+        with world(*world_for(count)):
+            random.seed(count)
+            manager = snake_engine.FoodManager(max_foods=count, min_foods=-1)
+            yield f'food_manager_update/foods={count}', lambda: measure(manager.update, manager.move_interval * 10)
+
+            added = []
+
+            def add():
+                added.append(manager.add_new_food().position)
+
+            def remove_added():
+                for position in added:
+                    manager.remove_food(position)
+                added.clear()
+
+            def timed_add():
+                remove_added()
+                start = time.perf_counter_ns()
+                for _ in range(BATCH):
+                    add()
+                return (time.perf_counter_ns() - start) / BATCH
+            yield f'food_manager_add/foods={count}', lambda: min(timed_add() for _ in range(REPEAT))
+            remove_added()
+
+            def timed_remove():
+                for _ in range(BATCH):
+                    add()
+                start = time.perf_counter_ns()
+                remove_added()
+                return (time.perf_counter_ns() - start) / BATCH
+            yield f'food_manager_remove/foods={count}', lambda: min(timed_remove() for _ in range(REPEAT))
+
+
+def bench_food_store():
+    for count in (50, 1000, 10000):
+        with world(*world_for(count)):
+            random.seed(count)
+            store = FoodStore(max_foods=count, min_foods=-1)
+            yield f'food_store_update/foods={count}', lambda: measure(store.update, store.move_interval * 10)
+
+
+def bench_food_render():
+    surface = pygame.Surface((snake_game.WINDOW_WIDTH, snake_game.WINDOW_HEIGHT))
+    for shape in dict.fromkeys(t['shape'] for t in snake_engine.FOOD_TYPES):
+        food = snake_game.Food()
+        food.current_food = next(t for t in snake_engine.FOOD_TYPES if t['shape'] == shape)
+        food.position = (snake_engine.GRID_WIDTH // 2, snake_engine.GRID_HEIGHT // 2)
+
+        def op(food=food):
+            food.tick += 1
+            food.render(surface)
+        yield f'food_render/{shape}', lambda: measure(op, 2000)
+
+
+def bench_snake_render():
+    surface = pygame.Surface((snake_game.WINDOW_WIDTH, snake_game.WINDOW_HEIGHT))
+    cells = board_cycle()
+    snake = snake_game.Snake()
+    snake.positions = cells[:len(cells) - 1][::-1]
+    snake.length = len(cells) - 1
+    yield 'snake_render/nearly_full', lambda: measure(lambda: snake.render(surface), 10)
+
+
+def bench_main_frame():
+    # The whole game loop with the welcome and game-over screens skipped and a
+    # clock that never sleeps. pygame is shut down at the end, so this runs last.
+    # The leaderboard goes to a temporary directory, away from the player's.
+    frames = [0]
+
+    class Clock:
+        def tick(self, fps=0):
+            frames[0] += 1
+            if frames[0] == MAIN_FRAMES:
+                pygame.event.post(pygame.event.Event(pygame.QUIT))
+            return 1000 / snake_game.RENDER_FPS
+
+    def run():
+        saved = (snake_game.clock, snake_game.show_welcome_screen, snake_game.show_game_over,
+                 snake_game.LEADERBOARD_FILE, snake_game.LEGACY_HIGH_SCORE_FILE)
+        with tempfile.TemporaryDirectory() as scratch:
+            snake_game.clock = Clock()
+            snake_game.show_welcome_screen = lambda: True
+            snake_game.show_game_over = lambda *args: False
+            snake_game.LEADERBOARD_FILE = os.path.join(scratch, 'leaderboard.db')
+            snake_game.LEGACY_HIGH_SCORE_FILE = os.path.join(scratch, 'high_score.json')
+            random.seed(0)
+            start = time.perf_counter_ns()
+            try:
+                snake_game.main()
+            except SystemExit:
+                pass
+            finally:
+                (snake_game.clock, snake_game.show_welcome_screen, snake_game.show_game_over,
+                 snake_game.LEADERBOARD_FILE, snake_game.LEGACY_HIGH_SCORE_FILE) = saved
+        return (time.perf_counter_ns() - start) / frames[0]
+    yield 'main_frame', run
+
+
+BENCHMARKS = [bench_snake_update, bench_food_manager, bench_food_store, bench_food_render, bench_snake_render,
+              bench_main_frame]
+
+
+def run(pattern=None):
+    # Benchmarks yield (name, timed) and only the ones matching `pattern`
+    # are timed
+    results = {}
+    for bench in BENCHMARKS:
+        for name, timed in bench():
+            if pattern and pattern not in name:
+                continue
+            ns = timed()
+            results[name] = round(ns, 1)
+            print(f'{name:<36} {ns:>14.0f} ns')
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Ratio of each result to its baseline; names missing on either side are skipped
+    regressions = []
+    print(f'\n{"benchmark":<36} {"baseline":>12} {"now":>12} {"change":>8}')
+    for name, ns in results.items():
+        old = baseline.get(name)
+        if not old:
+            continue
+        change = ns / old - 1
+        flag = ' REGRESSION' if change > threshold else ''
+        print(f'{name:<36} {old:>12.0f} {ns:>12.0f} {change:>+8.1%}{flag}')
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snake benchmark suite')
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks whose name contains this')
+    parser.add_argument('--out', help='write results as JSON to this path')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='allowed slowdown as a fraction (default %(default)s)')
+    args = parser.parse_args()
+
+    report = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'machine': platform.machine(),
+        'results': run(args.pattern),
+    }
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nbaseline saved to {args.baseline}')
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f'\nno baseline at {args.baseline}; run with --save-baseline first')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    regressions = compare(report['results'], baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s) over {args.threshold:.0%}')
+        return 1
+    print(f'\nno regressions over {args.threshold:.0%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+# Autopilot for demo and soak-test boards: steers the snake toward the nearest
+# food with A* over the wrapping grid. Body cells count as walls only until
+# the tail will have left them, so paths can follow the snake's own tail.
+#
+# A plan is kept while its target food stays put and the snake hasn't grown;
+# food moves every FOOD_MOVE_INTERVAL ticks, so most ticks just take the next
+# step of the cached path. Each search expands at most `budget` cells; when it
+# runs out the snake heads for the closest cell found and searches again next
+# tick.
+import heapq
+
+import snake_engine
+from snake_engine import DIRECTIONS
+
+SEARCH_BUDGET = 1500  # cells expanded per tick at most
+
+class Autopilot:
+    def __init__(self, game, budget=SEARCH_BUDGET, turn=None):
+        self.game = game
+        self.budget = budget
+        self.turn = game.turn if turn is None else turn  # e.g. a Recorder's turn
+        self.width = width = snake_engine.GRID_WIDTH
+        self.height = height = snake_engine.GRID_HEIGHT
+        # Flat cell index -> ((neighbour, direction), ...) with wraparound
+        self.neighbors = [tuple((((y + dy) % height) * width + (x + dx) % width, (dx, dy))
+                                for dx, dy in DIRECTIONS)
+                          for y in range(height) for x in range(width)]
+        self.path = []  # cells still to visit, next one last
+        self.target = None  # food position the path leads to
+        self.planned_length = None
+        self.partial = True
+        self.plans = 0
+        self.expanded = 0
+
+    def _plan_valid(self, head):
+        if self.partial or not self.path:
+            return False
+        if all(cell != self.path[-1] for cell, _ in self.neighbors[head]):
+            return False  # the snake left the path
+        return (self.game.snake.length == self.planned_length
+                and self.game.food_manager.food_at(self.target) is not None)
+
+    def _distance(self, a, b):
+        width, height = self.width, self.height
+        dx = abs(a % width - b % width)
+        dy = abs(a // width - b // width)
+        return min(dx, width - dx) + min(dy, height - dy)
+
+    def _busy(self):
+        # Cell -> moves before the body leaves it; stepping onto it on move d
+        # is safe once d is greater
+        snake = self.game.snake
+        positions = snake.positions
+        grow = max(0, snake.length - len(positions))
+        busy = {}
+        left = len(positions) + grow
+        width = self.width
+        for x, y in positions:
+            cell = y * width + x
+            if cell not in busy:
+                busy[cell] = left
+            left -= 1
+        return busy
+
+    def plan(self, head):
+        self.plans += 1
+        self.path = []
+        self.partial = True
+        foods = self.game.food_manager.foods
+        if not foods:
+            return
+        width = self.width
+        goal_food = min(foods, key=lambda food: self._distance(head, food.position[1] * width + food.position[0]))
+        goal = goal_food.position[1] * width + goal_food.position[0]
+        self.target = goal_food.position
+        self.planned_length = self.game.snake.length
+
+        busy = self._busy()
+        distance = self._distance
+        neighbors = self.neighbors
+        parent = {head: None}
+        steps = {head: 0}
+        best = head  # closest to the goal so far
+        best_key = (distance(head, goal), 0)
+        queue = [(best_key[0], 0, head)]
+        expanded = 0
+        while queue and expanded < self.budget:
+            _, g, cell = heapq.heappop(queue)
+            if g > steps[cell]:
+                continue
+            expanded += 1
+            if cell == goal:
+                best = cell
+                self.partial = False
+                break
+            g += 1
+            for nxt, _ in neighbors[cell]:
+                if busy.get(nxt, 0) >= g or steps.get(nxt, g + 1) <= g:
+                    continue
+                steps[nxt] = g
+                parent[nxt] = cell
+                h = distance(nxt, goal)
+                # Closest to the goal, and among those the furthest away so a
+                # trapped snake buys itself the most time
+                if (h, -g) < best_key:
+                    best, best_key = nxt, (h, -g)
+                heapq.heappush(queue, (g + h, g, nxt))
+        self.expanded += expanded
+        path = []
+        while best != head:
+            path.append(best)
+            best = parent[best]
+        self.path = path
+
+    def steer(self):
+        # Pick this tick's direction and turn the snake; call once per tick
+        # before Game.step
+        snake = self.game.snake
+        x, y = snake.get_head_position()
+        head = y * self.width + x
+        if not self._plan_valid(head):
+            self.plan(head)
+        if not self.path:
+            return snake.direction  # boxed in; keep going
+        nxt = self.path.pop()
+        for cell, direction in self.neighbors[head]:
+            if cell == nxt:
+                self.turn(direction)
+                return direction
+        return snake.direction
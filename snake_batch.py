@@ -0,0 +1,202 @@
+# Many Snake games stepped at once with NumPy, for bot training and balancing.
+# Follows the rules in snake_engine: wraparound movement, food drifting every
+# move_interval ticks with a FOOD_TURN_CHANCE turn, eating, growth and
+# self-collision. Requires numpy.
+import numpy as np
+
+from snake_engine import (GRID_WIDTH, GRID_HEIGHT, DIRECTIONS, FOOD_TYPES,
+                          FOOD_MOVE_INTERVAL, FOOD_TURN_CHANCE, FOOD_SCORE)
+
+DIRECTION_DX = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+DIRECTION_DY = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+# Index of the opposite direction, for the no-reversing rule
+OPPOSITE = np.array([DIRECTIONS.index((-d[0], -d[1])) for d in DIRECTIONS], dtype=np.int8)
+NO_TURN = -1
+
+# Observation channels
+OBS_BODY = 0
+OBS_HEAD = 1
+OBS_FOOD = 2
+OBS_CHANNELS = 3
+
+class BatchEnv:
+    # N games held as arrays. Cells are flat indices y * width + x.
+    #   body      ring buffer of snake cells per game, head at head_ptr
+    #   occupancy snake segment count per cell
+    #   food_pos  cell of each food slot, -1 for an empty slot
+    #   food_phase spawn tick modulo move_interval; a food moves on the
+    #             ticks that share its phase
+    def __init__(self, n, width=GRID_WIDTH, height=GRID_HEIGHT, max_foods=50, min_foods=40,
+                 turn_chance=FOOD_TURN_CHANCE, autoreset=True, seed=None, move_interval=FOOD_MOVE_INTERVAL):
+        self.n = n
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.max_foods = max_foods
+        self.min_foods = min_foods
+        self.turn_chance = turn_chance
+        self.move_interval = move_interval
+        self.autoreset = autoreset
+        self.rng = np.random.default_rng(seed)
+        cell_dtype = np.int16 if self.cells < 2 ** 15 else np.int32
+        self.body = np.zeros((n, self.cells), dtype=cell_dtype)
+        self.head_ptr = np.zeros(n, dtype=np.int32)
+        self.size = np.zeros(n, dtype=np.int32)  # segments on the board
+        self.length = np.zeros(n, dtype=np.int32)  # segments the snake grows to
+        self.occupancy = np.zeros((n, self.cells), dtype=np.uint8)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.food_pos = np.full((n, max_foods), -1, dtype=np.int32)
+        self.food_dir = np.zeros((n, max_foods), dtype=np.int8)
+        self.food_type = np.zeros((n, max_foods), dtype=np.int8)
+        self.phase_dtype = np.int8 if move_interval <= 128 else np.int32
+        self.food_phase = np.zeros((n, max_foods), dtype=self.phase_dtype)
+        self.food_count = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.ticks = np.zeros(n, dtype=np.int32)
+        self.alive = np.zeros(n, dtype=bool)
+        self.reset()
+
+    def reset(self, mask=None):
+        # Start new games for the selected rows (all rows by default)
+        rows = np.arange(self.n) if mask is None else np.flatnonzero(mask)
+        if not len(rows):
+            return
+        start = (self.height // 2) * self.width + self.width // 2
+        self.occupancy[rows] = 0
+        self.occupancy[rows, start] = 1
+        self.body[rows, 0] = start
+        self.head_ptr[rows] = 0
+        self.size[rows] = 1
+        self.length[rows] = 1
+        self.direction[rows] = self.rng.integers(0, len(DIRECTIONS), len(rows))
+        self.score[rows] = 0
+        self.ticks[rows] = 0
+        self.alive[rows] = True
+        self.food_pos[rows] = -1
+        self.food_count[rows] = 0
+        self._spawn_foods(rows)
+
+    def heads(self):
+        return self.body[np.arange(self.n), self.head_ptr].astype(np.int64)
+
+    def snake_cells(self, i):
+        # Body of game i, head first, as (x, y) tuples
+        cap = self.cells
+        idx = (self.head_ptr[i] - np.arange(self.size[i])) % cap
+        return [(int(c) % self.width, int(c) // self.width) for c in self.body[i, idx]]
+
+    def _spawn_foods(self, rows):
+        # Fill every empty food slot of the given games with a random cell
+        # holding neither food nor snake
+        if not len(rows):
+            return
+        blocked = self.occupancy[rows] > 0
+        pos = self.food_pos[rows]
+        has_food = pos >= 0
+        r, c = np.nonzero(has_food)
+        blocked[r, pos[r, c]] = True
+        keys = self.rng.random(blocked.shape)
+        keys[blocked] = 2.0
+        order = np.argsort(keys, axis=1)
+        free = (~blocked).sum(axis=1)
+        empty = ~has_food
+        rank = np.cumsum(empty, axis=1) - 1
+        fill = empty & (rank < free[:, None])
+        r, c = np.nonzero(fill)
+        game_rows = rows[r]
+        self.food_pos[game_rows, c] = order[r, rank[r, c]]
+        self.food_dir[game_rows, c] = self.rng.integers(0, len(DIRECTIONS), len(r))
+        self.food_type[game_rows, c] = self.rng.integers(0, len(FOOD_TYPES), len(r))
+        self.food_phase[game_rows, c] = self.ticks[game_rows] % self.move_interval
+        self.food_count[rows] += fill.sum(axis=1)
+
+    def step(self, actions=None):
+        # Advance every live game one tick. `actions` holds a direction index
+        # per game (NO_TURN to keep going); turning back into the neck is
+        # ignored. Returns (rewards, dones); done games are restarted when
+        # autoreset is on.
+        n = self.n
+        rows = np.arange(n)
+        alive = self.alive
+        if actions is not None:
+            actions = np.asarray(actions)
+            if actions.shape != (n,):
+                raise ValueError(f'actions must hold one action for each of the {n} games')
+            if ((actions < NO_TURN) | (actions >= len(DIRECTIONS))).any():
+                raise ValueError(f'actions must be NO_TURN ({NO_TURN}) or direction indexes below {len(DIRECTIONS)}')
+            actions = actions.astype(np.int8)
+            turn = (actions != NO_TURN) & (actions != OPPOSITE[self.direction])
+            self.direction = np.where(turn, actions, self.direction)
+
+        # Move the snakes, with the positions[3:] rule: the first three
+        # segments never count as a hit
+        head = self.body[rows, self.head_ptr].astype(np.int64)
+        x = (head % self.width + DIRECTION_DX[self.direction]) % self.width
+        y = (head // self.width + DIRECTION_DY[self.direction]) % self.height
+        new = y * self.width + x
+        hits = self.occupancy[rows, new].astype(np.int32)
+        cap = self.cells
+        for i in range(3):
+            segment = self.body[rows, (self.head_ptr - i) % cap]
+            hits -= (segment == new) & (self.size > i)
+        dead = alive & (hits > 0)
+        moving = alive & ~dead
+        live = np.flatnonzero(moving)
+        live_new = new[live]
+        self.head_ptr[live] = (self.head_ptr[live] + 1) % cap
+        self.body[live, self.head_ptr[live]] = live_new
+        self.occupancy[live, live_new] += 1
+        self.size[live] += 1
+        shrink = live[self.size[live] > self.length[live]]
+        tail_ptr = (self.head_ptr[shrink] - self.size[shrink] + 1) % cap
+        self.occupancy[shrink, self.body[shrink, tail_ptr]] -= 1
+        self.size[shrink] -= 1
+        self.ticks[live] += 1
+        self.alive = alive = moving
+
+        # Food drift: each food moves every move_interval ticks after it
+        # spawned. Foods spawned this tick come later, so none is due yet.
+        pos = self.food_pos
+        phase = np.where(alive, self.ticks % self.move_interval, -1).astype(self.phase_dtype)
+        due = (self.food_phase == phase[:, None]) & (pos >= 0)
+        r, c = np.nonzero(due)
+        if len(r):
+            d = self.food_dir[r, c]
+            p = pos[r, c]
+            fx = (p % self.width + DIRECTION_DX[d]) % self.width
+            fy = (p // self.width + DIRECTION_DY[d]) % self.height
+            pos[r, c] = fy * self.width + fx
+            turning = self.rng.random(len(r)) < self.turn_chance
+            self.food_dir[r[turning], c[turning]] = self.rng.integers(0, len(DIRECTIONS), int(turning.sum()))
+
+        # Replenish foods once a game is down to min_foods. As in
+        # FoodManager.update this comes before eating, so food eaten this
+        # tick is replaced on the next one.
+        self._spawn_foods(np.flatnonzero(alive & (self.food_count <= self.min_foods)))
+
+        # Eating removes every food on the head's cell and grows the snake
+        eaten = (pos == np.where(alive, new, -2)[:, None])
+        eaten_count = eaten.sum(axis=1)
+        ate = eaten_count > 0
+        pos[eaten] = -1
+        self.food_count -= eaten_count
+        self.length[ate] += 1
+        self.score[ate] += FOOD_SCORE
+        rewards = ate * FOOD_SCORE
+
+        if self.autoreset and dead.any():
+            self.reset(dead)
+        return rewards, dead
+
+    def observations(self, out=None):
+        # Stacked (n, OBS_CHANNELS, height, width) uint8 planes: body, head, food
+        if out is None:
+            out = np.empty((self.n, OBS_CHANNELS, self.height, self.width), dtype=np.uint8)
+        flat = out.reshape(self.n, OBS_CHANNELS, self.cells)
+        np.greater(self.occupancy, 0, out=flat[:, OBS_BODY])
+        flat[:, OBS_HEAD] = 0
+        flat[np.arange(self.n), OBS_HEAD, self.heads()] = 1
+        flat[:, OBS_FOOD] = 0
+        r, c = np.nonzero(self.food_pos >= 0)
+        flat[r, OBS_FOOD, self.food_pos[r, c]] = 1
+        return out
@@ -0,0 +1,242 @@
+# Frame capture for gameplay videos. FrameCapture.capture(surface) copies a
+# rendered frame into one of a fixed pool of reusable buffers and hands it to
+# a worker thread, which encodes and writes it. The render loop never waits
+# on the disk: when every buffer is still queued the frame is dropped and
+# counted. Encoding is zlib, which releases the GIL, so the worker runs
+# beside the game loop rather than taking turns with it.
+#
+# Frames go to a directory of numbered PNG files or, for a path ending in
+# STREAM_SUFFIX, to one stream of compressed frames:
+#   header  b'SNKV', version u8, width u16, height u16, fps u16
+#   frames  frame number u32, size u32, then the frame's RGB rows, zlib'd
+# Frame numbers count dropped frames too, so gaps show where they were.
+#
+# record_headless() draws a game off screen, steered by a replay or the
+# autopilot, and captures every frame without a window. From the shell:
+#   python snake_capture.py replay game.snkr out.snkv
+#   python snake_capture.py autopilot out/ --seed 3
+#   python snake_capture.py export out.snkv frames/
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+import zlib
+
+import pygame
+
+MAGIC = b'SNKV'
+VERSION = 1
+HEADER = struct.Struct('<4sBHHH')
+FRAME = struct.Struct('<II')
+STREAM_SUFFIX = '.snkv'
+POOL_SIZE = 8  # frames that can wait for the encoder before new ones drop
+COMPRESSION = 1  # zlib level; the board is mostly black, so fast is small enough
+CAPTURE_FPS = 60
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+def _png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(data, zlib.crc32(kind)))
+
+def png_bytes(width, height, rgb, level=COMPRESSION):
+    # An 8-bit RGB PNG of `rgb`, rows top to bottom, each unfiltered
+    stride = width * 3
+    view = memoryview(rgb)
+    rows = b'\0' + b'\0'.join(view[y * stride:(y + 1) * stride] for y in range(height))
+    return (PNG_SIGNATURE + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + _png_chunk(b'IDAT', zlib.compress(rows, level)) + _png_chunk(b'IEND', b''))
+
+class FrameCapture:
+    def __init__(self, path, size, fps=CAPTURE_FPS, pool_size=POOL_SIZE):
+        self.path = path
+        self.width, self.height = size
+        self.stream = None
+        if path.endswith(STREAM_SUFFIX):
+            self.stream = open(path, 'wb')
+            self.stream.write(HEADER.pack(MAGIC, VERSION, self.width, self.height, fps))
+        else:
+            os.makedirs(path, exist_ok=True)
+        # (pixels, surface drawing into them); a buffer is either free or queued
+        self.free = queue.SimpleQueue()
+        for _ in range(pool_size):
+            pixels = bytearray(self.width * self.height * 3)
+            self.free.put((pixels, pygame.image.frombuffer(pixels, size, 'RGB')))
+        self.queued = queue.SimpleQueue()
+        self.frames = 0  # frames offered, dropped or not
+        self.dropped = 0
+        self.written = 0
+        self.bytes_written = 0
+        self.encode_seconds = 0.0
+        self.error = None
+        self.worker = threading.Thread(target=self._run, name='frame-capture', daemon=True)
+        self.worker.start()
+
+    def capture(self, surface, wait=False):
+        # Queue a copy of `surface`; returns False if it was dropped. With
+        # `wait` it waits for a free buffer instead, for offline recording.
+        index = self.frames
+        self.frames += 1
+        try:
+            buffer = self.free.get(block=wait)
+        except queue.Empty:
+            self.dropped += 1
+            return False
+        buffer[1].blit(surface, (0, 0))
+        self.queued.put((index, buffer))
+        return True
+
+    def _run(self):
+        while True:
+            item = self.queued.get()
+            if item is None:
+                return
+            index, buffer = item
+            if self.error is None:
+                start = time.perf_counter()
+                try:
+                    self._write(index, buffer[0])
+                except OSError as e:
+                    self.error = e  # stop writing, but keep handing buffers back
+                self.encode_seconds += time.perf_counter() - start
+            self.free.put(buffer)
+
+    def _write(self, index, pixels):
+        if self.stream is not None:
+            data = zlib.compress(pixels, COMPRESSION)
+            self.stream.write(FRAME.pack(index, len(data)))
+            self.stream.write(data)
+        else:
+            data = png_bytes(self.width, self.height, pixels)
+            with open(os.path.join(self.path, f'frame_{index:06d}.png'), 'wb') as f:
+                f.write(data)
+        self.written += 1
+        self.bytes_written += len(data)
+
+    def close(self):
+        # Write out what is queued and stop the worker. Raises the first
+        # write error, if there was one.
+        self.queued.put(None)
+        self.worker.join()
+        if self.stream is not None:
+            self.stream.close()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        return {'frames': self.frames, 'written': self.written, 'dropped': self.dropped,
+                'bytes': self.bytes_written, 'encode_ms': self.encode_seconds * 1000 / max(self.written, 1)}
+
+def read_stream(path):
+    # ((width, height, fps), frames) for a capture stream, frames yielding
+    # (frame number, RGB pixels)
+    f = open(path, 'rb')
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        f.close()
+        raise ValueError('not a frame capture stream')
+    magic, version, width, height, fps = HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        f.close()
+        raise ValueError('not a frame capture stream')
+
+    def frames():
+        with f:
+            while True:
+                head = f.read(FRAME.size)
+                if len(head) < FRAME.size:
+                    return
+                index, size = FRAME.unpack(head)
+                data = f.read(size)
+                if len(data) < size:
+                    raise ValueError('truncated frame capture stream')
+                yield index, zlib.decompress(data)
+
+    return (width, height, fps), frames()
+
+def record_headless(game, path, steer=None, fps=CAPTURE_FPS, until=None, high_score=0):
+    # Play `game`, a snake_game.Game, off screen until it ends (or reaches
+    # tick `until`) and capture it as the window would show it at `fps`,
+    # with interpolated frames between ticks. steer() is called before each
+    # tick. The loop waits for the encoder, so no frame is dropped. Returns
+    # the capture's stats.
+    import snake_game
+    surface = pygame.Surface(snake_game.screen.get_size())
+    renderer = snake_game.FrameRenderer(surface, dirty_rects=False)
+    hud = snake_game.Hud(snake_game.get_font(None, 36))
+    pause_button = snake_game.PauseButton()
+    frames_per_tick = max(1, round(fps / game.tick_rate))
+    capture = FrameCapture(path, surface.get_size(), fps)
+    try:
+        while until is None or game.ticks < until:
+            if steer is not None:
+                steer()
+            if not game.step():
+                break
+            hud.update(game.snake.score, max(high_score, game.snake.score), len(game.food_manager.foods))
+            for i in range(frames_per_tick):
+                renderer.render(game.snake, game.food_manager, hud, pause_button, i / frames_per_tick)
+                capture.capture(surface, wait=True)
+    finally:
+        capture.close()
+    return capture.stats()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Record Snake games to PNG frames or a capture stream')
+    commands = parser.add_subparsers(dest='command', required=True)
+    replay_parser = commands.add_parser('replay', help='render a recording from snake_game.py --record')
+    replay_parser.add_argument('replay')
+    replay_parser.add_argument('out', help=f'a directory for PNG frames, or a file ending in {STREAM_SUFFIX}')
+    pilot_parser = commands.add_parser('autopilot', help='render a game played by the autopilot')
+    pilot_parser.add_argument('out', help=f'a directory for PNG frames, or a file ending in {STREAM_SUFFIX}')
+    pilot_parser.add_argument('--seed', type=int)
+    pilot_parser.add_argument('--ticks', type=int, help='stop after this many ticks')
+    for command in (replay_parser, pilot_parser):
+        command.add_argument('--fps', type=int, default=CAPTURE_FPS)
+    export_parser = commands.add_parser('export', help='write the frames of a capture stream as PNG files')
+    export_parser.add_argument('stream')
+    export_parser.add_argument('out')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        try:
+            (width, height, fps), frames = read_stream(args.stream)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        os.makedirs(args.out, exist_ok=True)
+        count = 0
+        for index, pixels in frames:
+            with open(os.path.join(args.out, f'frame_{index:06d}.png'), 'wb') as f:
+                f.write(png_bytes(width, height, pixels))
+            count += 1
+        print(f'{count} frames of {width}x{height} at {fps} fps written to {args.out}')
+        sys.exit()
+
+    # No window needed
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import snake_game
+    from snake_autopilot import Autopilot
+    from snake_replay import Replay, checksum
+    start = time.perf_counter()
+    if args.command == 'replay':
+        replay = Replay.load(args.replay)
+        game = snake_game.Game(tick_rate=replay.tick_rate, seed=replay.seed)
+        inputs = iter(replay.inputs)
+        pending = next(inputs, None)
+
+        def steer():
+            global pending
+            while pending is not None and pending[0] == game.ticks:
+                game.turn(pending[1])
+                pending = next(inputs, None)
+
+        stats = record_headless(game, args.out, steer, args.fps, replay.end_tick)
+        if game.ticks == replay.end_tick and checksum(game) != replay.checksum:
+            print('checksum mismatch: playback diverged from the recording', file=sys.stderr)
+    else:
+        game = snake_game.Game(seed=args.seed)
+        stats = record_headless(game, args.out, Autopilot(game).steer, args.fps, args.ticks)
+    elapsed = time.perf_counter() - start
+    print(f'{stats["written"]} frames ({game.ticks} ticks) written to {args.out} in {elapsed:.1f} s, '
+          f'{stats["bytes"] / max(stats["written"], 1) / 1024:.1f} KB and {stats["encode_ms"]:.1f} ms per frame')
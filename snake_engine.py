@@ -0,0 +1,382 @@
+# Game rules for Snake: grid, snake, food and scoring. Pure Python with no
+# pygame import, so it can run headless in tests, servers and worker processes.
+# snake_game.py draws on top of these classes.
+#
+# Randomness comes from an `rng` object with the random module's interface.
+# Game gives each game its own random.Random(seed), so a seed plus the player's
+# turns reproduces the game exactly; objects made on their own share the global
+# random module.
+import random
+import time
+from collections import deque
+
+# The board is 40x30 cells (an 800x600 window at 20 pixels per cell)
+GRID_WIDTH = 40
+GRID_HEIGHT = 30
+
+def set_grid_size(width, height):
+    # Board size for everything created afterwards. The rules read the size
+    # from here, so don't change it while a game is running.
+    global GRID_WIDTH, GRID_HEIGHT
+    GRID_WIDTH, GRID_HEIGHT = width, height
+
+# Directional constants
+UP = (0, -1)
+DOWN = (0, 1)
+LEFT = (-1, 0)
+RIGHT = (1, 0)
+DIRECTIONS = [UP, DOWN, LEFT, RIGHT]
+
+# Colors
+BLACK = (0, 0, 0)
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+BLUE = (0, 0, 255)
+YELLOW = (255, 255, 0)
+PURPLE = (128, 0, 128)
+ORANGE = (255, 165, 0)
+GRAY = (128, 128, 128)
+LIGHT_GRAY = (200, 200, 200)
+PINK = (255, 192, 203)
+CYAN = (0, 255, 255)
+MAGENTA = (255, 0, 255)
+LIME = (0, 255, 0)
+BROWN = (165, 42, 42)
+
+# Food colors and shapes
+FOOD_TYPES = [
+    {'color': RED, 'shape': 'circle'},
+    {'color': BLUE, 'shape': 'square'},
+    {'color': YELLOW, 'shape': 'triangle'},
+    {'color': PURPLE, 'shape': 'diamond'},
+    {'color': ORANGE, 'shape': 'star'},
+    {'color': PINK, 'shape': 'circle'},
+    {'color': CYAN, 'shape': 'square'},
+    {'color': MAGENTA, 'shape': 'triangle'},
+    {'color': LIME, 'shape': 'diamond'},
+    {'color': BROWN, 'shape': 'star'},
+    {'color': RED, 'shape': 'circle'},
+    {'color': BLUE, 'shape': 'square'}
+]
+
+FOOD_MOVE_INTERVAL = 30  # ticks between food moves
+FOOD_TURN_CHANCE = 0.1  # chance to change direction after a move
+FOOD_SCORE = 10
+ANIMATION_SPEED = 10  # ticks per food animation cycle
+COLOR_CHANGE_SECONDS = 30
+
+# Simulation ticks per second; the game speed for each difficulty
+TICK_RATE = 8
+TICK_RATE_PRESETS = {'easy': 6, 'normal': 8, 'hard': 12, 'insane': 16}
+
+class Snake:
+    def __init__(self, rng=None):
+        self.rng = random if rng is None else rng
+        # Per-cell segment counts so the collision test doesn't scan the body
+        self.occupancy = bytearray(GRID_WIDTH * GRID_HEIGHT)
+        self._positions = deque()
+        self.reset()
+
+    @property
+    def positions(self):
+        # Head first, tail last, as a tuple. The deque itself stays private so
+        # every change goes through update() or the setter, which keep the
+        # occupancy grid in step; subclasses read _positions directly.
+        return tuple(self._positions)
+
+    @positions.setter
+    def positions(self, cells):
+        self._positions = deque(cells)
+        self.occupancy = bytearray(GRID_WIDTH * GRID_HEIGHT)
+        for x, y in self._positions:
+            self.occupancy[y * GRID_WIDTH + x] += 1
+
+    def get_head_position(self):
+        return self._positions[0]
+
+    def is_occupied(self, position):
+        return self.occupancy[position[1] * GRID_WIDTH + position[0]] > 0
+
+    def update(self):
+        positions = self._positions
+        cur = positions[0]
+        x, y = self.direction
+        new = ((cur[0] + x) % GRID_WIDTH, (cur[1] + y) % GRID_HEIGHT)
+        index = new[1] * GRID_WIDTH + new[0]
+        # Same rule as checking positions[3:]: the first three segments
+        # (head and neck) never count as a hit
+        hits = self.occupancy[index]
+        if hits:
+            for i in range(min(3, len(positions))):
+                if positions[i] == new:
+                    hits -= 1
+            if hits > 0:
+                return False
+        positions.appendleft(new)
+        self.occupancy[index] += 1
+        if len(positions) > self.length:
+            tail = positions.pop()
+            self.occupancy[tail[1] * GRID_WIDTH + tail[0]] -= 1
+        return True
+
+    def reset(self):
+        self.length = 1
+        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self.direction = self.rng.choice(DIRECTIONS)
+        self.color = GREEN
+        self.score = 0
+        self.last_color_change = time.time()
+        self.colors = [GREEN, BLUE, YELLOW, PURPLE, ORANGE]
+        self.current_color_index = 0
+
+    def change_color(self, new_color=None, now=None):
+        # `now` is the game's simulated time in seconds; wall-clock by default
+        if new_color is not None:
+            self.color = new_color
+        else:
+            current_time = time.time() if now is None else now
+            if current_time - self.last_color_change >= COLOR_CHANGE_SECONDS:
+                self.current_color_index = (self.current_color_index + 1) % len(self.colors)
+                self.color = self.colors[self.current_color_index]
+                self.last_color_change = current_time
+
+class Food:
+    move_interval = FOOD_MOVE_INTERVAL  # for foods that are their own clock
+
+    def __init__(self, clock=None, rng=None):
+        # Counters are derived from the owning FoodManager's tick; a food
+        # created on its own keeps its own tick and is advanced by update()
+        self.clock = self if clock is None else clock
+        if rng is None:
+            rng = random if clock is None else clock.rng
+        self.rng = rng
+        self.tick = 0
+        self.born = self.clock.tick
+        self.position = (0, 0)
+        self.current_food = rng.choice(FOOD_TYPES)
+        self.randomize_position()
+        self.direction = rng.choice(DIRECTIONS)
+        self.animation_speed = ANIMATION_SPEED
+        self.slot = None  # index in FoodManager.foods
+
+    @property
+    def move_counter(self):
+        return (self.clock.tick - self.born) % self.clock.move_interval
+
+    @property
+    def animation_frame(self):
+        return (self.clock.tick - self.born) % self.animation_speed
+
+    def randomize_position(self):
+        self.position = (self.rng.randint(0, GRID_WIDTH-1),
+                        self.rng.randint(0, GRID_HEIGHT-1))
+        self.current_food = self.rng.choice(FOOD_TYPES)
+        self.direction = self.rng.choice(DIRECTIONS)
+
+    def update(self):
+        # Move every move_interval ticks. Foods owned by a FoodManager are moved by it.
+        if self.clock is self:
+            self.tick += 1
+            if self.move_counter == 0:
+                self.move()
+
+    def move(self):
+        x, y = self.direction
+        new_x = (self.position[0] + x) % GRID_WIDTH
+        new_y = (self.position[1] + y) % GRID_HEIGHT
+        self.position = (new_x, new_y)
+
+        # Randomly change direction
+        if self.rng.random() < FOOD_TURN_CHANCE:
+            self.direction = self.rng.choice(DIRECTIONS)
+
+class CellPool:
+    # Set of grid cells with O(1) add, remove and random choice
+    def __init__(self, cells=()):
+        self.cells = list(dict.fromkeys(cells))
+        self.index = {cell: i for i, cell in enumerate(self.cells)}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell):
+        return cell in self.index
+
+    def __iter__(self):
+        return iter(self.cells)
+
+    def add(self, cell):
+        if cell not in self.index:
+            self.index[cell] = len(self.cells)
+            self.cells.append(cell)
+
+    def remove(self, cell):
+        i = self.index.pop(cell, None)
+        if i is None:
+            return
+        last = self.cells.pop()
+        if i < len(self.cells):
+            self.cells[i] = last
+            self.index[last] = i
+
+    def choice(self, rng=random):
+        return self.cells[rng.randrange(len(self.cells))]
+
+class FoodManager:
+    food_class = Food  # front ends swap in a drawable subclass
+
+    def __init__(self, snake=None, max_foods=50, min_foods=40, rng=None, move_interval=FOOD_MOVE_INTERVAL):
+        self.snake = snake
+        self.rng = random if rng is None else rng
+        self.foods = []
+        self.by_position = {}  # position -> foods on that cell
+        self.free_cells = CellPool((x, y) for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH))
+        # Foods move every move_interval ticks after they spawn, so they are
+        # bucketed by spawn tick and each update only visits the due bucket
+        self.tick = 0
+        self.move_interval = move_interval
+        self.move_buckets = [{} for _ in range(move_interval)]
+        self.max_foods = max_foods
+        self.min_foods = min_foods
+        self.initialize_foods()
+
+    def initialize_foods(self):
+        # Create initial set of foods
+        for _ in range(self.max_foods):
+            if self.add_new_food() is None:
+                break
+
+    def _random_free_cell(self):
+        # Cells without food; snake cells are rejected here and, if the snake
+        # covers most of the board, filtered out in one pass instead
+        if not self.free_cells:
+            return None
+        if self.snake is None:
+            return self.free_cells.choice(self.rng)
+        for _ in range(16):
+            cell = self.free_cells.choice(self.rng)
+            if not self.snake.is_occupied(cell):
+                return cell
+        cells = [cell for cell in self.free_cells if not self.snake.is_occupied(cell)]
+        return self.rng.choice(cells) if cells else None
+
+    def _place(self, food):
+        foods = self.by_position.get(food.position)
+        if foods is None:
+            self.by_position[food.position] = [food]
+            self.free_cells.remove(food.position)
+        else:
+            foods.append(food)
+
+    def _unplace(self, food, position):
+        foods = self.by_position[position]
+        foods.remove(food)
+        if not foods:
+            del self.by_position[position]
+            self.free_cells.add(position)
+
+    def add_new_food(self):
+        # Create new food on a random cell that holds neither food nor snake
+        cell = self._random_free_cell()
+        if cell is None:
+            return None
+        new_food = self.food_class(self)
+        new_food.position = cell
+        new_food.slot = len(self.foods)
+        self.foods.append(new_food)
+        self.move_buckets[new_food.born % self.move_interval][new_food] = None
+        self._place(new_food)
+        return new_food
+
+    def update(self):
+        # Advance every food by one tick; only the ones due to move are visited
+        self.tick += 1
+        for food in self.move_buckets[self.tick % self.move_interval]:
+            position = food.position
+            food.move()
+            if food.position != position:
+                self._unplace(food, position)
+                self._place(food)
+
+        # Check if we need to replenish foods
+        if len(self.foods) <= self.min_foods:
+            # Add new foods until we reach max_foods
+            while len(self.foods) < self.max_foods:
+                if self.add_new_food() is None:
+                    break
+
+    def food_at(self, position):
+        foods = self.by_position.get(position)
+        return foods[0] if foods else None
+
+    def remove_food(self, position):
+        # Remove every food at the given position
+        foods = self.by_position.pop(position, None)
+        if not foods:
+            return
+        self.free_cells.add(position)
+        for food in foods:
+            del self.move_buckets[food.born % self.move_interval][food]
+            # Swap-remove from the foods list
+            last = self.foods.pop()
+            if last is not food:
+                self.foods[food.slot] = last
+                last.slot = food.slot
+
+class Game:
+    # One game: a snake, its food and the per-tick rules. Time inside the
+    # game is counted in ticks, tick_rate of them per simulated second.
+    # A snake and food manager made here draw from the game's own seeded rng;
+    # ones passed in keep whatever rng they were given, and their own food
+    # counts and move interval.
+    snake_class = Snake  # front ends swap in drawable subclasses
+    food_manager_class = FoodManager
+
+    def __init__(self, snake=None, food_manager=None, tick_rate=TICK_RATE, seed=None, max_foods=50, min_foods=40,
+                 food_move_interval=FOOD_MOVE_INTERVAL):
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.snake = snake if snake is not None else self.snake_class(self.rng)
+        if food_manager is None:
+            food_manager = self.food_manager_class(self.snake, max_foods, min_foods, self.rng, food_move_interval)
+        self.food_manager = food_manager
+        self.tick_rate = tick_rate
+        self.ticks = 0
+        self.over = False
+        self.snake.last_color_change = 0
+
+    @property
+    def elapsed(self):
+        # Simulated seconds since the game started
+        return self.ticks / self.tick_rate
+
+    def turn(self, direction):
+        # Turning straight back into the neck is ignored
+        x, y = self.snake.direction
+        if direction != (-x, -y):
+            self.snake.direction = direction
+
+    def step(self):
+        # Advance one tick; returns False once the snake has hit itself
+        snake = self.snake
+        if self.over or not snake.update():
+            self.over = True
+            return False
+        self.ticks += 1
+
+        # Update foods
+        self.food_manager.update()
+
+        # Check if snake ate any food
+        head_pos = snake.get_head_position()
+        food = self.food_manager.food_at(head_pos)
+        if food is not None:
+            snake.length += 1
+            snake.score += FOOD_SCORE
+            snake.change_color(food.current_food['color'])
+            self.food_manager.remove_food(head_pos)
+
+        # Change snake color every 30 seconds (only if not changed by eating)
+        snake.change_color(now=self.elapsed)
+        return True
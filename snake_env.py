@@ -0,0 +1,121 @@
+# One Snake game behind a Gym-style reset()/step() interface, for training
+# agents. Actions are indexes into snake_engine.DIRECTIONS, or NO_TURN to
+# keep going; turning back into the neck is ignored. The reward is the score
+# gained, as in snake_batch.
+#
+# Observations are NumPy arrays that the environment owns and overwrites on
+# the next reset() or step(); copy one to keep it.
+#   'grid'    (OBS_CHANNELS, height, width) uint8 body/head/food planes, the
+#             same layout as snake_batch.BatchEnv.observations()
+#   'pixels'  (height, width, 3) uint8 RGB frame of the board, divided in
+#             size by `downscale`. The board is drawn off screen into a
+#             surface made over our own buffer (pygame.image.frombuffer) and
+#             the array is a view of that buffer, so nothing is copied out.
+#             A surfarray.pixels3d view would lock the surface and stop the
+#             next frame's blits. Downscaling is nearest-neighbour, as a
+#             strided view taking every downscale-th pixel: free too, but
+#             the array isn't contiguous.
+# With frame_skip each action is repeated for that many ticks, or until the
+# game ends, and only the last observation is produced. Requires numpy;
+# pixel observations also need pygame and draw with snake_game's sprites.
+import os
+import random
+
+import numpy as np
+
+import snake_engine
+from snake_engine import DIRECTIONS, BLACK
+from snake_batch import NO_TURN, OBS_BODY, OBS_HEAD, OBS_FOOD, OBS_CHANNELS
+
+GRID = 'grid'
+PIXELS = 'pixels'
+OBSERVATIONS = (GRID, PIXELS)
+
+class SnakeEnv:
+    def __init__(self, observation=GRID, downscale=1, frame_skip=1, max_foods=50, min_foods=40, max_ticks=None,
+                 seed=None):
+        if observation not in OBSERVATIONS:
+            raise ValueError(f'observation must be one of {OBSERVATIONS}')
+        if frame_skip < 1 or downscale < 1:
+            raise ValueError('frame_skip and downscale must be at least 1')
+        self.observation = observation
+        self.frame_skip = frame_skip
+        self.max_foods = max_foods
+        self.min_foods = min_foods
+        self.max_ticks = max_ticks  # episodes are truncated here
+        self.rng = random.Random(seed)  # seeds for episodes reset() isn't given one for
+        self.width = width = snake_engine.GRID_WIDTH
+        self.height = height = snake_engine.GRID_HEIGHT
+        self.game = None
+        if observation == GRID:
+            self.game_class = snake_engine.Game
+            self.obs = np.zeros((OBS_CHANNELS, height, width), dtype=np.uint8)
+            return
+
+        # Pixel observations draw with the game's sprites. snake_game opens
+        # its window on import, so use SDL's dummy driver unless told otherwise.
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        import pygame
+        import snake_game
+        self.game_class = snake_game.Game
+        size = (width * snake_game.GRID_SIZE, height * snake_game.GRID_SIZE)
+        self.frame_buffer = bytearray(size[0] * size[1] * 3)
+        self.frame = pygame.image.frombuffer(self.frame_buffer, size, 'RGB')
+        pixels = np.frombuffer(self.frame_buffer, dtype=np.uint8).reshape(size[1], size[0], 3)
+        self.obs = pixels[::downscale, ::downscale]
+
+    def reset(self, seed=None):
+        # Start a new episode; returns (observation, info)
+        if seed is None:
+            seed = self.rng.randrange(2 ** 32)
+        self.game = self.game_class(seed=seed, max_foods=self.max_foods, min_foods=self.min_foods)
+        return self._observe(), self._info()
+
+    def step(self, action):
+        # Returns (observation, reward, terminated, truncated, info)
+        game = self.game
+        if game is None or game.over:
+            raise RuntimeError('call reset() to start an episode')
+        if not NO_TURN <= action < len(DIRECTIONS):
+            raise ValueError(f'action must be NO_TURN ({NO_TURN}) or a direction index below {len(DIRECTIONS)}')
+        if action != NO_TURN:
+            game.turn(DIRECTIONS[action])
+        score = game.snake.score
+        for _ in range(self.frame_skip):
+            if not game.step():
+                break
+            if self.max_ticks is not None and game.ticks >= self.max_ticks:
+                break
+        terminated = game.over
+        truncated = not terminated and self.max_ticks is not None and game.ticks >= self.max_ticks
+        return self._observe(), game.snake.score - score, terminated, truncated, self._info()
+
+    def _info(self):
+        game = self.game
+        return {'score': game.snake.score, 'length': game.snake.length, 'ticks': game.ticks, 'seed': game.seed}
+
+    def _observe(self):
+        if self.observation == GRID:
+            return self._grid()
+        return self._pixels()
+
+    def _grid(self):
+        game = self.game
+        width = self.width
+        planes = self.obs.reshape(OBS_CHANNELS, -1)
+        snake = game.snake
+        np.greater(np.frombuffer(snake.occupancy, dtype=np.uint8), 0, out=planes[OBS_BODY])
+        planes[OBS_HEAD] = 0
+        x, y = snake.get_head_position()
+        planes[OBS_HEAD, y * width + x] = 1
+        planes[OBS_FOOD] = 0
+        planes[OBS_FOOD, [y * width + x for x, y in game.food_manager.by_position]] = 1
+        return self.obs
+
+    def _pixels(self):
+        game = self.game
+        frame = self.frame
+        frame.fill(BLACK)
+        game.snake.render(frame)
+        game.food_manager.render(frame)
+        return self.obs
@@ -0,0 +1,260 @@
+# Food for boards with thousands of creatures, kept as columns of NumPy arrays
+# instead of one Python object per food. It has FoodManager's interface, so a
+# Game can use it in place of one. Requires numpy.
+#
+# Like FoodManager, the move counter and animation frame of every food are
+# derived from one shared tick, so advancing all of them is `tick += 1`, and
+# each update moves only the foods whose counter has come round to zero.
+import random
+
+import numpy as np
+
+import snake_engine
+from snake_engine import DIRECTIONS, FOOD_TYPES, FOOD_MOVE_INTERVAL, FOOD_TURN_CHANCE, ANIMATION_SPEED
+from snake_batch import DIRECTION_DX, DIRECTION_DY
+
+class FoodView:
+    # A food read from the store, for code written against Food objects.
+    # Views refer to a row, so take them fresh after foods are removed.
+    __slots__ = ('store', 'slot')
+
+    def __init__(self, store, slot):
+        self.store = store
+        self.slot = slot
+
+    @property
+    def position(self):
+        return (int(self.store.x[self.slot]), int(self.store.y[self.slot]))
+
+    @property
+    def direction(self):
+        return DIRECTIONS[self.store.direction[self.slot]]
+
+    @property
+    def current_food(self):
+        return FOOD_TYPES[self.store.type[self.slot]]
+
+    @property
+    def born(self):
+        return int(self.store.born[self.slot])
+
+    @property
+    def move_counter(self):
+        return (self.store.tick - self.born) % self.store.move_interval
+
+    @property
+    def animation_frame(self):
+        return (self.store.tick - self.born) % ANIMATION_SPEED
+
+class FoodList:
+    # Sequence of views over the live rows, standing in for FoodManager.foods
+    __slots__ = ('store',)
+
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store.count
+
+    def __getitem__(self, slot):
+        count = self.store.count
+        if slot < 0:
+            slot += count
+        if not 0 <= slot < count:
+            raise IndexError('food index out of range')
+        return FoodView(self.store, slot)
+
+    def __iter__(self):
+        return (FoodView(self.store, slot) for slot in range(self.store.count))
+
+class FoodStore:
+    # Rows 0..count-1 are live foods; removal swaps the last row into the gap.
+    #   x, y       cell of each food
+    #   direction  index into DIRECTIONS
+    #   type       index into FOOD_TYPES
+    #   born       tick the food spawned; phase is born % move_interval
+    #   cell_count foods on each cell, so lookups rarely have to search
+    # With chunk_size the store also indexes rows by chunk_size-square block
+    # of cells (chunks and chunk_count), so drawing part of a big board only
+    # looks at the foods near it.
+    def __init__(self, snake=None, max_foods=50, min_foods=40, rng=None, turn_chance=FOOD_TURN_CHANCE,
+                 chunk_size=None, move_interval=FOOD_MOVE_INTERVAL):
+        self.snake = snake
+        self.rng = random if rng is None else rng
+        # Turns are drawn in bulk from a generator seeded by the game's rng
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        self.width = snake_engine.GRID_WIDTH
+        self.height = snake_engine.GRID_HEIGHT
+        self.max_foods = max_foods
+        self.min_foods = min_foods
+        self.turn_chance = turn_chance
+        self.move_interval = move_interval
+        self.tick = 0
+        self.count = 0
+        capacity = max(max_foods, 16)
+        self.x = np.zeros(capacity, dtype=np.int16)
+        self.y = np.zeros(capacity, dtype=np.int16)
+        self.direction = np.zeros(capacity, dtype=np.int8)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.born = np.zeros(capacity, dtype=np.int32)
+        self.phase = np.zeros(capacity, dtype=np.int8 if move_interval <= 128 else np.int32)
+        self.cell_count = np.zeros(self.width * self.height, dtype=np.uint16)
+        self.chunk_size = chunk_size
+        self.chunks = None
+        if chunk_size:
+            self.chunks_x = -(-self.width // chunk_size)
+            self.chunks_y = -(-self.height // chunk_size)
+            self.chunks = {}  # chunk -> set of rows
+            self.chunk_count = np.zeros(self.chunks_x * self.chunks_y, dtype=np.int32)
+        self.foods = FoodList(self)
+        self.initialize_foods()
+
+    @property
+    def move_counters(self):
+        return (self.tick - self.born[:self.count]) % self.move_interval
+
+    @property
+    def animation_frames(self):
+        return (self.tick - self.born[:self.count]) % ANIMATION_SPEED
+
+    def _chunk(self, slot):
+        size = self.chunk_size
+        return int(self.y[slot]) // size * self.chunks_x + int(self.x[slot]) // size
+
+    def _chunks_of(self, x, y):
+        size = self.chunk_size
+        return y // size * self.chunks_x + x // size
+
+    def initialize_foods(self):
+        for _ in range(self.max_foods):
+            if self.add_new_food() is None:
+                break
+
+    def _grow(self):
+        capacity = len(self.x) * 2
+        for name in ('x', 'y', 'direction', 'type', 'born', 'phase'):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _random_free_cell(self):
+        # A cell holding neither food nor snake: a few random tries, then one
+        # pass over the board
+        cells = self.width * self.height
+        occupancy = None if self.snake is None else self.snake.occupancy
+        for _ in range(16):
+            cell = self.rng.randrange(cells)
+            if not self.cell_count[cell] and not (occupancy and occupancy[cell]):
+                return cell
+        free = self.cell_count == 0
+        if occupancy is not None:
+            free &= np.frombuffer(occupancy, dtype=np.uint8) == 0
+        free = np.flatnonzero(free)
+        return int(free[self.rng.randrange(len(free))]) if len(free) else None
+
+    def add_new_food(self):
+        cell = self._random_free_cell()
+        if cell is None:
+            return None
+        if self.count == len(self.x):
+            self._grow()
+        slot = self.count
+        self.x[slot] = cell % self.width
+        self.y[slot] = cell // self.width
+        self.type[slot] = self.rng.randrange(len(FOOD_TYPES))
+        self.direction[slot] = self.rng.randrange(len(DIRECTIONS))
+        self.born[slot] = self.tick
+        self.phase[slot] = self.tick % self.move_interval
+        self.cell_count[cell] += 1
+        self.count += 1
+        if self.chunks is not None:
+            chunk = self._chunk(slot)
+            self.chunks.setdefault(chunk, set()).add(slot)
+            self.chunk_count[chunk] += 1
+        return FoodView(self, slot)
+
+    def update(self):
+        self.tick += 1
+        count = self.count
+        due = np.flatnonzero(self.phase[:count] == self.tick % self.move_interval)
+        if len(due):
+            width, height = self.width, self.height
+            x = self.x[due].astype(np.int32)
+            y = self.y[due].astype(np.int32)
+            np.subtract.at(self.cell_count, y * width + x, 1)
+            if self.chunks is not None:
+                old_chunks = self._chunks_of(x, y)
+            d = self.direction[due]
+            x = (x + DIRECTION_DX[d]) % width
+            y = (y + DIRECTION_DY[d]) % height
+            np.add.at(self.cell_count, y * width + x, 1)
+            self.x[due] = x
+            self.y[due] = y
+            if self.chunks is not None:
+                # Only a food stepping over a chunk edge changes chunk
+                new_chunks = self._chunks_of(x, y)
+                crossed = np.flatnonzero(old_chunks != new_chunks)
+                if len(crossed):
+                    old, new = old_chunks[crossed], new_chunks[crossed]
+                    np.subtract.at(self.chunk_count, old, 1)
+                    np.add.at(self.chunk_count, new, 1)
+                    chunks = self.chunks
+                    for slot, a, b in zip(due[crossed].tolist(), old.tolist(), new.tolist()):
+                        chunks[a].discard(slot)
+                        chunks.setdefault(b, set()).add(slot)
+            turning = due[self.np_rng.random(len(due)) < self.turn_chance]
+            self.direction[turning] = self.np_rng.integers(0, len(DIRECTIONS), len(turning))
+
+        # Check if we need to replenish foods
+        if self.count <= self.min_foods:
+            while self.count < self.max_foods:
+                if self.add_new_food() is None:
+                    break
+
+    def _slots_at(self, position):
+        x, y = position
+        if not self.cell_count[y * self.width + x]:
+            return ()
+        count = self.count
+        return np.flatnonzero((self.x[:count] == x) & (self.y[:count] == y))
+
+    def food_at(self, position):
+        slots = self._slots_at(position)
+        return FoodView(self, int(slots[0])) if len(slots) else None
+
+    def remove_food(self, position):
+        # Remove every food at the given position
+        slots = self._slots_at(position)
+        if not len(slots):
+            return
+        self.cell_count[position[1] * self.width + position[0]] = 0
+        # Highest rows first, so the row swapped in is never one still to remove
+        for slot in slots[::-1].tolist():
+            last = self.count - 1
+            if self.chunks is not None:
+                chunk = self._chunk(slot)
+                self.chunks[chunk].discard(slot)
+                self.chunk_count[chunk] -= 1
+                if slot != last:
+                    chunk = self._chunk(last)
+                    self.chunks[chunk].discard(last)
+                    self.chunks[chunk].add(slot)
+            if slot != last:
+                for column in (self.x, self.y, self.direction, self.type, self.born, self.phase):
+                    column[slot] = column[last]
+            self.count = last
+
+    def slots_in(self, x0, y0, cols, rows):
+        # Rows of the foods in the cols x rows cells from (x0, y0), wrapping
+        # round the board edges, in row order. Needs chunk_size.
+        width, height, size = self.width, self.height, self.chunk_size
+        xs = {(x0 + i) % width // size for i in range(cols)}
+        ys = {(y0 + j) % height // size for j in range(rows)}
+        chunks = self.chunks
+        found = [slot for cy in ys for cx in xs for slot in chunks.get(cy * self.chunks_x + cx, ())]
+        if not found:
+            return np.zeros(0, dtype=np.intp)
+        slots = np.array(found, dtype=np.intp)
+        inside = (((self.x[slots] - x0) % width < cols) & ((self.y[slots] - y0) % height < rows))
+        return np.sort(slots[inside])
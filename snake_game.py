@@ -1,40 +1,43 @@
 import pygame
-import random
 import sys
-import time
 import os
 import math
-import json
+import random
+from collections import OrderedDict
+
+import snake_engine
+from snake_replay import Recorder
+from snake_capture import FrameCapture
+from snake_snapshot import RewindBuffer, load, save
+from snake_leaderboard import Leaderboard, LEADERBOARD_FILE, LEGACY_HIGH_SCORE_FILE
+from snake_autopilot import Autopilot
+from snake_profiler import FrameProfiler, NULL_PROFILER, PHASES, EVENTS, UPDATE, RENDER, PRESENT
+from snake_engine import (GRID_WIDTH, GRID_HEIGHT, UP, DOWN, LEFT, RIGHT, FOOD_MOVE_INTERVAL, ANIMATION_SPEED,
+                          TICK_RATE, TICK_RATE_PRESETS, BLACK, WHITE, RED, GREEN, GRAY, LIGHT_GRAY)
+try:
+    import numpy as np
+    from snake_foodstore import FoodStore
+except ImportError:  # only large-world mode needs numpy
+    np = FoodStore = None
 
 # Initialize Pygame
 pygame.init()
 
 # Constants
-WINDOW_WIDTH = 800
-WINDOW_HEIGHT = 600
 GRID_SIZE = 20
-GRID_WIDTH = WINDOW_WIDTH // GRID_SIZE
-GRID_HEIGHT = WINDOW_HEIGHT // GRID_SIZE
-
-# High score file path
-HIGH_SCORE_FILE = 'high_score.json'
-
-# Colors
-BLACK = (0, 0, 0)
-WHITE = (255, 255, 255)
-RED = (255, 0, 0)
-GREEN = (0, 255, 0)
-BLUE = (0, 0, 255)
-YELLOW = (255, 255, 0)
-PURPLE = (128, 0, 128)
-ORANGE = (255, 165, 0)
-GRAY = (128, 128, 128)
-LIGHT_GRAY = (200, 200, 200)
-PINK = (255, 192, 203)
-CYAN = (0, 255, 255)
-MAGENTA = (255, 0, 255)
-LIME = (0, 255, 0)
-BROWN = (165, 42, 42)
+WINDOW_WIDTH = GRID_WIDTH * GRID_SIZE
+WINDOW_HEIGHT = GRID_HEIGHT * GRID_SIZE
+
+# Rendering runs at the display rate and the simulation at its own tick rate
+# (snake_engine.TICK_RATE); positions are interpolated between ticks
+RENDER_FPS = 60
+INTERPOLATE_MOVEMENT = True
+ANIMATION_SUBFRAMES = 4  # in-between food animation frames per tick
+MAX_TICKS_PER_FRAME = 5  # catch-up cap after a slow frame
+
+# Backspace rewinds the game, F5 saves it and F9 loads the save back
+REWIND_SECONDS = 5
+SAVE_FILE = 'savegame.snk'
 
 # Set up the display
 screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
@@ -45,21 +48,28 @@ clock = pygame.time.Clock()
 if not os.path.exists('images'):
     os.makedirs('images')
 
-# Food colors and shapes
-FOOD_TYPES = [
-    {'color': RED, 'shape': 'circle'},
-    {'color': BLUE, 'shape': 'square'},
-    {'color': YELLOW, 'shape': 'triangle'},
-    {'color': PURPLE, 'shape': 'diamond'},
-    {'color': ORANGE, 'shape': 'star'},
-    {'color': PINK, 'shape': 'circle'},
-    {'color': CYAN, 'shape': 'square'},
-    {'color': MAGENTA, 'shape': 'triangle'},
-    {'color': LIME, 'shape': 'diamond'},
-    {'color': BROWN, 'shape': 'star'},
-    {'color': RED, 'shape': 'circle'},
-    {'color': BLUE, 'shape': 'square'}
-]
+# Fonts are loaded once per (name, size); rendered text is kept in a small
+# LRU cache so unchanged labels and HUD values are not re-rendered
+TEXT_CACHE_SIZE = 256
+_fonts = {}
+_text_cache = OrderedDict()
+
+def get_font(name, size):
+    font = _fonts.get((name, size))
+    if font is None:
+        font = _fonts[(name, size)] = pygame.font.Font(name, size)
+    return font
+
+def render_text(font, text, color):
+    key = (font, text, color)
+    surface = _text_cache.get(key)
+    if surface is None:
+        surface = _text_cache[key] = font.render(text, True, color)
+        if len(_text_cache) > TEXT_CACHE_SIZE:
+            _text_cache.popitem(last=False)
+    else:
+        _text_cache.move_to_end(key)
+    return surface
 
 class Button:
     def __init__(self, x, y, width, height, text, color, hover_color):
@@ -68,14 +78,14 @@ class Button:
         self.color = color
         self.hover_color = hover_color
         self.is_hovered = False
-        self.font = pygame.font.Font(None, 36)
+        self.font = get_font(None, 36)
 
     def draw(self, surface):
         color = self.hover_color if self.is_hovered else self.color
         pygame.draw.rect(surface, color, self.rect)
         pygame.draw.rect(surface, BLACK, self.rect, 2)  # Border
         
-        text_surface = self.font.render(self.text, True, BLACK)
+        text_surface = render_text(self.font, self.text, BLACK)
         text_rect = text_surface.get_rect(center=self.rect.center)
         surface.blit(text_surface, text_rect)
 
@@ -123,433 +133,1035 @@ class PauseButton:
                 return True
         return False
 
-class Snake:
-    def __init__(self):
-        self.reset()
-
-    def get_head_position(self):
-        return self.positions[0]
+class Snake(snake_engine.Snake):
+    # Game rules come from snake_engine; this adds drawing and the cell
+    # tracking used by dirty-rect rendering
+    def __init__(self, rng=None):
+        self.dirty_cells = set()  # cells to redraw in dirty-rect mode
+        self.drawn_state = None  # (color, direction) last seen by the renderer
+        super().__init__(rng)
 
     def update(self):
-        cur = self.get_head_position()
-        x, y = self.direction
-        new = ((cur[0] + x) % GRID_WIDTH, (cur[1] + y) % GRID_HEIGHT)
-        if new in self.positions[3:]:
+        positions = self._positions
+        head = positions[0]
+        tail = positions[-1]
+        length = len(positions)
+        if not super().update():
             return False
-        self.positions.insert(0, new)
-        if len(self.positions) > self.length:
-            self.positions.pop()
+        # The old head loses its eyes; the old tail may have been dropped
+        self.dirty_cells.add(head)
+        self.dirty_cells.add(positions[0])
+        self.dirty_cells.add(tail)
+        # Where the last segment came from, for interpolation
+        self.moved = True
+        self.trail = tail if len(positions) == length else None
         return True
 
     def reset(self):
-        self.length = 1
-        self.positions = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.color = GREEN
-        self.score = 0
-        self.last_color_change = time.time()
-        self.colors = [GREEN, BLUE, YELLOW, PURPLE, ORANGE]
-        self.current_color_index = 0
-
-    def change_color(self, new_color=None):
-        if new_color is not None:
-            self.color = new_color
-        else:
-            current_time = time.time()
-            if current_time - self.last_color_change >= 30:
-                self.current_color_index = (self.current_color_index + 1) % len(self.colors)
-                self.color = self.colors[self.current_color_index]
-                self.last_color_change = current_time
+        self.dirty_cells.update(self._positions)
+        super().reset()
+        self.dirty_cells.update(self._positions)
+        self.moved = False
+        self.trail = None
+
+    def collect_dirty_cells(self, cells):
+        # Move this tick's changed cells into `cells`; a new colour repaints
+        # the whole body and a turn repaints the head
+        state = (self.color, self.direction)
+        if state != self.drawn_state:
+            if self.drawn_state is None or state[0] != self.drawn_state[0]:
+                cells.update(self._positions)
+            else:
+                cells.add(self._positions[0])
+            self.drawn_state = state
+        cells |= self.dirty_cells
+        self.dirty_cells.clear()
+
+    def _draw_head(self, surface, p):
+        surface.blit(get_head_sprite(self.color, self.direction), (p[0] * GRID_SIZE, p[1] * GRID_SIZE))
 
     def render(self, surface):
-        for i, p in enumerate(self.positions):
-            if i == 0:  # Head
-                pygame.draw.rect(surface, self.color,
-                               (p[0] * GRID_SIZE, p[1] * GRID_SIZE,
-                                GRID_SIZE, GRID_SIZE))
-                
-                eye_size = GRID_SIZE // 4
-                eye_offset = GRID_SIZE // 4
-                
-                if self.direction == UP:
-                    left_eye = (p[0] * GRID_SIZE + eye_offset, p[1] * GRID_SIZE + eye_offset)
-                    right_eye = (p[0] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size, p[1] * GRID_SIZE + eye_offset)
-                elif self.direction == DOWN:
-                    left_eye = (p[0] * GRID_SIZE + eye_offset, p[1] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size)
-                    right_eye = (p[0] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size, p[1] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size)
-                elif self.direction == LEFT:
-                    left_eye = (p[0] * GRID_SIZE + eye_offset, p[1] * GRID_SIZE + eye_offset)
-                    right_eye = (p[0] * GRID_SIZE + eye_offset, p[1] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size)
-                else:  # RIGHT
-                    left_eye = (p[0] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size, p[1] * GRID_SIZE + eye_offset)
-                    right_eye = (p[0] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size, p[1] * GRID_SIZE + GRID_SIZE - eye_offset - eye_size)
-                
-                pygame.draw.rect(surface, WHITE, (*left_eye, eye_size, eye_size))
-                pygame.draw.rect(surface, WHITE, (*right_eye, eye_size, eye_size))
-                
-                pupil_size = eye_size // 2
-                pygame.draw.rect(surface, BLACK, (left_eye[0] + pupil_size//2, left_eye[1] + pupil_size//2, pupil_size, pupil_size))
-                pygame.draw.rect(surface, BLACK, (right_eye[0] + pupil_size//2, right_eye[1] + pupil_size//2, pupil_size, pupil_size))
-            else:  # Body
-                pygame.draw.rect(surface, self.color,
-                               (p[0] * GRID_SIZE, p[1] * GRID_SIZE,
-                                GRID_SIZE, GRID_SIZE))
-
-class FoodManager:
-    def __init__(self):
-        self.foods = []
-        self.max_foods = 50
-        self.min_foods = 40
-        self.initialize_foods()
-
-    def initialize_foods(self):
-        # Create initial set of foods
-        for _ in range(self.max_foods):
-            self.add_new_food()
-
-    def add_new_food(self):
-        # Create new food at random position
-        new_food = Food()
-        # Make sure new food doesn't overlap with existing foods
-        while any(food.position == new_food.position for food in self.foods):
-            new_food.randomize_position()
-        self.foods.append(new_food)
+        # The head, then the body as one rect per straight run of segments
+        positions = self._positions
+        self._draw_head(surface, positions[0])
+        if len(positions) > 1:
+            corners = [(x * GRID_SIZE, y * GRID_SIZE) for x, y in positions]
+            del corners[0]
+            for rect in merge_squares(corners):
+                pygame.draw.rect(surface, self.color, rect)
+
+    def render_interpolated(self, surface, alpha):
+        # Draw each segment `alpha` of the way from its cell on the previous
+        # tick to its current one. Segment i came from where segment i + 1 is,
+        # and the last one from `trail` (or nowhere, if the snake grew).
+        if not self.moved:
+            self.render(surface)
+            return
+        cells = []
+        prev = self.trail
+        for p in reversed(self._positions):
+            cells.append(lerp_cell(p if prev is None else prev, p, alpha))
+            prev = p
+        self._draw_head(surface, cells.pop())
+        for rect in merge_squares([(round(x * GRID_SIZE), round(y * GRID_SIZE)) for x, y in cells]):
+            pygame.draw.rect(surface, self.color, rect)
+
+    def render_area(self, surface, area):
+        # Redraw the segments inside `area`. A body segment sharing the head's
+        # cell paints over the eyes, exactly as render() does.
+        head = self._positions[0]
+        x0, y0, x1, y1 = area_to_cells(area)
+        for y in range(y0, y1 + 1):
+            row = y * GRID_WIDTH
+            for x in range(x0, x1 + 1):
+                count = self.occupancy[row + x]
+                if not count:
+                    continue
+                if (x, y) == head and count == 1:
+                    self._draw_head(surface, head)
+                else:
+                    pygame.draw.rect(surface, self.color, (x * GRID_SIZE, y * GRID_SIZE, GRID_SIZE, GRID_SIZE))
+
+    def render_view(self, surface, camera):
+        # Draw the segments inside the camera's view on a board bigger than
+        # the window. They are found through the occupancy grid, so the cost
+        # depends on the size of the view, not the length of the snake.
+        width = camera.world_width
+        occupancy = self.occupancy
+        head = self._positions[0]
+        head_cell = camera.to_screen(head)
+        for j in range(camera.rows):
+            row = (camera.y + j) % camera.world_height * width
+            for start, stop, col in camera.spans:
+                cells = occupancy[row + start:row + stop]
+                if cells.count(0) == len(cells):
+                    continue
+                # One rect per run of occupied cells along the row
+                run = None
+                for i, count in enumerate(cells):
+                    if count and not (count == 1 and (col + i, j) == head_cell):
+                        if run is None:
+                            run = i
+                        continue
+                    if run is not None:
+                        pygame.draw.rect(surface, self.color, ((col + run) * GRID_SIZE, j * GRID_SIZE,
+                                                               (i - run) * GRID_SIZE, GRID_SIZE))
+                        run = None
+                    if count:
+                        self._draw_head(surface, head_cell)
+                if run is not None:
+                    pygame.draw.rect(surface, self.color, ((col + run) * GRID_SIZE, j * GRID_SIZE,
+                                                           (len(cells) - run) * GRID_SIZE, GRID_SIZE))
+
+class Food(snake_engine.Food):
+    # Set together when the food moves, for interpolation. Class defaults so
+    # foods rebuilt by snake_snapshot have them too.
+    prev_position = None
+    moved_at = None  # FoodManager tick of the last move
+
+    def render(self, surface):
+        surface.blit(*get_food_sprite(self.current_food['shape'], self.current_food['color'], self.animation_frame,
+                                      surface.get_rect(), self.position[0] * GRID_SIZE, self.position[1] * GRID_SIZE))
+
+class FoodManager(snake_engine.FoodManager):
+    food_class = Food
+
+    def __init__(self, snake=None, max_foods=50, min_foods=40, rng=None, move_interval=FOOD_MOVE_INTERVAL):
+        self.dirty_cells = set()  # cells to redraw in dirty-rect mode
+        super().__init__(snake, max_foods, min_foods, rng, move_interval)
+
+    def _place(self, food):
+        super()._place(food)
+        self._mark_dirty(food.position)
+
+    def _unplace(self, food, position):
+        super()._unplace(food, position)
+        self._mark_dirty(position)
+        # Only moves unplace a food; remember where from for interpolation
+        food.prev_position = position
+        food.moved_at = self.tick
 
     def update(self):
-        # Update all foods
+        super().update()
+        # The animation frame advances every update, so every sprite is redrawn
         for food in self.foods:
-            food.update()
+            self._mark_dirty(food.position)
 
-        # Check if we need to replenish foods
-        if len(self.foods) <= self.min_foods:
-            # Add new foods until we reach max_foods
-            while len(self.foods) < self.max_foods:
-                self.add_new_food()
+    def remove_food(self, position):
+        super().remove_food(position)
+        self._mark_dirty(position)
 
     def render(self, surface):
+        bounds = surface.get_rect()
+        surface.blits([get_food_sprite(food.current_food['shape'], food.current_food['color'], food.animation_frame,
+                                       bounds, food.position[0] * GRID_SIZE, food.position[1] * GRID_SIZE)
+                       for food in self.foods], False)
+
+    def render_interpolated(self, surface, alpha):
+        # Foods that moved this tick slide in from their previous cell, and
+        # animations advance in ANIMATION_SUBFRAMES steps between ticks
+        bounds = surface.get_rect()
+        batch = []
         for food in self.foods:
-            food.render(surface)
+            position = food.position
+            if food.moved_at == self.tick:
+                position = lerp_cell(food.prev_position, position, alpha)
+            x = round(position[0] * GRID_SIZE)
+            y = round(position[1] * GRID_SIZE)
+            frame = (self.tick - food.born + alpha) % food.animation_speed
+            frame = math.floor(frame * ANIMATION_SUBFRAMES) / ANIMATION_SUBFRAMES
+            shape = food.current_food['shape']
+            color = food.current_food['color']
+            if bounds.contains((x - SPRITE_MARGIN, y - SPRITE_MARGIN, SPRITE_SIZE, SPRITE_SIZE)):
+                batch.append(get_food_sprite(shape, color, frame, bounds, x, y))
+            else:
+                # Sliding edge sprites would each need their own canvas
+                if batch:
+                    surface.blits(batch, False)
+                    batch = []
+                draw_food_shape(surface, shape, color, x, y, frame)
+        if batch:
+            surface.blits(batch, False)
 
-    def remove_food(self, position):
-        # Remove food at given position
-        self.foods = [food for food in self.foods if food.position != position]
+    def footprint_rects(self):
+        # Pixel rects a sprite may cover, in the same order as self.foods
+        return [pygame.Rect((food.position[0] - 1) * GRID_SIZE, (food.position[1] - 1) * GRID_SIZE,
+                            3 * GRID_SIZE, 3 * GRID_SIZE) for food in self.foods]
 
-class Food:
-    def __init__(self):
-        self.position = (0, 0)
-        self.current_food = random.choice(FOOD_TYPES)
-        self.randomize_position()
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-        self.move_counter = 0
-        self.animation_frame = 0
-        self.animation_speed = 10
-
-    def randomize_position(self):
-        self.position = (random.randint(0, GRID_WIDTH-1),
-                        random.randint(0, GRID_HEIGHT-1))
-        self.current_food = random.choice(FOOD_TYPES)
-        self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
+    def render_area(self, surface, area, footprints=None):
+        # Redraw, in list order, the foods whose sprite can reach `area`;
+        # pass footprint_rects() when drawing several areas in one frame
+        if footprints is None:
+            footprints = self.footprint_rects()
+        hits = area.collidelistall(footprints)
+        if not hits:
+            return
+        bounds = surface.get_rect()
+        foods = self.foods
+        surface.blits([get_food_sprite(food.current_food['shape'], food.current_food['color'], food.animation_frame,
+                                       bounds, food.position[0] * GRID_SIZE, food.position[1] * GRID_SIZE)
+                       for food in (foods[i] for i in hits)], False)
+
+    def collect_dirty_cells(self, cells):
+        cells |= self.dirty_cells
+        self.dirty_cells.clear()
+
+    def _mark_dirty(self, position):
+        # A sprite stays within one cell of its own
+        self.dirty_cells.update(FOOTPRINTS[position])
+
+class Game(snake_engine.Game):
+    snake_class = Snake
+    food_manager_class = FoodManager
+
+# Cells a creature's sprite can cover, for every cell on the board
+FOOTPRINTS = {(x, y): tuple((cx, cy) for cy in range(max(y - 1, 0), min(y + 2, GRID_HEIGHT))
+                            for cx in range(max(x - 1, 0), min(x + 2, GRID_WIDTH)))
+              for y in range(GRID_HEIGHT) for x in range(GRID_WIDTH)}
+
+def draw_food_shape(surface, shape, color, x, y, animation_frame):
+    # Draw one creature with its cell's top-left corner at (x, y)
+    # Add slight movement animation
+    wiggle_offset = math.sin(animation_frame * 0.5) * 2
+
+    if shape == 'circle':  # Ant
+        # Body
+        pygame.draw.circle(surface, color, (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//3)
+        # Head
+        pygame.draw.circle(surface, color, (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//4)
+        # Antennae
+        pygame.draw.line(surface, color, 
+                       (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
+                       (x + GRID_SIZE//2 + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset), 2)
+        pygame.draw.line(surface, color,
+                       (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
+                       (x + GRID_SIZE//2 + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), 2)
+
+    elif shape == 'square':  # Mouse
+        # Body
+        pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wiggle_offset, GRID_SIZE//2, GRID_SIZE//2))
+        # Ears
+        pygame.draw.circle(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wiggle_offset), GRID_SIZE//6)
+        pygame.draw.circle(surface, color, (x + GRID_SIZE*3//4, y + GRID_SIZE//4 + wiggle_offset), GRID_SIZE//6)
+        # Tail
+        pygame.draw.line(surface, color,
+                       (x + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
+                       (x, y + GRID_SIZE//2 + wiggle_offset), 3)
+
+    elif shape == 'triangle':  # Bird
+        # Body
+        points = [
+            (x + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset),
+            (x + GRID_SIZE//4, y + GRID_SIZE*3//4 + wiggle_offset),
+            (x + GRID_SIZE*3//4, y + GRID_SIZE*3//4 + wiggle_offset)
+        ]
+        pygame.draw.polygon(surface, color, points)
+        # Wing
+        wing_points = [
+            (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset),
+            (x + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
+            (x + GRID_SIZE//2, y + GRID_SIZE*3//4 + wiggle_offset)
+        ]
+        pygame.draw.polygon(surface, color, wing_points)
+
+    elif shape == 'diamond':  # Butterfly
+        # Body
+        pygame.draw.line(surface, color,
+                       (x + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset),
+                       (x + GRID_SIZE//2, y + GRID_SIZE*3//4 + wiggle_offset), 2)
+        # Wings
+        wing_offset = math.sin(animation_frame * 0.5) * 3
+        pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wing_offset, GRID_SIZE//2, GRID_SIZE//3))
+        pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE*5//12 + wing_offset, GRID_SIZE//2, GRID_SIZE//3))
+
+    elif shape == 'star':  # Spider
+        # Body
+        pygame.draw.circle(surface, color, (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//3)
+        # Legs
+        for i in range(8):
+            angle = i * math.pi / 4
+            start_x = x + GRID_SIZE//2 + math.cos(angle) * GRID_SIZE//3
+            start_y = y + GRID_SIZE//2 + math.sin(angle) * GRID_SIZE//3 + wiggle_offset
+            end_x = start_x + math.cos(angle) * GRID_SIZE//2
+            end_y = start_y + math.sin(angle) * GRID_SIZE//2
+            pygame.draw.line(surface, color, (start_x, start_y), (end_x, end_y), 2)
+
+# Creatures spill over their cell (spider legs, wiggle), so sprites are drawn
+# with a margin and then cropped to what was actually painted
+SPRITE_MARGIN = GRID_SIZE
+SPRITE_SIZE = GRID_SIZE + 2 * SPRITE_MARGIN
+SPRITE_COLORKEY = (1, 2, 3)  # never used by a creature
+_food_sprites = {}
+
+def get_food_sprite(shape, color, animation_frame, bounds, x, y):
+    # Pre-rendered sprite for a creature whose cell's top-left corner is at
+    # (x, y) on a surface covering `bounds`; returns (sprite, blit position).
+    # pygame clips lines that cross the surface edge differently from lines
+    # drawn whole, so a creature crossing the edge gets its own sprite drawn
+    # on a canvas that shares that edge.
+    left = x - SPRITE_MARGIN
+    top = y - SPRITE_MARGIN
+    if (left >= bounds[0] and top >= bounds[1] and left + SPRITE_SIZE <= bounds[0] + bounds[2]
+            and top + SPRITE_SIZE <= bounds[1] + bounds[3]):
+        key = (shape, color, animation_frame)
+        canvas = None
+    else:
+        canvas = pygame.Rect(left, top, SPRITE_SIZE, SPRITE_SIZE).clip(bounds)
+        key = (shape, color, animation_frame, x - canvas.x, y - canvas.y, canvas.w, canvas.h)
+    entry = _food_sprites.get(key)
+    if entry is None:
+        if canvas is None:
+            size, origin = (SPRITE_SIZE, SPRITE_SIZE), (SPRITE_MARGIN, SPRITE_MARGIN)
+        else:
+            size, origin = canvas.size, (x - canvas.x, y - canvas.y)
+        scratch = pygame.Surface(size, pygame.SRCALPHA)
+        draw_food_shape(scratch, shape, color, origin[0], origin[1], animation_frame)
+        painted = scratch.get_bounding_rect()
+        sprite = pygame.Surface(painted.size)
+        sprite.fill(SPRITE_COLORKEY)
+        sprite.blit(scratch, (0, 0), painted)
+        sprite.set_colorkey(SPRITE_COLORKEY, pygame.RLEACCEL)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        entry = (sprite, painted.x - origin[0], painted.y - origin[1])
+        _food_sprites[key] = entry
+    return entry[0], (x + entry[1], y + entry[2])
+
+KEY_DIRECTIONS = {pygame.K_UP: UP, pygame.K_DOWN: DOWN, pygame.K_LEFT: LEFT, pygame.K_RIGHT: RIGHT}
+
+# Render full frames (False) or only the cells that changed (True). Only
+# applies without INTERPOLATE_MOVEMENT: interpolated frames move nearly every
+# sprite, so they are always drawn in full.
+DIRTY_RECT_RENDERING = True
+
+def lerp_cell(prev, cur, t):
+    # Point `t` of the way from cell prev to cell cur, stepping across the
+    # board edge rather than back over the whole board on wraparound
+    dx = cur[0] - prev[0]
+    dy = cur[1] - prev[1]
+    if dx > 1:
+        dx = -1
+    elif dx < -1:
+        dx = 1
+    if dy > 1:
+        dy = -1
+    elif dy < -1:
+        dy = 1
+    return (cur[0] - dx * (1 - t), cur[1] - dy * (1 - t))
+
+def draw_snake_head(surface, color, direction, x, y):
+    # The head square with its eyes looking along `direction`, top-left at (x, y)
+    pygame.draw.rect(surface, color, (x, y, GRID_SIZE, GRID_SIZE))
+
+    eye_size = GRID_SIZE // 4
+    eye_offset = GRID_SIZE // 4
+
+    if direction == UP:
+        left_eye = (x + eye_offset, y + eye_offset)
+        right_eye = (x + GRID_SIZE - eye_offset - eye_size, y + eye_offset)
+    elif direction == DOWN:
+        left_eye = (x + eye_offset, y + GRID_SIZE - eye_offset - eye_size)
+        right_eye = (x + GRID_SIZE - eye_offset - eye_size, y + GRID_SIZE - eye_offset - eye_size)
+    elif direction == LEFT:
+        left_eye = (x + eye_offset, y + eye_offset)
+        right_eye = (x + eye_offset, y + GRID_SIZE - eye_offset - eye_size)
+    else:  # RIGHT
+        left_eye = (x + GRID_SIZE - eye_offset - eye_size, y + eye_offset)
+        right_eye = (x + GRID_SIZE - eye_offset - eye_size, y + GRID_SIZE - eye_offset - eye_size)
+
+    pygame.draw.rect(surface, WHITE, (*left_eye, eye_size, eye_size))
+    pygame.draw.rect(surface, WHITE, (*right_eye, eye_size, eye_size))
+
+    pupil_size = eye_size // 2
+    pygame.draw.rect(surface, BLACK, (left_eye[0] + pupil_size//2, left_eye[1] + pupil_size//2, pupil_size, pupil_size))
+    pygame.draw.rect(surface, BLACK, (right_eye[0] + pupil_size//2, right_eye[1] + pupil_size//2, pupil_size, pupil_size))
+
+# Heads are drawn once per (colour, direction) and blitted after that
+_head_sprites = {}
+
+def get_head_sprite(color, direction):
+    sprite = _head_sprites.get((color, direction))
+    if sprite is None:
+        sprite = pygame.Surface((GRID_SIZE, GRID_SIZE))
+        draw_snake_head(sprite, color, direction, 0, 0)
+        if pygame.display.get_surface() is not None:
+            sprite = sprite.convert()
+        _head_sprites[(color, direction)] = sprite
+    return sprite
+
+GRID_STEPS = {(GRID_SIZE, 0), (-GRID_SIZE, 0), (0, GRID_SIZE), (0, -GRID_SIZE)}
+
+def merge_squares(corners):
+    # Rects covering the same pixels as GRID_SIZE squares at the given
+    # top-left corners, one rect per run of squares touching in a line.
+    # Squares that don't line up with their neighbour stay on their own.
+    rects = []
+    if not corners:
+        return rects
+    x0, y0 = lx, ly = corners[0]
+    step = None
+    for x, y in corners[1:]:
+        d = (x - lx, y - ly)
+        if d != step:
+            if step is None and d in GRID_STEPS:
+                step = d
+            else:
+                rects.append((min(x0, lx), min(y0, ly), abs(lx - x0) + GRID_SIZE, abs(ly - y0) + GRID_SIZE))
+                x0, y0 = x, y
+                step = None
+        lx, ly = x, y
+    rects.append((min(x0, lx), min(y0, ly), abs(lx - x0) + GRID_SIZE, abs(ly - y0) + GRID_SIZE))
+    return rects
+
+def area_to_cells(area, margin=0):
+    # Inclusive (x0, y0, x1, y1) range of grid cells touched by a pixel rect
+    return (max(area[0] // GRID_SIZE - margin, 0),
+            max(area[1] // GRID_SIZE - margin, 0),
+            min((area[0] + area[2] - 1) // GRID_SIZE + margin, GRID_WIDTH - 1),
+            min((area[1] + area[3] - 1) // GRID_SIZE + margin, GRID_HEIGHT - 1))
+
+def cells_to_rects(cells):
+    # Merge cells into row runs, then stack identical runs of adjacent rows
+    mask = bytearray(GRID_WIDTH * GRID_HEIGHT)
+    for x, y in cells:
+        mask[y * GRID_WIDTH + x] = 1
+    open_runs = {}  # (x0, x1) -> [x0, y0, x1, y1] still growing downwards
+    rects = []
+    for y in range(GRID_HEIGHT):
+        row = y * GRID_WIDTH
+        end = row + GRID_WIDTH
+        next_runs = {}
+        start = mask.find(1, row, end)
+        while start != -1:
+            stop = mask.find(0, start, end)
+            if stop == -1:
+                stop = end
+            run = (start - row, stop - row - 1)
+            block = open_runs.pop(run, None)
+            if block is None:
+                block = [run[0], y, run[1], y]
+            else:
+                block[3] = y
+            next_runs[run] = block
+            start = mask.find(1, stop, end)
+        rects.extend(open_runs.values())
+        open_runs = next_runs
+    rects.extend(open_runs.values())
+    return [pygame.Rect(x0 * GRID_SIZE, y0 * GRID_SIZE, (x1 - x0 + 1) * GRID_SIZE, (y1 - y0 + 1) * GRID_SIZE)
+            for x0, y0, x1, y1 in rects]
+
+class Hud:
+    def __init__(self, font):
+        self.font = font
+        self.lines = [None, None, None]  # (text, surface, rect)
+        self.dirty_rects = []
+
+    def update(self, score, high_score, food_count):
+        texts = (f'Score: {score}', f'High Score: {high_score}', f'Food: {food_count}')
+        for i, text in enumerate(texts):
+            line = self.lines[i]
+            if line is not None and line[0] == text:
+                continue
+            surface = render_text(self.font, text, WHITE)
+            rect = surface.get_rect(topleft=(10, 10 + 40 * i))
+            if line is not None:
+                self.dirty_rects.append(line[2])
+            self.dirty_rects.append(rect)
+            self.lines[i] = (text, surface, rect)
+
+    def render(self, surface, area=None):
+        for text, text_surface, rect in self.lines:
+            if area is None or rect.colliderect(area):
+                surface.blit(text_surface, rect)
+
+class FrameRenderer:
+    # Draws the game board. In dirty-rect mode only the cells that changed
+    # since the last frame are erased and redrawn, and only those rects are
+    # pushed to the display. Interpolated frames (alpha is not None) move
+    # everything by sub-cell amounts, so they are always drawn in full.
+    def __init__(self, surface, dirty_rects=DIRTY_RECT_RENDERING):
+        self.surface = surface
+        self.dirty_rects = dirty_rects
+        self.needs_full_redraw = True
+        self.pause_button_state = None
+
+    def invalidate(self):
+        # Something else drew over the screen (pause menu), repaint it all
+        self.needs_full_redraw = True
+
+    def render(self, snake, food_manager, hud, pause_button, alpha=None, overlay=None):
+        # Draw the frame and return the rects to present (None for all of it).
+        # `overlay` (the profiler panel) is drawn on top of everything.
+        surface = self.surface
+        cells = set()
+        snake.collect_dirty_cells(cells)
+        food_manager.collect_dirty_cells(cells)
+        overlays, hud.dirty_rects = hud.dirty_rects, []
+        button_state = (pause_button.is_hovered, pause_button.is_paused)
+        if button_state != self.pause_button_state:
+            overlays.append(pause_button.rect)
+            self.pause_button_state = button_state
+        if overlay is not None and overlay.dirty:
+            overlays.append(overlay.rect)
+            overlay.dirty = False
+
+        if alpha is not None:
+            surface.fill(BLACK)
+            snake.render_interpolated(surface, alpha)
+            food_manager.render_interpolated(surface, alpha)
+            hud.render(surface)
+            pause_button.draw(surface)
+            if overlay is not None:
+                overlay.render(surface)
+            self.needs_full_redraw = True
+            return None
+
+        if not self.dirty_rects or self.needs_full_redraw:
+            self.needs_full_redraw = False
+            surface.fill(BLACK)
+            snake.render(surface)
+            food_manager.render(surface)
+            hud.render(surface)
+            pause_button.draw(surface)
+            if overlay is not None:
+                overlay.render(surface)
+            return None
+
+        rects = cells_to_rects(cells) + overlays
+        footprints = food_manager.footprint_rects()
+        for rect in rects:
+            surface.set_clip(rect)
+            surface.fill(BLACK, rect)
+            snake.render_area(surface, rect)
+            food_manager.render_area(surface, rect, footprints)
+            hud.render(surface, rect)
+            if pause_button.rect.colliderect(rect):
+                pause_button.draw(surface)
+            if overlay is not None and overlay.rect.colliderect(rect):
+                overlay.render(surface)
+        surface.set_clip(None)
+        return rects
+
+    def present(self, rects):
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+
+# Large-world mode: a board bigger than the window, seen through a camera.
+# Food lives in a snake_foodstore.FoodStore indexed in WORLD_CHUNK_SIZE
+# chunks, which also feed the minimap. Needs numpy.
+WORLD_CHUNK_SIZE = 16
+WORLD_FOOD_DENSITY = 24  # board cells per food, as on the 40x30 board with 50 foods
+
+class Camera:
+    # Window-sized view onto the board, centred on a cell; wraps round the
+    # board edges like the snake does
+    def __init__(self, cols=GRID_WIDTH, rows=GRID_HEIGHT):
+        self.cols = cols
+        self.rows = rows
+        self.world_width = snake_engine.GRID_WIDTH
+        self.world_height = snake_engine.GRID_HEIGHT
+        self.x = self.y = 0  # board cell at the top-left of the window
+        self.spans = []  # (first column, end column, window column) per board strip in view
+
+    def follow(self, cell):
+        width = self.world_width
+        self.x = (cell[0] - self.cols // 2) % width
+        self.y = (cell[1] - self.rows // 2) % self.world_height
+        end = self.x + self.cols
+        self.spans = [(self.x, min(end, width), 0)]
+        if end > width:
+            self.spans.append((0, end - width, width - self.x))
+
+    def to_screen(self, cell):
+        # Window cell of a board cell (off-window cells land past cols/rows)
+        return ((cell[0] - self.x) % self.world_width, (cell[1] - self.y) % self.world_height)
+
+class Minimap:
+    # Board overview from per-chunk counts: food density in grey, chunks the
+    # snake is in in green, the camera's view outlined. The snake's counts
+    # are kept up to date from its changed cells; the picture is rebuilt a few
+    # times a second.
+    REFRESH_MS = 250
+    SIZE = 160  # pixels along the longer side
+
+    def __init__(self, store):
+        self.store = store
+        cols, rows = store.chunks_x, store.chunks_y
+        scale = self.SIZE / max(cols, rows)
+        width, height = max(1, round(cols * scale)), max(1, round(rows * scale))
+        self.rect = pygame.Rect(10, WINDOW_HEIGHT - 10 - height, width, height)
+        self.snake_chunks = np.zeros(cols * rows, dtype=np.int32)  # snake cells per chunk
+        self.image = None
+        self.last_refresh = None
+
+    def mark(self, snake, cells):
+        # Recount the snake's cells in every chunk `cells` touches
+        store = self.store
+        size, cols = store.chunk_size, store.chunks_x
+        width, height = store.width, store.height
+        occupancy = snake.occupancy
+        for chunk in {y // size * cols + x // size for x, y in cells}:
+            x0 = chunk % cols * size
+            y0 = chunk // cols * size
+            x1 = min(x0 + size, width)
+            total = 0
+            for y in range(y0, min(y0 + size, height)):
+                row = occupancy[y * width + x0:y * width + x1]
+                total += len(row) - row.count(0)
+            self.snake_chunks[chunk] = total
 
     def update(self):
-        # Move every 30 frames
-        self.move_counter += 1
-        if self.move_counter >= 30:
-            self.move_counter = 0
-            x, y = self.direction
-            new_x = (self.position[0] + x) % GRID_WIDTH
-            new_y = (self.position[1] + y) % GRID_HEIGHT
-            self.position = (new_x, new_y)
-            
-            # Randomly change direction
-            if random.random() < 0.1:  # 10% chance to change direction
-                self.direction = random.choice([UP, DOWN, LEFT, RIGHT])
-
-        # Update animation frame
-        self.animation_frame = (self.animation_frame + 1) % self.animation_speed
+        now = pygame.time.get_ticks()
+        if self.last_refresh is not None and now - self.last_refresh < self.REFRESH_MS:
+            return
+        self.last_refresh = now
+        store = self.store
+        # Full brightness at ten times the usual food density
+        levels = np.minimum(store.chunk_count * (255 * WORLD_FOOD_DENSITY / 10 / store.chunk_size ** 2), 255)
+        pixels = np.repeat(levels.astype(np.uint8)[:, None], 3, axis=1)
+        pixels[self.snake_chunks > 0] = GREEN
+        image = pygame.image.frombuffer(pixels.tobytes(), (store.chunks_x, store.chunks_y), 'RGB')
+        self.image = pygame.transform.scale(image, self.rect.size)
+
+    def render(self, surface, camera):
+        surface.blit(self.image, self.rect)
+        scale_x = self.rect.width / camera.world_width
+        scale_y = self.rect.height / camera.world_height
+        surface.set_clip(self.rect)
+        pygame.draw.rect(surface, WHITE, (self.rect.x + camera.x * scale_x, self.rect.y + camera.y * scale_y,
+                                          max(2, camera.cols * scale_x), max(2, camera.rows * scale_y)), 1)
+        surface.set_clip(None)
+        pygame.draw.rect(surface, GRAY, self.rect.inflate(2, 2), 1)
+
+def new_world_game(tick_rate=TICK_RATE, seed=None, foods=None):
+    # A game on the current board with its food in an indexed FoodStore
+    seed = random.randrange(2 ** 32) if seed is None else seed  # the one game.seed reports
+    rng = random.Random(seed)
+    snake = Snake(rng)
+    if foods is None:
+        foods = snake_engine.GRID_WIDTH * snake_engine.GRID_HEIGHT // WORLD_FOOD_DENSITY
+    store = FoodStore(snake, foods, foods * 4 // 5, rng, chunk_size=WORLD_CHUNK_SIZE)
+    return Game(snake, store, tick_rate, seed)
+
+class WorldRenderer(FrameRenderer):
+    # Draws a board bigger than the window. The camera follows the head and
+    # only the segments and foods in view are drawn, whole cells at a time;
+    # foods come from the FoodStore's chunk index. Every frame is drawn in full.
+    def __init__(self, surface, camera, minimap=None):
+        super().__init__(surface, dirty_rects=False)
+        self.camera = camera
+        self.minimap = minimap
+        self.show_minimap = minimap is not None
+
+    def render(self, snake, food_manager, hud, pause_button, alpha=None, overlay=None):
+        surface = self.surface
+        camera = self.camera
+        cells = set()
+        snake.collect_dirty_cells(cells)
+        hud.dirty_rects = []
+        camera.follow(snake.get_head_position())
+        surface.fill(BLACK)
+        snake.render_view(surface, camera)
+        self.render_foods(surface, food_manager)
+        hud.render(surface)
+        pause_button.draw(surface)
+        if self.minimap is not None:
+            self.minimap.mark(snake, cells)
+            if self.show_minimap:
+                self.minimap.update()
+                self.minimap.render(surface, camera)
+        if overlay is not None:
+            overlay.render(surface)
+            overlay.dirty = False
+        return None
+
+    def render_foods(self, surface, store):
+        # Sprites reach one cell past their own, so look one cell beyond the view
+        camera = self.camera
+        slots = store.slots_in(camera.x - 1, camera.y - 1, camera.cols + 2, camera.rows + 2)
+        if not len(slots):
+            return
+        xs = ((store.x[slots].astype(np.int32) - camera.x + 1) % camera.world_width - 1) * GRID_SIZE
+        ys = ((store.y[slots].astype(np.int32) - camera.y + 1) % camera.world_height - 1) * GRID_SIZE
+        frames = (store.tick - store.born[slots]) % ANIMATION_SPEED
+        bounds = surface.get_rect()
+        food_types = snake_engine.FOOD_TYPES
+        batch = []
+        for food_type, frame, x, y in zip(store.type[slots].tolist(), frames.tolist(), xs.tolist(), ys.tolist()):
+            food = food_types[food_type]
+            batch.append(get_food_sprite(food['shape'], food['color'], frame, bounds, x, y))
+        surface.blits(batch, False)
+
+class ProfilerOverlay:
+    # Panel with rolling p50/p95/p99 frame-phase times and entity counts,
+    # refreshed a few times a second so reading it doesn't cost every frame
+    REFRESH_MS = 500
+
+    def __init__(self):
+        self.font = get_font(None, 22)
+        self.rect = pygame.Rect(WINDOW_WIDTH - 290, WINDOW_HEIGHT - 130, 280, 120)
+        self.panel = pygame.Surface(self.rect.size)
+        self.panel.set_alpha(200)
+        self.last_refresh = None
+        self.dirty = True
+
+    def update(self, profiler):
+        now = pygame.time.get_ticks()
+        if self.last_refresh is not None and now - self.last_refresh < self.REFRESH_MS:
+            return
+        self.last_refresh = now
+        lines = ['phase      p50 / p95 / p99 ms']
+        for phase, name in enumerate(PHASES + ('frame',)):
+            p50, p95, p99 = profiler.percentiles(None if name == 'frame' else phase)
+            lines.append(f'{name:<8} {p50 / 1e6:6.2f} {p95 / 1e6:6.2f} {p99 / 1e6:6.2f}')
+        lines.append(f'snake {profiler.counts[0]}  foods {profiler.counts[1]}')
+        self.panel.fill(BLACK)
+        for i, line in enumerate(lines):
+            self.panel.blit(self.font.render(line, True, WHITE), (8, 4 + 16 * i))
+        self.dirty = True
 
     def render(self, surface):
-        x = self.position[0] * GRID_SIZE
-        y = self.position[1] * GRID_SIZE
-        color = self.current_food['color']
-        shape = self.current_food['shape']
-
-        # Add slight movement animation
-        wiggle_offset = math.sin(self.animation_frame * 0.5) * 2
-
-        if shape == 'circle':  # Ant
-            # Body
-            pygame.draw.circle(surface, color, (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//3)
-            # Head
-            pygame.draw.circle(surface, color, (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//4)
-            # Antennae
-            pygame.draw.line(surface, color, 
-                           (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
-                           (x + GRID_SIZE//2 + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset), 2)
-            pygame.draw.line(surface, color,
-                           (x + GRID_SIZE//2 + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
-                           (x + GRID_SIZE//2 + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), 2)
-
-        elif shape == 'square':  # Mouse
-            # Body
-            pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wiggle_offset, GRID_SIZE//2, GRID_SIZE//2))
-            # Ears
-            pygame.draw.circle(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wiggle_offset), GRID_SIZE//6)
-            pygame.draw.circle(surface, color, (x + GRID_SIZE*3//4, y + GRID_SIZE//4 + wiggle_offset), GRID_SIZE//6)
-            # Tail
-            pygame.draw.line(surface, color,
-                           (x + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
-                           (x, y + GRID_SIZE//2 + wiggle_offset), 3)
-
-        elif shape == 'triangle':  # Bird
-            # Body
-            points = [
-                (x + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset),
-                (x + GRID_SIZE//4, y + GRID_SIZE*3//4 + wiggle_offset),
-                (x + GRID_SIZE*3//4, y + GRID_SIZE*3//4 + wiggle_offset)
-            ]
-            pygame.draw.polygon(surface, color, points)
-            # Wing
-            wing_points = [
-                (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset),
-                (x + GRID_SIZE//4, y + GRID_SIZE//2 + wiggle_offset),
-                (x + GRID_SIZE//2, y + GRID_SIZE*3//4 + wiggle_offset)
-            ]
-            pygame.draw.polygon(surface, color, wing_points)
-
-        elif shape == 'diamond':  # Butterfly
-            # Body
-            pygame.draw.line(surface, color,
-                           (x + GRID_SIZE//2, y + GRID_SIZE//4 + wiggle_offset),
-                           (x + GRID_SIZE//2, y + GRID_SIZE*3//4 + wiggle_offset), 2)
-            # Wings
-            wing_offset = math.sin(self.animation_frame * 0.5) * 3
-            pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE//4 + wing_offset, GRID_SIZE//2, GRID_SIZE//3))
-            pygame.draw.ellipse(surface, color, (x + GRID_SIZE//4, y + GRID_SIZE*5//12 + wing_offset, GRID_SIZE//2, GRID_SIZE//3))
-
-        elif shape == 'star':  # Spider
-            # Body
-            pygame.draw.circle(surface, color, (x + GRID_SIZE//2, y + GRID_SIZE//2 + wiggle_offset), GRID_SIZE//3)
-            # Legs
-            for i in range(8):
-                angle = i * math.pi / 4
-                start_x = x + GRID_SIZE//2 + math.cos(angle) * GRID_SIZE//3
-                start_y = y + GRID_SIZE//2 + math.sin(angle) * GRID_SIZE//3 + wiggle_offset
-                end_x = start_x + math.cos(angle) * GRID_SIZE//2
-                end_y = start_y + math.sin(angle) * GRID_SIZE//2
-                pygame.draw.line(surface, color, (start_x, start_y), (end_x, end_y), 2)
-
-# Directional constants
-UP = (0, -1)
-DOWN = (0, 1)
-LEFT = (-1, 0)
-RIGHT = (1, 0)
+        surface.blit(self.panel, self.rect)
+
+# Menu screens hold still, so instead of redrawing at 60 fps they are drawn
+# once into a cached surface and then block in pygame.event.wait. Only a
+# button whose hover state changed is redrawn, as a dirty rect; the whole
+# screen is put back only when the window is exposed. The wait is cut into
+# MENU_IDLE_MS slices, each simply followed by another, so Python gets to run
+# signal handlers now and then.
+MENU_IDLE_MS = 1000
+
+def menu_background(lines):
+    # The screen behind the buttons: (font size, text, centre) for each line
+    background = pygame.Surface(screen.get_size()).convert()
+    background.fill(BLACK)
+    for size, text, center in lines:
+        text_surface = render_text(get_font(None, size), text, WHITE)
+        background.blit(text_surface, text_surface.get_rect(center=center))
+    return background
+
+def run_menu(background, buttons):
+    # Shows the menu until a button is clicked and returns its index
+    repaint = True
+    while True:
+        if repaint:
+            screen.blit(background, (0, 0))
+            for button in buttons:
+                button.draw(screen)
+            pygame.display.flip()
+            repaint = False
+        event = pygame.event.wait(MENU_IDLE_MS)
+        if event.type == pygame.NOEVENT:
+            continue
+        dirty = []
+        for event in [event] + pygame.event.get():
+            if event.type == pygame.QUIT:
+                sys.exit()  # the caller's cleanup runs on the way out
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                repaint = True
+            for i, button in enumerate(buttons):
+                hovered = button.is_hovered
+                if button.handle_event(event):
+                    return i
+                if button.is_hovered != hovered and button not in dirty:
+                    dirty.append(button)
+        if dirty and not repaint:
+            for button in dirty:
+                button.draw(screen)
+            pygame.display.update([button.rect for button in dirty])
 
 def show_welcome_screen():
-    # Create buttons
     start_button = Button(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50, 120, 50, "Start", GREEN, LIGHT_GRAY)
     exit_button = Button(WINDOW_WIDTH//2 + 30, WINDOW_HEIGHT//2 + 50, 120, 50, "Exit", RED, LIGHT_GRAY)
-    
-    # Welcome text
-    font = pygame.font.Font(None, 74)
-    welcome_text = font.render("Welcome to Snake Game!", True, WHITE)
-    welcome_rect = welcome_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 50))
-    
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            
-            if start_button.handle_event(event):
-                return True
-            if exit_button.handle_event(event):
-                return False
-        
-        # Draw everything
-        screen.fill(BLACK)
-        screen.blit(welcome_text, welcome_rect)
-        start_button.draw(screen)
-        exit_button.draw(screen)
-        pygame.display.flip()
-        clock.tick(60)
-
-def load_high_score():
-    try:
-        if os.path.exists(HIGH_SCORE_FILE):
-            with open(HIGH_SCORE_FILE, 'r') as f:
-                return json.load(f)['high_score']
-    except:
-        pass
-    return 0
-
-def save_high_score(score):
-    try:
-        with open(HIGH_SCORE_FILE, 'w') as f:
-            json.dump({'high_score': score}, f)
-    except:
-        pass
+    background = menu_background([
+        (74, "Welcome to Snake Game!", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 50)),
+    ])
+    return run_menu(background, [start_button, exit_button]) == 0
 
 def show_game_over(screen, score, high_score):
-    # Create buttons
     restart_button = Button(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50, 120, 50, "Restart", GREEN, LIGHT_GRAY)
     quit_button = Button(WINDOW_WIDTH//2 + 30, WINDOW_HEIGHT//2 + 50, 120, 50, "Quit", RED, LIGHT_GRAY)
-    
-    # Game over text
-    font = pygame.font.Font(None, 74)
-    game_over_text = font.render("Game Over!", True, WHITE)
-    game_over_rect = game_over_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 100))
-    
-    # Score text
-    score_font = pygame.font.Font(None, 48)
-    score_text = score_font.render(f"Final Score: {score}", True, WHITE)
-    score_rect = score_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 30))
-    
-    # High score text
-    high_score_text = score_font.render(f"High Score: {high_score}", True, WHITE)
-    high_score_rect = high_score_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 20))
-    
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            
-            if restart_button.handle_event(event):
-                return True
-            if quit_button.handle_event(event):
-                return False
-        
-        # Draw everything
-        screen.fill(BLACK)
-        screen.blit(game_over_text, game_over_rect)
-        screen.blit(score_text, score_rect)
-        screen.blit(high_score_text, high_score_rect)
-        restart_button.draw(screen)
-        quit_button.draw(screen)
-        pygame.display.flip()
-        clock.tick(60)
+    background = menu_background([
+        (74, "Game Over!", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 100)),
+        (48, f"Final Score: {score}", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 30)),
+        (48, f"High Score: {high_score}", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 + 20)),
+    ])
+    return run_menu(background, [restart_button, quit_button]) == 0
 
 def show_pause_screen():
-    # Create buttons
     continue_button = Button(WINDOW_WIDTH//2 - 150, WINDOW_HEIGHT//2 + 50, 120, 50, "Continue", GREEN, LIGHT_GRAY)
     exit_button = Button(WINDOW_WIDTH//2 + 30, WINDOW_HEIGHT//2 + 50, 120, 50, "Exit", RED, LIGHT_GRAY)
-    
-    # Pause text
-    font = pygame.font.Font(None, 74)
-    pause_text = font.render("Game Paused", True, WHITE)
-    pause_rect = pause_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 50))
-    
-    # Continue text
-    continue_font = pygame.font.Font(None, 36)
-    continue_text = continue_font.render("Please continue playing the game", True, WHITE)
-    continue_rect = continue_text.get_rect(center=(WINDOW_WIDTH//2, WINDOW_HEIGHT//2))
-    
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            
-            if continue_button.handle_event(event):
-                return True
-            if exit_button.handle_event(event):
-                pygame.quit()
-                sys.exit()
-        
-        # Draw everything
-        screen.fill(BLACK)
-        screen.blit(pause_text, pause_rect)
-        screen.blit(continue_text, continue_rect)
-        continue_button.draw(screen)
-        exit_button.draw(screen)
-        pygame.display.flip()
-        clock.tick(60)
-
-def main():
+    background = menu_background([
+        (74, "Game Paused", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2 - 50)),
+        (36, "Please continue playing the game", (WINDOW_WIDTH//2, WINDOW_HEIGHT//2)),
+    ])
+    if run_menu(background, [continue_button, exit_button]) == 1:
+        sys.exit()
+    return True
+
+def main(tick_rate=TICK_RATE, fps=RENDER_FPS, interpolate=INTERPOLATE_MOVEMENT, profile_out=None,
+         seed=None, record=None, autopilot=False, world=None, foods=None, capture=None):
+    # F3 shows the profiler overlay. With profile_out every frame is timed
+    # and written there (.csv or .json) when the game exits. Every game starts
+    # from `seed` if one is given; with `record` the latest game's inputs are
+    # saved there for snake_replay. With `autopilot` the snake steers itself.
+    # `world` is a (width, height) board bigger than the window, followed by
+    # a camera, with `foods` creatures on it (M toggles the minimap).
+    # Rewind, save and load work on the standard board when not recording.
+    # With `capture` every game frame is saved there (see snake_capture);
+    # frames the encoder can't keep up with are dropped, never waited for.
     # Show welcome screen first
     if not show_welcome_screen():
         pygame.quit()
         sys.exit()
 
     # Load high score
-    high_score = load_high_score()
+    # Finished games go to a SQLite leaderboard; a high score file from
+    # older versions is imported into it on first run
+    leaderboard = Leaderboard(LEADERBOARD_FILE, LEGACY_HIGH_SCORE_FILE)
+    high_score = leaderboard.high_score()
+    tick_ms = 1000 / tick_rate
+    profiler = FrameProfiler() if profile_out else NULL_PROFILER
+    overlay = None
+    recorder = None
+    frames = FrameCapture(capture, screen.get_size(), fps or RENDER_FPS) if capture else None
+    if world:
+        snake_engine.set_grid_size(*world)
 
-    while True:
-        snake = Snake()
-        food_manager = FoodManager()
-        font = pygame.font.Font(None, 36)
-        game_running = True
-        pause_button = PauseButton()
-
-        while game_running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_UP and snake.direction != DOWN:
-                        snake.direction = UP
-                    elif event.key == pygame.K_DOWN and snake.direction != UP:
-                        snake.direction = DOWN
-                    elif event.key == pygame.K_LEFT and snake.direction != RIGHT:
-                        snake.direction = LEFT
-                    elif event.key == pygame.K_RIGHT and snake.direction != LEFT:
-                        snake.direction = RIGHT
-                
-                # Handle pause button
-                if pause_button.handle_event(event):
-                    if pause_button.is_paused:
-                        show_pause_screen()
-                        pause_button.is_paused = False
-
-            if not pause_button.is_paused:
-                # Update snake
-                if not snake.update():
-                    game_running = False
-                    # Update high score if current score is higher
-                    if snake.score > high_score:
-                        high_score = snake.score
-                        save_high_score(high_score)
-                    continue
+    def attempt(what, action, *args):
+        # One cleanup step; a failure is reported and doesn't stop the others
+        try:
+            action(*args)
+        except Exception as e:
+            print(f'could not {what}: {e}', file=sys.stderr)
+
+    def save_outputs():
+        if profile_out:
+            attempt(f'write {profile_out}', profiler.export, profile_out)
+        if recorder is not None:
+            attempt(f'save {record}', recorder.save, record)
+
+    def stop_capture():
+        try:
+            frames.close()  # raises the encoder's first write error
+        finally:
+            stats = frames.stats()
+            print(f'captured {stats["written"]} frames to {capture}, dropped {stats["dropped"]}', file=sys.stderr)
 
-                # Update foods
-                food_manager.update()
-
-                # Check if snake ate any food
-                head_pos = snake.get_head_position()
-                for food in food_manager.foods[:]:  # Create a copy of the list to avoid modification during iteration
-                    if food.position == head_pos:
-                        snake.length += 1
-                        snake.score += 10
-                        snake.change_color(food.current_food['color'])
-                        food_manager.remove_food(head_pos)
+    def shutdown():
+        # Every way out of the game comes through here, including sys.exit()
+        # from a menu. It never raises, so an exception on the way out isn't
+        # replaced by a cleanup error.
+        save_outputs()
+        attempt('close the leaderboard', leaderboard.close)
+        if frames is not None:
+            attempt(f'finish the capture in {capture}', stop_capture)
+        attempt('shut down pygame', pygame.quit)
+
+    try:
+        while True:
+            if world:
+                game = new_world_game(tick_rate, seed, foods)
+            else:
+                game = Game(tick_rate=tick_rate, seed=seed)
+            snake = game.snake
+            food_manager = game.food_manager
+            if record:
+                recorder = Recorder(game)
+            steer = game.turn if recorder is None else recorder.turn
+            pilot = Autopilot(game, turn=steer) if autopilot else None
+            rewind = RewindBuffer() if not world and recorder is None else None
+            if rewind is not None:
+                rewind.capture(game)
+            font = get_font(None, 36)
+            hud = Hud(font)
+            if world:
+                renderer = WorldRenderer(screen, Camera(), Minimap(food_manager))
+            else:
+                renderer = FrameRenderer(screen)
+            game_running = True
+            pause_button = PauseButton()
+            accumulator = 0
+            frame_ms = 0
+            clock.tick()
+
+            while game_running:
+                profiler.begin_frame()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        sys.exit()
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key in KEY_DIRECTIONS:
+                            steer(KEY_DIRECTIONS[event.key])
+                        elif event.key == pygame.K_F3:
+                            if overlay is None:
+                                overlay = ProfilerOverlay()
+                                if not profiler.enabled:
+                                    profiler = FrameProfiler(keep_samples=False)
+                            else:
+                                overlay = None
+                                if not profile_out:
+                                    profiler = NULL_PROFILER
+                            renderer.invalidate()
+                        elif event.key == pygame.K_m and world:
+                            renderer.show_minimap = not renderer.show_minimap
+                        elif rewind is not None and event.key in (pygame.K_BACKSPACE, pygame.K_F5, pygame.K_F9):
+                            if event.key == pygame.K_F5:
+                                try:
+                                    save(game, SAVE_FILE)
+                                except OSError as e:
+                                    print(f'could not save {SAVE_FILE}: {e}', file=sys.stderr)
+                                continue
+                            if event.key == pygame.K_BACKSPACE:
+                                rewind.rewind(game, REWIND_SECONDS * tick_rate)
+                            else:
+                                try:
+                                    load(SAVE_FILE, game)
+                                except (OSError, ValueError) as e:
+                                    print(f'could not load {SAVE_FILE}: {e}', file=sys.stderr)
+                                    continue
+                                rewind.clear()
+                                rewind.capture(game)
+                            # The board jumped: drop stale plans and redraw it all
+                            snake.moved = False
+                            if pilot is not None:
+                                pilot.path = []
+                            renderer.invalidate()
+                    
+                    # Handle pause button
+                    if pause_button.handle_event(event):
+                        if pause_button.is_paused:
+                            show_pause_screen()
+                            pause_button.is_paused = False
+                            renderer.invalidate()
+                            # Time spent in the menu doesn't count
+                            clock.tick()
+                profiler.mark(EVENTS)
+
+                # Run as many fixed ticks as the elapsed time covers. After a long
+                # stall only MAX_TICKS_PER_FRAME run and the rest is dropped, so
+                # the game slows down instead of falling further behind.
+                accumulator += frame_ms
+                ticks = 0
+                while not pause_button.is_paused and accumulator >= tick_ms:
+                    if ticks == MAX_TICKS_PER_FRAME:
+                        accumulator %= tick_ms
                         break
+                    accumulator -= tick_ms
+                    ticks += 1
+                    if pilot is not None:
+                        pilot.steer()
+                    # Move the snake, update foods and check if it ate any
+                    if not game.step():
+                        game_running = False
+                        break
+                    if rewind is not None:
+                        rewind.capture(game)
+                profiler.mark(UPDATE)
+                if not game_running:
+                    # Saved in the background; the high score updates at once
+                    leaderboard.record(snake.score, snake.length, game.elapsed, game.seed)
+                    high_score = leaderboard.high_score()
+                    continue
 
-                # Change snake color every 30 seconds (only if not changed by eating)
-                snake.change_color()
-
-            # Draw everything
-            screen.fill(BLACK)
-            snake.render(screen)
-            food_manager.render(screen)
-            
-            # Draw score, high score and food count
-            score_text = font.render(f'Score: {snake.score}', True, WHITE)
-            high_score_text = font.render(f'High Score: {high_score}', True, WHITE)
-            food_count_text = font.render(f'Food: {len(food_manager.foods)}', True, WHITE)
-            screen.blit(score_text, (10, 10))
-            screen.blit(high_score_text, (10, 50))
-            screen.blit(food_count_text, (10, 90))
-
-            # Draw pause button
-            pause_button.draw(screen)
+                # Draw everything: board, score, high score, food count and pause button
+                hud.update(snake.score, high_score, len(food_manager.foods))
+                alpha = accumulator / tick_ms if interpolate else None
+                if overlay is not None:
+                    overlay.update(profiler)
+                rects = renderer.render(snake, food_manager, hud, pause_button, alpha, overlay)
+                profiler.mark(RENDER)
+                renderer.present(rects)
+                if frames is not None:
+                    frames.capture(screen)
+                frame_ms = clock.tick(fps)
+                profiler.mark(PRESENT)
+                profiler.end_frame(len(snake.positions), len(food_manager.foods))
 
-            pygame.display.update()
-            clock.tick(8)
+            save_outputs()
 
-        # Show game over screen
-        if not show_game_over(screen, snake.score, high_score):
-            break
+            # Show game over screen
+            if not show_game_over(screen, snake.score, high_score):
+                break
+    finally:
+        shutdown()
 
 if __name__ == '__main__':
-    main() 
+    import argparse
+    parser = argparse.ArgumentParser(description='Snake Game')
+    parser.add_argument('--difficulty', choices=TICK_RATE_PRESETS, default='normal',
+                        help='game speed preset (simulation ticks per second)')
+    parser.add_argument('--fps', type=int, default=RENDER_FPS, help='render frame rate, 0 for unlimited')
+    parser.add_argument('--no-interpolation', action='store_true',
+                        help='move a whole cell per tick; choppier, but only changed cells are redrawn '
+                             '(interpolated frames are always drawn in full)')
+    parser.add_argument('--profile-out', metavar='PATH',
+                        help='time every frame and write the samples to PATH (.csv or .json) on exit')
+    parser.add_argument('--seed', type=int, help='start every game from this seed')
+    parser.add_argument('--record', metavar='PATH',
+                        help='save the inputs of the latest game to PATH for snake_replay.py')
+    parser.add_argument('--autopilot', action='store_true', help='let the snake play itself')
+    parser.add_argument('--world', metavar='WxH', help='play on a board of W x H cells with a scrolling camera')
+    parser.add_argument('--foods', type=int, help='creatures on a --world board')
+    parser.add_argument('--capture', metavar='PATH',
+                        help='save every frame: PNG files in the directory PATH, or a stream if PATH ends in .snkv')
+    args = parser.parse_args()
+    if args.seed is not None and not 0 <= args.seed < 2 ** 64:
+        # Snapshots and replays store the seed as a u64
+        parser.error('--seed must be between 0 and 2**64 - 1')
+    world = None
+    if args.world:
+        try:
+            world = tuple(int(n) for n in args.world.lower().split('x'))
+        except ValueError:
+            world = ()
+        if len(world) != 2 or world[0] < GRID_WIDTH or world[1] < GRID_HEIGHT:
+            parser.error(f'--world must be WxH with at least {GRID_WIDTH}x{GRID_HEIGHT} cells')
+        if FoodStore is None:
+            parser.error('--world needs numpy')
+        if args.record or args.autopilot:
+            parser.error('--record and --autopilot only work on the standard board')
+    main(TICK_RATE_PRESETS[args.difficulty], args.fps, not args.no_interpolation, args.profile_out,
+         args.seed, args.record, args.autopilot, world, args.foods, args.capture)
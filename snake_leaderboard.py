@@ -0,0 +1,148 @@
+# Leaderboard of every finished game, kept in SQLite. record() only queues the
+# row; a background thread writes queued rows in batches, one transaction
+# each, so the game never waits on the disk. WAL mode lets the game read
+# while a batch is being written.
+#
+# Percentiles come from score_counts, a games-per-score histogram kept in the
+# same transactions. It is read once at startup and kept up to date in
+# memory, so a percentile is a binary search rather than a count over every
+# game.
+import atexit
+import bisect
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+LEADERBOARD_FILE = 'leaderboard.db'
+LEGACY_HIGH_SCORE_FILE = 'high_score.json'
+BATCH_SIZE = 1000  # rows per write transaction at most
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL DEFAULT '',
+    score INTEGER NOT NULL,
+    length INTEGER,
+    duration REAL,
+    seed INTEGER,
+    played_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS games_score ON games (score);
+CREATE INDEX IF NOT EXISTS games_player_score ON games (player, score);
+CREATE TABLE IF NOT EXISTS score_counts (
+    score INTEGER PRIMARY KEY,
+    games INTEGER NOT NULL
+);
+'''
+
+INSERT_GAME = 'INSERT INTO games (player, score, length, duration, seed, played_at) VALUES (?, ?, ?, ?, ?, ?)'
+COUNT_SCORE = ('INSERT INTO score_counts (score, games) VALUES (?, 1) '
+               'ON CONFLICT (score) DO UPDATE SET games = games + 1')
+
+def connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+def write_rows(connection, rows):
+    with connection:
+        connection.executemany(INSERT_GAME, rows)
+        connection.executemany(COUNT_SCORE, [(row[1],) for row in rows])
+
+class Leaderboard:
+    def __init__(self, path=LEADERBOARD_FILE, legacy_path=LEGACY_HIGH_SCORE_FILE):
+        self.path = path
+        self.connection = connect(path)
+        self.connection.executescript(SCHEMA)
+        if legacy_path and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+        self.best = self.connection.execute('SELECT MAX(score) FROM games').fetchone()[0] or 0
+        self.score_counts = dict(self.connection.execute('SELECT score, games FROM score_counts'))
+        self._scores = None  # sorted scores and games below each, rebuilt after a record()
+        self._below = None
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self._write, name='leaderboard-writer', daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+    def _migrate(self, legacy_path):
+        # Bring a high_score.json from before the leaderboard in as one game
+        # with only a score, then keep the old file aside as .bak
+        try:
+            with open(legacy_path) as f:
+                score = int(json.load(f)['high_score'])
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        write_rows(self.connection, [('', score, None, None, None, os.path.getmtime(legacy_path))])
+        os.replace(legacy_path, legacy_path + '.bak')
+
+    def _write(self):
+        connection = connect(self.path)
+        while True:
+            rows = [self.queue.get()]
+            while rows[-1] is not None and len(rows) < BATCH_SIZE:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = rows[-1] is None
+            if stop:
+                rows.pop()
+            if rows:
+                try:
+                    write_rows(connection, rows)
+                except sqlite3.Error as e:
+                    print(f'leaderboard: could not save {len(rows)} game(s): {e}', file=sys.stderr)
+            for _ in range(len(rows) + stop):
+                self.queue.task_done()
+            if stop:
+                connection.close()
+                return
+
+    def record(self, score, length, duration, seed=None, player=''):
+        # Queue a finished game; returns at once
+        self.best = max(self.best, score)
+        self.score_counts[score] = self.score_counts.get(score, 0) + 1
+        self._scores = None
+        self.queue.put((player, score, length, duration, seed, time.time()))
+
+    def flush(self):
+        # Wait until every recorded game is on disk
+        self.queue.join()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.connection.close()
+
+    def high_score(self):
+        return self.best
+
+    def top(self, n=10):
+        # (player, score, length, duration, seed, played_at) of the n best games
+        return self.connection.execute(
+            'SELECT player, score, length, duration, seed, played_at FROM games ORDER BY score DESC LIMIT ?',
+            (n,)).fetchall()
+
+    def percentile(self, score):
+        # Percentage of recorded games that scored less than `score`
+        if self._scores is None:
+            self._scores = sorted(self.score_counts)
+            below = self._below = [0]
+            for s in self._scores:
+                below.append(below[-1] + self.score_counts[s])
+        total = self._below[-1]
+        if not total:
+            return 0.0
+        return 100 * self._below[bisect.bisect_left(self._scores, score)] / total
+
+    def player_percentile(self, player):
+        # Percentile of a player's best game, or None if they have none
+        best = self.connection.execute('SELECT MAX(score) FROM games WHERE player = ?', (player,)).fetchone()[0]
+        return None if best is None else self.percentile(best)
@@ -0,0 +1,95 @@
+# Per-frame timing for the game loop. Each frame is split into phases timed
+# with perf_counter_ns; a rolling window gives p50/p95/p99 per phase and every
+# frame can be exported to CSV or JSON. NullProfiler has the same interface
+# and does nothing, so an unprofiled loop only pays for empty method calls.
+import csv
+import json
+import time
+from array import array
+
+PHASES = ('events', 'update', 'render', 'present')
+EVENTS, UPDATE, RENDER, PRESENT = range(len(PHASES))
+COUNTS = ('snake_length', 'foods')
+FIELDS = ('frame',) + tuple(f'{phase}_ns' for phase in PHASES) + ('total_ns',) + COUNTS
+
+class FrameProfiler:
+    enabled = True
+
+    def __init__(self, window=600, keep_samples=True):
+        self.window = window
+        self.keep_samples = keep_samples
+        # Rolling window of phase durations, one ring per phase plus the total
+        self.rings = [array('q', bytes(8 * window)) for _ in range(len(PHASES) + 1)]
+        self.frames = 0
+        # Every frame since the profiler started, flattened FIELDS-wide rows
+        self.samples = array('q')
+        self.counts = (0, 0)
+        self._row = [0] * len(PHASES)
+        self._start = self._last = time.perf_counter_ns()  # created mid-frame, e.g. on F3
+
+    def begin_frame(self):
+        self._row = [0] * len(PHASES)
+        self._start = self._last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        # End `phase`, which started at the previous mark
+        now = time.perf_counter_ns()
+        self._row[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self, snake_length=0, foods=0):
+        row = self._row
+        total = self._last - self._start
+        slot = self.frames % self.window
+        for phase, duration in enumerate(row):
+            self.rings[phase][slot] = duration
+        self.rings[-1][slot] = total
+        if self.keep_samples:
+            self.samples.append(self.frames)
+            self.samples.extend(row)
+            self.samples.extend((total, snake_length, foods))
+        self.counts = (snake_length, foods)
+        self.frames += 1
+
+    def percentiles(self, phase=None, points=(50, 95, 99)):
+        # Percentiles in nanoseconds over the rolling window; phase None is
+        # the whole frame
+        ring = self.rings[-1 if phase is None else phase]
+        values = sorted(ring[:min(self.frames, self.window)])
+        if not values:
+            return tuple(0 for _ in points)
+        return tuple(values[min(len(values) - 1, len(values) * p // 100)] for p in points)
+
+    def rows(self):
+        width = len(FIELDS)
+        for i in range(0, len(self.samples), width):
+            yield tuple(self.samples[i:i + width])
+
+    def export(self, path):
+        # Write every recorded frame to `path`; JSON for .json, CSV otherwise
+        if path.endswith('.json'):
+            summary = {PHASES[i]: dict(zip(('p50', 'p95', 'p99'), self.percentiles(i)))
+                       for i in range(len(PHASES))}
+            summary['total'] = dict(zip(('p50', 'p95', 'p99'), self.percentiles()))
+            with open(path, 'w') as f:
+                json.dump({'fields': FIELDS, 'frames': list(self.rows()), 'percentiles_ns': summary}, f)
+        else:
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(FIELDS)
+                writer.writerows(self.rows())
+
+class NullProfiler:
+    enabled = False
+    frames = 0
+
+    def begin_frame(self):
+        pass
+
+    def mark(self, phase):
+        pass
+
+    def end_frame(self, snake_length=0, foods=0):
+        pass
+
+NULL_PROFILER = NullProfiler()
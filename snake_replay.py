@@ -0,0 +1,134 @@
+# Input recording and replay. A game is fully determined by its seed, its
+# tick rate and the turns the player made, so a recording stores just those
+# plus a checksum of the final state to prove playback ended up in the same
+# place. Replays run on the headless engine as fast as it can step.
+#
+# File layout (little-endian):
+#   header  b'SNKR', version u8, tick_rate u16, seed u64
+#   inputs  one varint per turn: ticks since the previous turn << 2 | direction
+#   footer  final tick u32, state checksum u32
+# A turn made within 31 ticks of the previous one takes a single byte.
+import struct
+import sys
+import time
+import zlib
+
+from snake_engine import DIRECTIONS, Game
+
+MAGIC = b'SNKR'
+VERSION = 1
+HEADER = struct.Struct('<4sBHQ')
+FOOTER = struct.Struct('<II')
+
+def checksum(game):
+    # CRC of everything the rules depend on: snake, score, foods and the tick
+    snake = game.snake
+    foods = [(food.position, food.direction, food.current_food['shape'], food.current_food['color'], food.born)
+             for food in game.food_manager.foods]
+    state = (game.ticks, snake.score, snake.length, tuple(snake.positions), snake.direction, snake.color, foods)
+    return zlib.crc32(repr(state).encode())
+
+def encode_varint(value, out):
+    while value >= 0x80:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+
+def decode_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+class Recorder:
+    # Steer the game through turn() so every effective turn is written down
+    def __init__(self, game):
+        if not 0 <= game.seed < 2 ** 64:
+            raise ValueError('replays need a seed between 0 and 2**64 - 1')
+        self.game = game
+        self.inputs = bytearray()
+        self.last_tick = game.ticks
+
+    def turn(self, direction):
+        snake = self.game.snake
+        before = snake.direction
+        self.game.turn(direction)
+        if snake.direction != before:
+            tick = self.game.ticks
+            encode_varint((tick - self.last_tick) << 2 | DIRECTIONS.index(snake.direction), self.inputs)
+            self.last_tick = tick
+
+    def finish(self):
+        # The recording up to the game's current tick
+        game = self.game
+        return (HEADER.pack(MAGIC, VERSION, game.tick_rate, game.seed) + self.inputs
+                + FOOTER.pack(game.ticks, checksum(game)))
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.finish())
+
+class Replay:
+    def __init__(self, data):
+        if len(data) < HEADER.size + FOOTER.size:
+            raise ValueError('not a snake replay')
+        magic, version, self.tick_rate, self.seed = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('not a snake replay')
+        self.end_tick, self.checksum = FOOTER.unpack_from(data, len(data) - FOOTER.size)
+        # (tick, direction) for every recorded turn, in order
+        self.inputs = []
+        pos, end = HEADER.size, len(data) - FOOTER.size
+        tick = 0
+        while pos < end:
+            value, pos = decode_varint(data, pos)
+            tick += value >> 2
+            self.inputs.append((tick, DIRECTIONS[value & 3]))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def play(self, until=None, game_class=Game):
+        # Replay headlessly up to tick `until` (the end of the recording by
+        # default) and return the game at that point, including any turns
+        # made during that tick
+        until = self.end_tick if until is None else min(until, self.end_tick)
+        game = game_class(tick_rate=self.tick_rate, seed=self.seed)
+        inputs = self.inputs
+        i = 0
+        step = game.step
+        while True:
+            tick = game.ticks
+            while i < len(inputs) and inputs[i][0] == tick:
+                game.turn(inputs[i][1])
+                i += 1
+            if tick >= until or not step():
+                return game
+
+    def verify(self):
+        # True if playing the whole recording reproduces the recorded state
+        return checksum(self.play()) == self.checksum
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Play back a Snake recording headlessly')
+    parser.add_argument('path')
+    parser.add_argument('--tick', type=int, help='stop at this tick instead of the end')
+    args = parser.parse_args()
+    replay = Replay.load(args.path)
+    start = time.perf_counter()
+    game = replay.play(args.tick)
+    elapsed = time.perf_counter() - start
+    print(f'tick {game.ticks}/{replay.end_tick}  score {game.snake.score}  length {game.snake.length}  '
+          f'({game.ticks / max(elapsed, 1e-9):.0f} ticks/s)')
+    if game.ticks == replay.end_tick:
+        if checksum(game) != replay.checksum:
+            print('checksum mismatch: playback diverged from the recording')
+            sys.exit(1)
+        print('checksum ok')
@@ -0,0 +1,474 @@
+# Authoritative multiplayer server: several snakes on one board with one
+# shared FoodManager, played over TCP with asyncio. The server runs every
+# tick; clients only send turns and draw what they are told.
+#
+# The rules are the engine's: wraparound, growth and food drift, and a snake
+# dies when its head runs into its own body or into any other snake (both
+# die head to head). A dead snake comes back on the next tick as a new
+# one-cell snake somewhere free.
+#
+# Protocol. A client sends one byte per turn, an index into DIRECTIONS.
+# The server sends messages, each a u32 length and then a type byte:
+#   W  welcome  player id u16, width u16, height u16, tick rate u16
+#   S  state    tick u32, snakes u16, foods u16; each snake's id u16, cell
+#               count u16 and cells head first; each food's cell and type u8
+#   T  tick     tick u32 and counts u16 of moves, deaths, joins, drifted,
+#               spawned and eaten, then in that order:
+#                 moves    ids, new head cells, tail dropped u8 each
+#                 deaths   ids
+#                 joins    ids, cells
+#                 drifted  from cells, to cells, food types u8
+#                 spawned  cells, food types u8
+#                 eaten    cells; every food on the cell is gone
+# Cells are y * width + x as u16; everything is little-endian. A client
+# gets W and S on joining, then one T per tick, so only what changed goes
+# over the wire. If a client's send buffer backs up past SEND_BUFFER_LIMIT
+# the server stops sending it ticks rather than waiting, and sends a fresh S
+# once the buffer has drained. A client stuck for SLOW_CLIENT_TIMEOUT is
+# disconnected.
+import asyncio
+import json
+import random
+import socket
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+
+import snake_engine
+from snake_engine import DIRECTIONS, FOOD_MOVE_INTERVAL, FOOD_SCORE, TICK_RATE, FoodManager, Snake
+from snake_snapshot import TYPE_INDEX
+
+SERVER_PORT = 7777
+BOARD_WIDTH = 160
+BOARD_HEIGHT = 120
+MAX_FOODS = 200
+INPUT_QUEUE_SIZE = 4  # turns buffered per player; each tick applies one
+SEND_BUFFER_LIMIT = 32 * 1024  # bytes waiting for a client before it is skipped
+SOCKET_SEND_BUFFER = 16 * 1024  # kept small so a slow client shows up in SEND_BUFFER_LIMIT
+SLOW_CLIENT_TIMEOUT = 5.0  # seconds a client may stay backed up
+LISTEN_BACKLOG = 1024
+STATS_WINDOW = 10000  # ticks kept for the timing stats
+
+FRAME = struct.Struct('<I')
+WELCOME = struct.Struct('<cHHHH')
+STATE = struct.Struct('<cIHH')
+TICK = struct.Struct('<cIHHHHHH')
+
+def _u16(values):
+    column = array('H', values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+def _read_u16(data, pos, count):
+    column = array('H')
+    column.frombytes(data[pos:pos + 2 * count])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column, pos + 2 * count
+
+def frame(payload):
+    return FRAME.pack(len(payload)) + payload
+
+class EventFoodManager(FoodManager):
+    # Notes every change to the food so the server can send it as a delta
+    def __init__(self, snake=None, max_foods=50, min_foods=40, rng=None, move_interval=FOOD_MOVE_INTERVAL):
+        self.drifted = []  # (from cell, to cell, type)
+        self.spawned = []  # (cell, type)
+        self.eaten = []  # cells
+        super().__init__(snake, max_foods, min_foods, rng, move_interval)
+
+    def add_new_food(self):
+        food = super().add_new_food()
+        if food is not None:
+            self.spawned.append((food.position, TYPE_INDEX[id(food.current_food)]))
+        return food
+
+    def _unplace(self, food, position):
+        # Only moves unplace a food, and the food is already at its new cell
+        super()._unplace(food, position)
+        self.drifted.append((position, food.position, TYPE_INDEX[id(food.current_food)]))
+
+    def remove_food(self, position):
+        super().remove_food(position)
+        self.eaten.append(position)
+
+    def take_events(self):
+        events = self.drifted, self.spawned, self.eaten
+        self.drifted, self.spawned, self.eaten = [], [], []
+        return events
+
+class Player:
+    __slots__ = ('id', 'snake', 'inputs')
+
+    def __init__(self, player_id):
+        self.id = player_id
+        self.snake = None  # until the next tick places it
+        self.inputs = deque(maxlen=INPUT_QUEUE_SIZE)
+
+class World:
+    # The shared board. `board` counts the segments of every snake on each
+    # cell, so hitting another snake is one lookup; it also serves as the food
+    # manager's `snake` so food never spawns under a body.
+    def __init__(self, width=BOARD_WIDTH, height=BOARD_HEIGHT, max_foods=MAX_FOODS, seed=None):
+        if width * height > 0x10000:
+            raise ValueError('the board can have at most 65536 cells')
+        snake_engine.set_grid_size(width, height)
+        self.width = width
+        self.height = height
+        self.rng = random.Random(seed)
+        self.board = bytearray(width * height)
+        self.players = {}
+        self.joining = []  # players to place on the next tick
+        self.deaths = []  # ids of snakes gone since the last tick
+        self.tick = 0
+        self.food_manager = EventFoodManager(self, max_foods, max_foods * 4 // 5, self.rng)
+        self.food_manager.take_events()  # the first foods go out in S messages
+
+    def is_occupied(self, position):
+        return self.board[position[1] * self.width + position[0]] > 0
+
+    def add_player(self):
+        player_id = next(i for i in range(1, 0x10000) if i not in self.players)
+        player = self.players[player_id] = Player(player_id)
+        self.joining.append(player)
+        return player
+
+    def remove_player(self, player_id):
+        player = self.players.pop(player_id, None)
+        if player is None:
+            return
+        if player.snake is not None:
+            self._clear(player)
+            self.deaths.append(player_id)
+        elif player in self.joining:
+            self.joining.remove(player)
+
+    def _clear(self, player):
+        board, width = self.board, self.width
+        for x, y in player.snake.positions:
+            board[y * width + x] -= 1
+        player.snake = None
+
+    def _free_cell(self):
+        # A cell with no snake and no food: a few random tries, then a scan
+        by_position = self.food_manager.by_position
+        width, height = self.width, self.height
+        for _ in range(32):
+            cell = self.rng.randrange(width * height)
+            position = (cell % width, cell // width)
+            if not self.board[cell] and position not in by_position:
+                return position
+        cells = [(cell % width, cell // width) for cell in range(width * height)
+                 if not self.board[cell] and (cell % width, cell // width) not in by_position]
+        return self.rng.choice(cells) if cells else None
+
+    def step(self):
+        # Run one tick for every player and return it as a T message
+        self.tick += 1
+        board, width = self.board, self.width
+
+        # Every snake moves first, so a head may follow another snake's tail
+        moves = []
+        dead = []
+        for player in self.players.values():
+            snake = player.snake
+            if snake is None:
+                continue
+            if player.inputs:
+                x, y = snake.direction
+                direction = player.inputs.popleft()
+                if direction != (-x, -y):
+                    snake.direction = direction
+            positions = snake.positions  # a copy, from before the move
+            tail = positions[-1]
+            if not snake.update():
+                dead.append(player)
+                continue
+            head = snake.get_head_position()
+            board[head[1] * width + head[0]] += 1
+            dropped = len(snake.positions) == len(positions)
+            if dropped:
+                board[tail[1] * width + tail[0]] -= 1
+            moves.append((player, head, dropped))
+        for player, head, _ in moves:
+            cell = head[1] * width + head[0]
+            if board[cell] > player.snake.occupancy[cell]:
+                dead.append(player)
+        deaths = self.deaths
+        self.deaths = []
+        for player in dead:
+            self._clear(player)
+            deaths.append(player.id)
+
+        # New players, and those who died last tick, start after the moves
+        joins = []
+        waiting = []
+        for player in self.joining:
+            position = self._free_cell()
+            if position is None:
+                waiting.append(player)
+                continue
+            snake = player.snake = Snake(self.rng)
+            snake.positions = [position]
+            board[position[1] * width + position[0]] += 1
+            joins.append((player.id, position))
+        self.joining = waiting + dead
+
+        # Then food drifts and snakes eat, as in Game.step
+        food_manager = self.food_manager
+        food_manager.update()
+        for player, head, _ in moves:
+            snake = player.snake
+            if snake is None:
+                continue
+            food = food_manager.food_at(head)
+            if food is not None:
+                snake.length += 1
+                snake.score += FOOD_SCORE
+                snake.change_color(food.current_food['color'])
+                food_manager.remove_food(head)
+        drifted, spawned, eaten = food_manager.take_events()
+
+        def cells(positions):
+            return _u16([y * width + x for x, y in positions])
+
+        return frame(b''.join((
+            TICK.pack(b'T', self.tick, len(moves), len(deaths), len(joins), len(drifted), len(spawned), len(eaten)),
+            _u16([player.id for player, _, _ in moves]),
+            cells([head for _, head, _ in moves]),
+            bytes([dropped for _, _, dropped in moves]),
+            _u16(deaths),
+            _u16([player_id for player_id, _ in joins]),
+            cells([position for _, position in joins]),
+            cells([start for start, _, _ in drifted]),
+            cells([end for _, end, _ in drifted]),
+            bytes([kind for _, _, kind in drifted]),
+            cells([position for position, _ in spawned]),
+            bytes([kind for _, kind in spawned]),
+            cells(eaten),
+        )))
+
+    def state(self):
+        # The whole board as an S message
+        width = self.width
+        snakes = [player for player in self.players.values() if player.snake is not None]
+        foods = self.food_manager.foods
+        parts = [STATE.pack(b'S', self.tick, len(snakes), len(foods))]
+        for player in snakes:
+            positions = player.snake.positions
+            parts.append(_u16([player.id, len(positions)]))
+            parts.append(_u16([y * width + x for x, y in positions]))
+        parts.append(_u16([food.position[1] * width + food.position[0] for food in foods]))
+        parts.append(bytes([TYPE_INDEX[id(food.current_food)] for food in foods]))
+        return frame(b''.join(parts))
+
+class ClientBoard:
+    # A client's copy of the board, kept up to date from the server's
+    # messages (without their length prefix)
+    def __init__(self):
+        self.player = None
+        self.width = self.height = self.tick_rate = None
+        self.tick = None
+        self.snakes = {}  # id -> deque of cells, head first
+        self.foods = {}  # cell -> food types on it
+
+    def apply(self, message):
+        kind = message[:1]
+        if kind == b'W':
+            _, self.player, self.width, self.height, self.tick_rate = WELCOME.unpack_from(message)
+        elif kind == b'S':
+            self._apply_state(message)
+        elif kind == b'T':
+            self._apply_tick(message)
+
+    def _apply_state(self, message):
+        _, self.tick, snakes, foods = STATE.unpack_from(message)
+        pos = STATE.size
+        self.snakes = {}
+        for _ in range(snakes):
+            (player_id, count), pos = _read_u16(message, pos, 2)
+            cells, pos = _read_u16(message, pos, count)
+            self.snakes[player_id] = deque(cells)
+        cells, pos = _read_u16(message, pos, foods)
+        self.foods = {}
+        for cell, kind in zip(cells, message[pos:pos + foods]):
+            self.foods.setdefault(cell, []).append(kind)
+
+    def _apply_tick(self, message):
+        _, self.tick, moves, deaths, joins, drifted, spawned, eaten = TICK.unpack_from(message)
+        pos = TICK.size
+        ids, pos = _read_u16(message, pos, moves)
+        heads, pos = _read_u16(message, pos, moves)
+        dropped = message[pos:pos + moves]
+        pos += moves
+        snakes = self.snakes
+        for player_id, head, drop in zip(ids, heads, dropped):
+            body = snakes[player_id]
+            body.appendleft(head)
+            if drop:
+                body.pop()
+        ids, pos = _read_u16(message, pos, deaths)
+        for player_id in ids:
+            snakes.pop(player_id, None)
+        ids, pos = _read_u16(message, pos, joins)
+        cells, pos = _read_u16(message, pos, joins)
+        for player_id, cell in zip(ids, cells):
+            snakes[player_id] = deque([cell])
+        foods = self.foods
+        starts, pos = _read_u16(message, pos, drifted)
+        ends, pos = _read_u16(message, pos, drifted)
+        for start, end, kind in zip(starts, ends, message[pos:pos + drifted]):
+            here = foods[start]
+            here.remove(kind)
+            if not here:
+                del foods[start]
+            foods.setdefault(end, []).append(kind)
+        pos += drifted
+        cells, pos = _read_u16(message, pos, spawned)
+        for cell, kind in zip(cells, message[pos:pos + spawned]):
+            foods.setdefault(cell, []).append(kind)
+        pos += spawned
+        cells, pos = _read_u16(message, pos, eaten)
+        for cell in cells:
+            foods.pop(cell, None)
+
+    def key(self):
+        # Comparable summary of the board
+        return (self.tick, sorted((player_id, tuple(body)) for player_id, body in self.snakes.items()),
+                sorted((cell, sorted(kinds)) for cell, kinds in self.foods.items()))
+
+class Client:
+    __slots__ = ('player', 'writer', 'synced', 'stalled_since')
+
+    def __init__(self, player, writer):
+        self.player = player
+        self.writer = writer
+        self.synced = True
+        self.stalled_since = None
+
+class Server:
+    def __init__(self, world, tick_rate=TICK_RATE):
+        self.world = world
+        self.tick_rate = tick_rate
+        self.clients = {}
+        # Seconds each tick started after it was due, and spent running it
+        self.lateness = deque(maxlen=STATS_WINDOW)
+        self.step_times = deque(maxlen=STATS_WINDOW)
+        self.bytes_sent = 0
+        self.peak_clients = 0
+        self.resyncs = 0
+        self.dropped = 0
+
+    def _send(self, client, data):
+        client.writer.write(data)
+        self.bytes_sent += len(data)
+
+    async def handle(self, reader, writer):
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_SEND_BUFFER)
+        world = self.world
+        player = world.add_player()
+        client = self.clients[player.id] = Client(player, writer)
+        self.peak_clients = max(self.peak_clients, len(self.clients))
+        self._send(client, frame(WELCOME.pack(b'W', player.id, world.width, world.height, self.tick_rate))
+                   + world.state())
+        inputs = player.inputs
+        try:
+            while True:
+                data = await reader.read(64)
+                if not data:
+                    break
+                inputs.extend(DIRECTIONS[byte] for byte in data if byte < len(DIRECTIONS))
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(player.id, None)
+            world.remove_player(player.id)
+            writer.close()
+
+    def broadcast(self, message):
+        # Send one tick to every client without ever waiting on one
+        now = time.monotonic()
+        state = None
+        for client in list(self.clients.values()):
+            writer = client.writer
+            if writer.is_closing():
+                continue
+            buffered = writer.transport.get_write_buffer_size()
+            if client.synced:
+                if buffered <= SEND_BUFFER_LIMIT:
+                    self._send(client, message)
+                    continue
+                client.synced = False
+                client.stalled_since = now
+            if buffered <= SEND_BUFFER_LIMIT // 4:
+                if state is None:
+                    state = self.world.state()
+                self._send(client, state)
+                client.synced = True
+                self.resyncs += 1
+            elif now - client.stalled_since > SLOW_CLIENT_TIMEOUT:
+                self.dropped += 1
+                writer.transport.abort()  # close() would wait for the backlog to drain
+
+    async def run(self, duration=None):
+        # The tick loop. A tick that starts more than a whole tick late is
+        # not caught up; the schedule restarts from now instead.
+        loop = asyncio.get_running_loop()
+        interval = 1 / self.tick_rate
+        start = due = loop.time()
+        while duration is None or due - start < duration:
+            await asyncio.sleep(max(0, due - loop.time()))
+            now = loop.time()
+            self.lateness.append(now - due)
+            self.broadcast(self.world.step())
+            self.step_times.append(loop.time() - now)
+            due += interval
+            if loop.time() - due > interval:
+                due = loop.time()
+
+    def stats(self):
+        def percentiles(samples):
+            samples = sorted(samples)
+            if not samples:
+                return {}
+            pick = lambda p: samples[min(len(samples) - 1, len(samples) * p // 100)] * 1000
+            return {'p50_ms': pick(50), 'p99_ms': pick(99), 'max_ms': samples[-1] * 1000}
+        return {'ticks': self.world.tick, 'tick_rate': self.tick_rate, 'peak_clients': self.peak_clients,
+                'lateness': percentiles(self.lateness), 'step': percentiles(self.step_times),
+                'bytes_sent': self.bytes_sent, 'resyncs': self.resyncs, 'dropped': self.dropped}
+
+async def serve(host='127.0.0.1', port=SERVER_PORT, tick_rate=TICK_RATE, width=BOARD_WIDTH, height=BOARD_HEIGHT,
+                foods=MAX_FOODS, duration=None, seed=None):
+    # Run a server until `duration` seconds have passed (forever by default)
+    server = Server(World(width, height, foods, seed), tick_rate)
+    listener = await asyncio.start_server(server.handle, host, port, backlog=LISTEN_BACKLOG)
+    print(f'listening on {host}:{listener.sockets[0].getsockname()[1]}', flush=True)
+    async with listener:
+        await server.run(duration)
+    return server
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Multiplayer Snake server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='0 picks a free port')
+    parser.add_argument('--tick-rate', type=int, default=TICK_RATE)
+    parser.add_argument('--size', default=f'{BOARD_WIDTH}x{BOARD_HEIGHT}', metavar='WxH')
+    parser.add_argument('--foods', type=int, default=MAX_FOODS)
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--duration', type=float, help='stop after this many seconds and print stats as JSON')
+    args = parser.parse_args()
+    try:
+        width, height = (int(n) for n in args.size.lower().split('x'))
+    except ValueError:
+        parser.error('--size must be WxH')
+    server = asyncio.run(serve(args.host, args.port, args.tick_rate, width, height, args.foods, args.duration,
+                               args.seed))
+    if args.duration:
+        print(json.dumps(server.stats()), flush=True)
@@ -0,0 +1,279 @@
+# Snapshots of a whole game as compact bytes, and a rewind buffer built on
+# them. A snapshot holds everything the rules read: the snake, every food
+# with its counters, the order of the food manager's internal pools and the
+# rng state, so a restored game carries on exactly as the original would.
+#
+# The rewind buffer keeps a snapshot every `keyframe_interval` ticks and, in
+# between, only the direction the snake moved in on each tick: one byte. The
+# engine is deterministic, so restoring a tick means restoring the keyframe
+# before it and stepping forward with those directions. Capture is a byte
+# append on most ticks and memory is capped at `max_keyframes` segments.
+#
+# Snapshot layout (little-endian):
+#   header  b'SNKS', version u8, width u16, height u16, tick_rate u16, seed u64,
+#           ticks u32, over u8
+#   rng     Mersenne Twister state 625 x u32, has gauss u8, gauss f64
+#   snake   length u32, score u32, direction u8, color 3 x u8, color index u8,
+#           last color change f64, segments u32, then each segment's cell
+#   foods   manager tick u32, max u32, min i32, move interval u32, foods u32,
+#           free cells u32, stacked cells u32, then per food its cell, type u8, direction u8
+#           and spawn tick u32; the foods again in move-bucket order; the free
+#           cells in pool order; and for cells holding more than one food,
+#           the count and the foods in the order food_at sees them
+# Cells are y * width + x, as u16 on boards of up to 65536 cells, else u32.
+# Version 1 snapshots, from before the move interval was saved, load with
+# FOOD_MOVE_INTERVAL.
+import struct
+import sys
+from array import array
+from collections import deque
+
+import snake_engine
+from snake_engine import DIRECTIONS, FOOD_TYPES, FOOD_MOVE_INTERVAL, ANIMATION_SPEED, CellPool, FoodManager, Game
+
+MAGIC = b'SNKS'
+VERSION = 2
+HEADER = struct.Struct('<4sBHHHQIB')
+RNG = struct.Struct('<625IBd')
+SNAKE = struct.Struct('<IIB3BBdI')
+FOODS = struct.Struct('<IIiIIII')
+FOODS_V1 = struct.Struct('<IIiIII')  # no move interval
+MAX_MOVE_INTERVAL = 0xFFFF  # restore builds a move bucket per tick of it
+
+KEYFRAME_INTERVAL = 32  # ticks between full snapshots in a RewindBuffer
+MAX_KEYFRAMES = 16  # segments kept; older history is dropped
+
+DIRECTION_INDEX = {direction: i for i, direction in enumerate(DIRECTIONS)}
+TYPE_INDEX = {id(food_type): i for i, food_type in enumerate(FOOD_TYPES)}
+
+def _cell_code(width, height):
+    return 'H' if width * height <= 0x10000 else 'I'
+
+def _pack(code, values):
+    column = array(code, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+def _unpack(code, data, pos, count):
+    column = array(code)
+    end = pos + count * column.itemsize
+    column.frombytes(data[pos:end])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column, end
+
+def snapshot(game):
+    # The full state of a game on the engine's FoodManager as bytes
+    if not isinstance(game.food_manager, FoodManager):
+        raise TypeError('snapshots need a FoodManager')
+    if not 0 <= game.seed < 2 ** 64:
+        raise ValueError('snapshots need a seed between 0 and 2**64 - 1')
+    if game.food_manager.move_interval > MAX_MOVE_INTERVAL:
+        raise ValueError(f'snapshots need a food move interval of at most {MAX_MOVE_INTERVAL}')
+    width, height = snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT
+    code = _cell_code(width, height)
+    snake = game.snake
+    manager = game.food_manager
+    foods = manager.foods
+    slots = {food: i for i, food in enumerate(foods)}
+    _, mt, gauss = game.rng.getstate()
+    # Stacked cells in board order, so equal states give equal bytes
+    stacked = [cell_foods for _, cell_foods in sorted(manager.by_position.items()) if len(cell_foods) > 1]
+    stacked_slots = []
+    for cell_foods in stacked:
+        stacked_slots.append(len(cell_foods))
+        stacked_slots.extend(slots[food] for food in cell_foods)
+    return b''.join((
+        HEADER.pack(MAGIC, VERSION, width, height, game.tick_rate, game.seed, game.ticks, game.over),
+        RNG.pack(*mt, gauss is not None, gauss or 0.0),
+        SNAKE.pack(snake.length, snake.score, DIRECTION_INDEX[snake.direction], *snake.color,
+                   snake.current_color_index, snake.last_color_change, len(snake.positions)),
+        _pack(code, [y * width + x for x, y in snake.positions]),
+        FOODS.pack(manager.tick, manager.max_foods, manager.min_foods, manager.move_interval, len(foods),
+                   len(manager.free_cells), len(stacked)),
+        _pack(code, [food.position[1] * width + food.position[0] for food in foods]),
+        bytes([TYPE_INDEX[id(food.current_food)] for food in foods]),
+        bytes([DIRECTION_INDEX[food.direction] for food in foods]),
+        _pack('I', [food.born for food in foods]),
+        _pack('I', [slots[food] for bucket in manager.move_buckets for food in bucket]),
+        _pack(code, [y * width + x for x, y in manager.free_cells]),
+        _pack('I', stacked_slots),
+    ))
+
+def _new_food(manager, position, kind, direction, born):
+    # A food from its saved fields, without the rng draws of Food.__init__
+    cls = manager.food_class
+    food = cls.__new__(cls)
+    food.clock = manager
+    food.rng = manager.rng
+    food.tick = 0
+    food.born = born
+    food.position = position
+    food.current_food = FOOD_TYPES[kind]
+    food.direction = DIRECTIONS[direction]
+    food.animation_speed = ANIMATION_SPEED
+    return food
+
+def _parse(data):
+    # Every field of a snapshot, checked before any game is touched
+    magic, version, width, height, tick_rate, seed, ticks, over = HEADER.unpack_from(data)
+    if magic != MAGIC or version not in (1, VERSION):
+        raise ValueError('not a snake snapshot')
+    if (width, height) != (snake_engine.GRID_WIDTH, snake_engine.GRID_HEIGHT):
+        raise ValueError(f'snapshot is of a {width}x{height} board')
+    code = _cell_code(width, height)
+    pos = HEADER.size
+    *mt, has_gauss, gauss = RNG.unpack_from(data, pos)
+    pos += RNG.size
+    snake = SNAKE.unpack_from(data, pos)
+    pos += SNAKE.size
+    segments, pos = _unpack(code, data, pos, snake[-1])
+    if version == 1:
+        tick, max_foods, min_foods, count, free, stacked = FOODS_V1.unpack_from(data, pos)
+        manager = (tick, max_foods, min_foods, FOOD_MOVE_INTERVAL, count, free, stacked)
+        pos += FOODS_V1.size
+    else:
+        manager = FOODS.unpack_from(data, pos)
+        pos += FOODS.size
+    _, _, _, move_interval, count, free, stacked = manager
+    if not 1 <= move_interval <= MAX_MOVE_INTERVAL:
+        raise ValueError('bad food move interval in snake snapshot')
+    cells, pos = _unpack(code, data, pos, count)
+    kinds = data[pos:pos + count]
+    directions = data[pos + count:pos + 2 * count]
+    pos += 2 * count
+    borns, pos = _unpack('I', data, pos, count)
+    order, pos = _unpack('I', data, pos, count)
+    free_cells, pos = _unpack(code, data, pos, free)
+    stacked_slots, pos = _unpack('I', data, pos, (len(data) - pos) // 4)
+    if pos != len(data) or len(free_cells) != free or len(order) != count:
+        raise ValueError('truncated snake snapshot')
+    # Every index restore() looks up, so bad data fails here and not halfway
+    # through overwriting a game
+    cell_count = width * height
+    if (mt[-1] > 624 or snake[2] >= len(DIRECTIONS) or not segments
+            or max(segments) >= cell_count or max(cells, default=0) >= cell_count
+            or max(free_cells, default=0) >= cell_count or max(kinds, default=0) >= len(FOOD_TYPES)
+            or max(directions, default=0) >= len(DIRECTIONS) or sorted(order) != list(range(count))):
+        raise ValueError('bad value in snake snapshot')
+    i = 0
+    for _ in range(stacked):
+        n = stacked_slots[i] if i < len(stacked_slots) else 0
+        slots = stacked_slots[i + 1:i + 1 + n]
+        if n < 2 or len(slots) != n or max(slots) >= count or len({cells[slot] for slot in slots}) != 1:
+            raise ValueError('bad stacked cell in snake snapshot')
+        i += 1 + n
+    if i != len(stacked_slots):
+        raise ValueError('bad stacked cell in snake snapshot')
+    return ((tick_rate, seed, ticks, bool(over)), (3, tuple(mt), gauss if has_gauss else None),
+            snake, segments, manager, (cells, kinds, directions, borns), order, free_cells, stacked_slots)
+
+def restore(data, game=None, game_class=Game):
+    # Put the state in `data` into `game`, in place, or into a new game_class
+    # game; returns the game. Bad data raises ValueError and leaves `game` as
+    # it was.
+    try:
+        (header, rng_state, snake_fields, segments, manager_fields, columns, order, free_cells,
+         stacked_slots) = _parse(data)
+    except (struct.error, IndexError):
+        raise ValueError('truncated snake snapshot') from None
+    width = snake_engine.GRID_WIDTH
+    if game is None:
+        game = game_class(tick_rate=header[0], seed=header[1])
+    game.tick_rate, game.seed, game.ticks, game.over = header
+    game.rng.setstate(rng_state)
+
+    snake = game.snake
+    (snake.length, snake.score, direction, r, g, b, snake.current_color_index, snake.last_color_change,
+     _) = snake_fields
+    snake.direction = DIRECTIONS[direction]
+    snake.color = (r, g, b)
+    snake.positions = [(cell % width, cell // width) for cell in segments]
+
+    manager = game.food_manager
+    manager.tick, manager.max_foods, manager.min_foods, manager.move_interval, _, _, stacked = manager_fields
+    foods = [_new_food(manager, (cell % width, cell // width), kind, direction, born)
+             for cell, kind, direction, born in zip(*columns)]
+    by_position = {}
+    for slot, food in enumerate(foods):
+        food.slot = slot
+        by_position.setdefault(food.position, []).append(food)
+    buckets = [{} for _ in range(manager.move_interval)]
+    for slot in order:
+        food = foods[slot]
+        buckets[food.born % manager.move_interval][food] = None
+    i = 0
+    for _ in range(stacked):
+        n = stacked_slots[i]
+        cell_foods = [foods[slot] for slot in stacked_slots[i + 1:i + 1 + n]]
+        by_position[cell_foods[0].position] = cell_foods
+        i += 1 + n
+    manager.foods = foods
+    manager.by_position = by_position
+    manager.move_buckets = buckets
+    manager.free_cells = CellPool((cell % width, cell // width) for cell in free_cells)
+    return game
+
+def save(game, path):
+    with open(path, 'wb') as f:
+        f.write(snapshot(game))
+
+def load(path, game=None, game_class=Game):
+    with open(path, 'rb') as f:
+        return restore(f.read(), game, game_class)
+
+class RewindBuffer:
+    # Call capture() after every step; restore() and rewind() put the game
+    # back to an earlier tick and forget the ticks after it
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, max_keyframes=MAX_KEYFRAMES):
+        self.keyframe_interval = keyframe_interval
+        # [keyframe tick, snapshot, direction index of each tick after it]
+        self.segments = deque(maxlen=max_keyframes)
+
+    @property
+    def oldest(self):
+        return self.segments[0][0] if self.segments else None
+
+    @property
+    def newest(self):
+        if not self.segments:
+            return None
+        tick, _, moves = self.segments[-1]
+        return tick + len(moves)
+
+    @property
+    def nbytes(self):
+        return sum(len(keyframe) + len(moves) for _, keyframe, moves in self.segments)
+
+    def clear(self):
+        self.segments.clear()
+
+    def capture(self, game):
+        tick = game.ticks
+        newest = self.newest
+        if tick == newest:
+            return  # no step since the last capture
+        if newest is not None and tick == newest + 1 and tick - self.segments[-1][0] < self.keyframe_interval:
+            self.segments[-1][2].append(DIRECTION_INDEX[game.snake.direction])
+        else:
+            self.segments.append([tick, snapshot(game), bytearray()])
+
+    def restore(self, game, tick):
+        # Put `game` back to `tick`, which must be between oldest and newest
+        if not self.segments or not self.oldest <= tick <= self.newest:
+            raise ValueError(f'tick {tick} is not in the rewind buffer')
+        while self.segments[-1][0] > tick:
+            self.segments.pop()
+        start, keyframe, moves = self.segments[-1]
+        restore(keyframe, game)
+        del moves[tick - start:]
+        snake = game.snake
+        for direction in moves:
+            snake.direction = DIRECTIONS[direction]
+            game.step()
+        return game
+
+    def rewind(self, game, ticks):
+        # Go back up to `ticks` ticks, as far as the buffer reaches
+        return self.restore(game, max(self.oldest, game.ticks - ticks))
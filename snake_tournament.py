@@ -0,0 +1,201 @@
+# Tournaments: many seeded headless games played by the autopilot and spread
+# over a process pool, one worker per core, for tuning the food settings and
+# the tick rate. Game i of a run uses seed first_seed + i whatever the
+# number of workers, and with the default settings a game is exactly
+# Game(seed=...) steered by Autopilot, so any result can be replayed alone.
+#
+# Games go out in chunks of `chunk_size` so pickling and queueing are paid
+# per chunk, only a few chunks per worker are in flight at once, and each
+# finished chunk is streamed to the caller and folded into a Summary of
+# running totals and a score histogram; the games themselves aren't kept.
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice, product
+
+from snake_engine import Game, FOOD_MOVE_INTERVAL, TICK_RATE
+from snake_autopilot import Autopilot, SEARCH_BUDGET
+
+GAMES = 1000  # per configuration
+CHUNK_SIZE = 32  # games per pool task; an autopilot game takes tens of ms
+CHUNKS_PER_WORKER = 2  # tasks queued per worker, so none waits between chunks
+MAX_TICKS = 20000  # a game still running after this many ticks is stopped
+
+# What ended a game
+COLLISION = 'collision'  # ran into itself while following a plan
+TRAPPED = 'trapped'  # boxed in: the autopilot had no move left to plan
+TIME_LIMIT = 'time limit'
+CAUSES = (COLLISION, TRAPPED, TIME_LIMIT)
+
+Config = namedtuple('Config', 'max_foods min_foods food_move_interval tick_rate')
+DEFAULT_CONFIG = Config(50, 40, FOOD_MOVE_INTERVAL, TICK_RATE)
+FIELDS = ('score', 'length', 'ticks')
+
+def play_game(config, seed, max_ticks=MAX_TICKS, budget=SEARCH_BUDGET):
+    # (seed, score, length, ticks, cause) of one autopilot game
+    game = Game(tick_rate=config.tick_rate, seed=seed, max_foods=config.max_foods, min_foods=config.min_foods,
+                food_move_interval=config.food_move_interval)
+    steered = False
+
+    def turn(direction):
+        nonlocal steered
+        steered = True
+        game.turn(direction)
+
+    pilot = Autopilot(game, budget, turn)
+    cause = TIME_LIMIT
+    while game.ticks < max_ticks:
+        steered = False
+        pilot.steer()
+        if not game.step():
+            cause = COLLISION if steered else TRAPPED
+            break
+    return seed, game.snake.score, game.snake.length, game.ticks, cause
+
+def play_chunk(config, seeds, max_ticks=MAX_TICKS, budget=SEARCH_BUDGET):
+    return [play_game(config, seed, max_ticks, budget) for seed in seeds]
+
+class Summary:
+    # Running statistics over games without keeping them: integer sums (so
+    # the result doesn't depend on the order chunks finish in), extremes,
+    # causes of death and a histogram of scores for percentiles
+    def __init__(self):
+        self.games = 0
+        self.totals = dict.fromkeys(FIELDS, 0)
+        self.squares = dict.fromkeys(FIELDS, 0)
+        self.lowest = {}
+        self.highest = {}
+        self.causes = Counter()
+        self.score_counts = Counter()
+
+    def add(self, score, length, ticks, cause):
+        self.games += 1
+        for field, value in zip(FIELDS, (score, length, ticks)):
+            self.totals[field] += value
+            self.squares[field] += value * value
+            if value < self.lowest.get(field, value + 1):
+                self.lowest[field] = value
+            if value > self.highest.get(field, value - 1):
+                self.highest[field] = value
+        self.causes[cause] += 1
+        self.score_counts[score] += 1
+
+    def mean(self, field):
+        return self.totals[field] / self.games if self.games else 0.0
+
+    def std(self, field):
+        n = self.games
+        if not n:
+            return 0.0
+        return ((n * self.squares[field] - self.totals[field] ** 2) / (n * n)) ** 0.5
+
+    def score_percentile(self, p):
+        # Lowest score that at least p% of games reached or fell below
+        seen = 0
+        for score in sorted(self.score_counts):
+            seen += self.score_counts[score]
+            if seen * 100 >= p * self.games:
+                return score
+        return 0
+
+    def as_dict(self):
+        stats = {'games': self.games}
+        for field in FIELDS:
+            stats[field] = {'mean': self.mean(field), 'std': self.std(field),
+                            'min': self.lowest.get(field, 0), 'max': self.highest.get(field, 0)}
+        stats['score'].update({f'p{p}': self.score_percentile(p) for p in (50, 90, 99)})
+        stats['causes'] = {cause: self.causes[cause] for cause in CAUSES}
+        return stats
+
+def run(configs, games=GAMES, first_seed=0, workers=None, chunk_size=CHUNK_SIZE, max_ticks=MAX_TICKS,
+        budget=SEARCH_BUDGET, on_chunk=None):
+    # Play `games` games of every config across `workers` processes (one
+    # per core by default) and return {config: Summary}. on_chunk(config,
+    # results) is called with each chunk of play_game results as it lands.
+    workers = workers or os.cpu_count() or 1
+    summaries = {config: Summary() for config in configs}
+    tasks = ((config, range(start, min(start + chunk_size, first_seed + games)))
+             for config in configs for start in range(first_seed, first_seed + games, chunk_size))
+    in_flight = workers * CHUNKS_PER_WORKER
+    pending = {}
+    with ProcessPoolExecutor(workers) as pool:
+        while True:
+            for config, seeds in islice(tasks, in_flight - len(pending)):
+                pending[pool.submit(play_chunk, config, seeds, max_ticks, budget)] = config
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                config = pending.pop(future)
+                results = future.result()
+                add = summaries[config].add
+                for _, score, length, ticks, cause in results:
+                    add(score, length, ticks, cause)
+                if on_chunk is not None:
+                    on_chunk(config, results)
+    return summaries
+
+def describe(config):
+    return (f'max_foods={config.max_foods} min_foods={config.min_foods} '
+            f'move_interval={config.food_move_interval} tick_rate={config.tick_rate}')
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Play many autopilot games in parallel and summarise them')
+    parser.add_argument('--games', type=int, default=GAMES, help='games per configuration')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--workers', type=int, help='processes, one per core by default')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS)
+    parser.add_argument('--budget', type=int, default=SEARCH_BUDGET, help='autopilot search budget')
+    # Several values per setting play every combination
+    parser.add_argument('--max-foods', type=int, nargs='+', default=[DEFAULT_CONFIG.max_foods])
+    parser.add_argument('--min-foods', type=int, nargs='+', default=[DEFAULT_CONFIG.min_foods])
+    parser.add_argument('--food-move-interval', type=int, nargs='+', default=[DEFAULT_CONFIG.food_move_interval])
+    parser.add_argument('--tick-rate', type=int, nargs='+', default=[DEFAULT_CONFIG.tick_rate])
+    parser.add_argument('--out', help='write every game to this CSV file as results arrive')
+    parser.add_argument('--json', action='store_true', help='print the summaries as JSON')
+    args = parser.parse_args()
+    configs = [Config(*values) for values in product(args.max_foods, args.min_foods, args.food_move_interval,
+                                                     args.tick_rate)]
+    if min(value for config in configs for value in config) < 1:
+        parser.error('food counts, move interval and tick rate must be positive')
+
+    out = writer = None
+    if args.out:
+        out = open(args.out, 'w', newline='')
+        writer = csv.writer(out)
+        writer.writerow(Config._fields + ('seed',) + FIELDS + ('cause',))
+
+    def stream(config, results):
+        if writer is not None:
+            writer.writerows(config + result for result in results)
+
+    workers = args.workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    try:
+        summaries = run(configs, args.games, args.seed, workers, args.chunk_size, args.max_ticks, args.budget,
+                        stream)
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - start
+    total = args.games * len(configs)
+    if args.json:
+        for config, summary in summaries.items():
+            print(json.dumps({'config': config._asdict(), **summary.as_dict()}))
+    else:
+        for config, summary in summaries.items():
+            causes = ', '.join(f'{cause} {summary.causes[cause]}' for cause in CAUSES)
+            print(describe(config))
+            print(f'  score mean {summary.mean("score"):.0f} (sd {summary.std("score"):.0f})  '
+                  f'p50 {summary.score_percentile(50)}  p90 {summary.score_percentile(90)}  '
+                  f'p99 {summary.score_percentile(99)}  max {summary.highest.get("score", 0)}')
+            print(f'  length mean {summary.mean("length"):.1f}  ticks mean {summary.mean("ticks"):.0f} '
+                  f'({summary.mean("ticks") / config.tick_rate:.0f} s)  {causes}')
+    print(f'{total} games in {elapsed:.1f} s: {total / elapsed:.1f} games/s on {workers} worker{"s" if workers > 1 else ""}',
+          file=sys.stderr if args.json else sys.stdout)